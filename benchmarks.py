@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+#
+# Benchmarks for each stage of building a landscape, run against deterministic synthetic
+# data served from a local HTTP server. Results are written as JSON so runs can be compared.
+#
+#   python benchmarks.py --output bench.json
+#   python benchmarks.py --scale large --output new.json --compare bench.json
+#
+
+## built in modules
+import csv
+import functools
+import http.server
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+
+## third party modules
+import ruamel.yaml
+
+from landscape_tools import urls
+from landscape_tools.member import Member
+from landscape_tools.members import Members
+from landscape_tools.lfxmembers import LFXMembers
+from landscape_tools.landscapemembers import LandscapeMembers
+from landscape_tools.crunchbasemembers import CrunchbaseMembers
+from landscape_tools.landscapeoutput import LandscapeOutput
+
+scales = {
+    'small': {'crunchbaserows': 10000, 'lfxmembers': 100, 'landscapes': 5, 'landscapemembers': 50, 'landscapeitems': 200, 'finds': 100, 'logos': 20},
+    'medium': {'crunchbaserows': 250000, 'lfxmembers': 500, 'landscapes': 25, 'landscapemembers': 200, 'landscapeitems': 2000, 'finds': 200, 'logos': 100},
+    'large': {'crunchbaserows': 2000000, 'lfxmembers': 1500, 'landscapes': 60, 'landscapemembers': 400, 'landscapeitems': 10000, 'finds': 200, 'logos': 300},
+}
+
+crunchbaseFields = ['uuid','name','type','permalink','cb_url','rank','created_at','updated_at','legal_name','roles','domain','homepage_url','country_code','state_code','region','city','address','postal_code','status','short_description','category_list','category_groups_list','num_funding_rounds','total_funding_usd','total_funding','total_funding_currency_code','founded_on','last_funding_on','closed_on','employee_count','email','phone','facebook_url','linkedin_url','twitter_url','logo_url','alias1','alias2','alias3','primary_role','num_exits']
+
+syllables = ['ac','ma','tel','ron','vi','sta','gen','or','lux','qua','ny','zen','dat','flo','kin','sys','net','ora','pix','tri']
+suffixes = ['',' Inc.',' LLC',' Ltd',' GmbH',' Corp.',' AG',' Limited',' Co.',', Inc.']
+memberships = ['Platinum Membership','Gold Membership','Silver Membership','Associate Membership']
+
+svgLogo = b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10"><rect width="10" height="10"/></svg>'
+
+#
+# Synthetic data generators; the same seed always produces the same data
+#
+def companyName(rand, i):
+    return ''.join(rand.choice(syllables) for x in range(rand.randint(2,4))).capitalize() + ' ' + str(i) + rand.choice(suffixes)
+
+def companySlug(name):
+    return ''.join(c if c.isalnum() else '-' for c in name.lower()).strip('-')
+
+def generateCrunchbaseCSV(path, rows, seed = 1):
+    rand = random.Random(seed)
+    with open(path, 'w', newline='') as fp:
+        writer = csv.writer(fp, delimiter=',', quotechar='"')
+        writer.writerow(crunchbaseFields)
+        for i in range(rows):
+            name = companyName(rand, i)
+            slug = companySlug(name)
+            row = dict.fromkeys(crunchbaseFields, '')
+            row.update({
+                'uuid': '{:032x}'.format(rand.getrandbits(128)),
+                'name': name,
+                'type': 'organization',
+                'permalink': slug,
+                'cb_url': 'https://www.crunchbase.com/organization/'+slug,
+                'rank': str(i),
+                'domain': slug+'.com',
+                'homepage_url': 'https://www.'+slug+'.com/',
+                'country_code': rand.choice(['USA','DEU','GBR','CHN','IND']),
+                'status': 'operating',
+                'short_description': 'A company that makes '+rand.choice(syllables)+' products.',
+                'twitter_url': 'https://twitter.com/'+slug,
+                'primary_role': 'company',
+            })
+            writer.writerow([row[field] for field in crunchbaseFields])
+
+    return path
+
+def generateLFXMembers(count, seed = 2):
+    rand = random.Random(seed)
+    members = []
+    for i in range(count):
+        name = companyName(rand, i)
+        slug = companySlug(name)
+        members.append({
+            'ID': '{:018x}'.format(rand.getrandbits(72)),
+            'Name': name,
+            'CrunchBaseURL': 'https://crunchbase.com/organization/'+slug if rand.random() < 0.5 else '',
+            'Logo': 'https://logos.example.com/'+slug+'.svg',
+            'Membership': {'Family': 'Membership', 'Name': rand.choice(memberships), 'Status': 'Active'},
+            'Slug': 'bench',
+            'Twitter': slug if rand.random() < 0.3 else '',
+            'Website': slug+'.com'
+        })
+
+    return json.dumps(members)
+
+def landscapeItem(rand, i, logo = None):
+    name = companyName(rand, i)
+    slug = companySlug(name)
+    return {
+        'item': None,
+        'name': name,
+        'homepage_url': 'https://'+slug+'.com/',
+        'logo': logo if logo else slug+'.svg',
+        'twitter': 'https://twitter.com/'+slug,
+        'crunchbase': 'https://www.crunchbase.com/organization/'+slug
+    }
+
+def landscapeYAML(rand, items, category = 'Members', subcategories = None):
+    subcategories = subcategories if subcategories else ['Platinum','Gold','Silver','Associate']
+    landscape = {'landscape': [{'category': None, 'name': category, 'subcategories': [
+        {'subcategory': None, 'name': subcategory, 'items': []} for subcategory in subcategories
+    ]}]}
+    for i in range(items):
+        rand.choice(landscape['landscape'][0]['subcategories'])['items'].append(landscapeItem(rand, i))
+
+    return landscape
+
+def dumpYAML(data, path):
+    ryaml = ruamel.yaml.YAML(typ='safe', pure=True)
+    ryaml.default_flow_style = False
+    with open(path, 'w', encoding='utf8') as fp:
+        ryaml.dump(data, fp)
+
+    return path
+
+#
+# Writes landscapes.yml along with settings.yml and landscape.yml for count landscape repos
+# into directory, laid out as they are on raw.githubusercontent.com.
+#
+def generateLandscapes(directory, count, members, seed = 3):
+    rand = random.Random(seed)
+    landscapes = {'landscapes': []}
+    for i in range(count):
+        repo = 'bench/landscape{}'.format(i)
+        landscapes['landscapes'].append({'landscape': None, 'name': 'landscape{}'.format(i), 'repo': repo})
+        os.makedirs(os.path.join(directory, repo), exist_ok=True)
+        dumpYAML({'global': {'membership': 'Members'}}, os.path.join(directory, repo, 'settings.yml'))
+        dumpYAML(landscapeYAML(rand, members), os.path.join(directory, repo, 'landscape.yml'))
+
+    return dumpYAML(landscapes, os.path.join(directory, 'landscapes.yml'))
+
+def generateLandscapeYAML(path, items, seed = 4):
+    return dumpYAML(landscapeYAML(random.Random(seed), items), path)
+
+#
+# Serves directory over HTTP on localhost in a background thread
+#
+class LocalServer:
+
+    def __init__(self, directory):
+        handler = functools.partial(QuietHTTPRequestHandler, directory=directory)
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+class QuietHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+#
+# Runs fn repeat times, returning the timings in seconds. setup is run before each timing
+# and its return value passed to fn.
+#
+def timeit(fn, repeat = 3, setup = None):
+    timings = []
+    for i in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+# third party modules that shouldn't be imported until they are used
+heavyModules = ['requests', 'urllib3', 'ruamel.yaml', 'validators', 'url_normalize', 'pycrunchbase']
+
+#
+# Imports module in a fresh interpreter with -X importtime, returning the cumulative import
+# time in seconds and which of heavyModules were imported along with it
+#
+def importTime(module):
+    script = "import json, sys, {module}; print(json.dumps([name for name in {heavy} if name in sys.modules]))".format(module=module, heavy=heavyModules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            seconds = int(fields[1]) / 1000000
+
+    return seconds, json.loads(result.stdout)
+
+class BenchMembers(Members):
+
+    def loadData(self):
+        pass
+
+class Benchmarks:
+
+    repeat = 3
+
+    def __init__(self, scale = 'small', directory = None, repeat = None):
+        self.sizes = scales[scale]
+        self.scale = scale
+        self.directory = directory
+        if repeat:
+            self.repeat = repeat
+        self.results = {}
+
+    def benchmarks(self):
+        return [name for name in dir(self) if name.startswith('bench_')]
+
+    def run(self, only = None):
+        for name in self.benchmarks():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            ops, timings = getattr(self, name)()
+            self.results[name[len('bench_'):]] = {
+                'ops': ops,
+                'repeat': len(timings),
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'per_op': min(timings) / ops if ops else None
+            }
+            print("{:<40} {:>12.4f}s {:>14.2f}us/op".format(name[len('bench_'):], min(timings), (min(timings) / ops * 1000000) if ops else 0))
+
+        return self.results
+
+    def report(self):
+        return {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': self.scale,
+            'sizes': self.sizes,
+            'results': self.results
+        }
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    # generated once per number of rows, and reused by later runs at the same scale
+    def crunchbaseCSV(self):
+        path = self.path('organizations-{}.csv'.format(self.sizes['crunchbaserows']))
+        if not os.path.isfile(path):
+            generateCrunchbaseCSV(path, self.sizes['crunchbaserows'])
+        return path
+
+    def bench_startup(self):
+        timings = []
+        for i in range(self.repeat):
+            seconds, imported = importTime('landscapemembers')
+            timings.append(seconds)
+        if imported:
+            print("landscapemembers imports {} at startup".format(', '.join(imported)))
+        return 1, timings
+
+    def bench_normalizeCompany(self):
+        rand = random.Random(5)
+        names = [companyName(rand, i) for i in range(10000)]
+        members = BenchMembers()
+        return len(names), timeit(lambda: [members.normalizeCompany(name) for name in names], self.repeat)
+
+    def bench_Member_construction(self):
+        rand = random.Random(6)
+        items = [landscapeItem(rand, i) for i in range(2000)]
+        def construct():
+            for item in items:
+                member = Member()
+                member.orgname = item['name']
+                member.website = item['homepage_url']
+                member.logo = item['logo']
+                member.crunchbase = item['crunchbase']
+                member.twitter = item['twitter']
+        return len(items), timeit(construct, self.repeat)
+
+    def bench_Members_find(self):
+        rand = random.Random(7)
+        members = BenchMembers()
+        for i in range(self.sizes['landscapes'] * self.sizes['landscapemembers']):
+            item = landscapeItem(rand, i)
+            member = Member()
+            member.orgname = item['name']
+            member.website = item['homepage_url']
+            members.members.append(member)
+        queries = [(member.orgname, member.website) for member in rand.sample(members.members, min(self.sizes['finds'], len(members.members)))]
+        return len(queries), timeit(lambda: [members.find(org, website) for org, website in queries], self.repeat)
+
+    def bench_Members_fuzzyFind(self):
+        rand = random.Random(8)
+        members = BenchMembers()
+        for i in range(self.sizes['crunchbaserows'] // 10):
+            member = Member()
+            member.orgname = companyName(rand, i)
+            members.members.append(member)
+        members.fuzzyIndex()
+        # misspell each query so it has to be matched fuzzily
+        queries = [member.orgname.replace(' ', '  ').upper()[:-1] for member in rand.sample(members.members, min(self.sizes['finds'], len(members.members)))]
+        return len(queries), timeit(lambda: [members.fuzzyFind(org) for org in queries], self.repeat)
+
+    # the URL normalization caches are cleared before each load, so every run normalizes
+    # every row like a real load does, whether in this process or the workers
+    def bench_CrunchbaseMembers_loadData(self):
+        path = self.crunchbaseCSV()
+        return self.sizes['crunchbaserows'], timeit(lambda arg: CrunchbaseMembers(bulkdatafile = path, loadData = True), self.repeat, setup = urls.clearCaches)
+
+    def bench_CrunchbaseMembers_loadDataParallel(self):
+        path = self.crunchbaseCSV()
+        def load(arg):
+            members = CrunchbaseMembers(bulkdatafile = path)
+            members.loadWorkers = os.cpu_count()
+            members.loadData()
+        return self.sizes['crunchbaserows'], timeit(load, self.repeat, setup = urls.clearCaches)
+
+    def bench_LFXMembers_loadData(self):
+        with open(self.path('lfxmembers.json'), 'w') as fp:
+            fp.write(generateLFXMembers(self.sizes['lfxmembers']))
+        with LocalServer(self.directory) as server:
+            def load():
+                members = LFXMembers(loadData = False)
+                members.endpointURL = server.url+'/lfxmembers.json?project={}'
+                members.loadData()
+            return self.sizes['lfxmembers'], timeit(load, self.repeat)
+
+    def bench_LandscapeMembers_loadData(self):
+        directory = self.path('landscapes')
+        generateLandscapes(directory, self.sizes['landscapes'], self.sizes['landscapemembers'])
+        with LocalServer(directory) as server:
+            def load():
+                members = LandscapeMembers(loadData = False)
+                members.landscapeListYAML = server.url+'/landscapes.yml'
+                members.landscapeSettingsYAML = server.url+'/{repo}/settings.yml'
+                members.landscapeLandscapeYAML = server.url+'/{repo}/landscape.yml'
+                members.landscapeLogo = server.url+'/{repo}/hosted_logos/{logo}'
+                members.loadData()
+            return self.sizes['landscapes'] * self.sizes['landscapemembers'], timeit(load, self.repeat)
+
+    def bench_LandscapeOutput_hostLogo(self):
+        os.makedirs(self.path('logos'), exist_ok=True)
+        with open(self.path('logos', 'logo.svg'), 'wb') as fp:
+            fp.write(svgLogo)
+        with LocalServer(self.path('logos')) as server:
+            def setup():
+                landscape = LandscapeOutput()
+                landscape.hostedLogosDir = tempfile.mkdtemp(dir=self.directory)
+                return landscape
+            def host(landscape):
+                for i in range(self.sizes['logos']):
+                    landscape.hostLogo(server.url+'/logo.svg', 'company {}'.format(i))
+            return self.sizes['logos'], timeit(host, self.repeat, setup)
+
+    def bench_LandscapeOutput_updateLandscape(self):
+        path = generateLandscapeYAML(self.path('landscape.yml'), self.sizes['landscapeitems'])
+        def setup():
+            landscape = LandscapeOutput()
+            landscape.landscapeMemberCategory = 'Members'
+            landscape.landscapefile = path
+            landscape.loadLandscape()
+            landscape.landscapefile = self.path('landscape_out.yml')
+            return landscape
+        return self.sizes['landscapeitems'], timeit(lambda landscape: landscape.updateLandscape(), self.repeat, setup)
+
+    def bench_LandscapeOutput_loadLandscape(self):
+        path = generateLandscapeYAML(self.path('landscape.yml'), self.sizes['landscapeitems'])
+        def load():
+            landscape = LandscapeOutput()
+            landscape.landscapeMemberCategory = 'Members'
+            landscape.landscapefile = path
+            landscape.loadLandscape()
+        return self.sizes['landscapeitems'], timeit(load, self.repeat)
+
+#
+# Compares two benchmark reports, returning the ratio of the new minimum time to the old one
+# for each benchmark in both.
+#
+def compare(old, new):
+    ratios = {}
+    for name, result in new['results'].items():
+        if name in old['results'] and old['results'][name]['min']:
+            ratios[name] = result['min'] / old['results'][name]['min']
+
+    return ratios
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--scale", dest="scale", choices=scales.keys(), default='small', help="size of the generated data sets")
+    parser.add_argument("--repeat", dest="repeat", type=int, help="times to repeat each benchmark")
+    parser.add_argument("--only", dest="only", action="append", help="only run benchmarks whose name contains this; can be repeated")
+    parser.add_argument("--output", dest="output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", dest="compare", help="JSON results from a previous run to compare against")
+    parser.add_argument("--datadir", dest="datadir", help="directory for generated data; reused between runs if given")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        directory = args.datadir if args.datadir else tempdir
+        os.makedirs(directory, exist_ok=True)
+        benchmarks = Benchmarks(scale=args.scale, directory=directory, repeat=args.repeat)
+        benchmarks.run(only=args.only)
+        report = benchmarks.report()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as fp:
+            json.dump(report, fp, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf8') as fp:
+            old = json.load(fp)
+        for name, ratio in sorted(compare(old, report).items()):
+            print("{:<40} {:>8.2f}x {}".format(name, ratio, 'slower' if ratio > 1 else 'faster'))
+
+if __name__ == '__main__':
+    main()
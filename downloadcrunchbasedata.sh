@@ -2,8 +2,11 @@
 #
 # Download the latest crunchbase organization data
 #
+# The bulk export is saved as is; landscapemembers.py reads organizations.csv straight
+# out of it without extracting it.
+#
 # Copyright this project and it's contributors
 # SPDX-License-Identifier: Apache-2.0
 #
 
-wget -qO- https://api.crunchbase.com/bulk/v4/bulk_export.tar.gz\?user_key\=$CRUNCHBASE_KEY_4 | tar xvz - organizations.csv
+wget -qO bulk_export.tar.gz https://api.crunchbase.com/bulk/v4/bulk_export.tar.gz\?user_key\=$CRUNCHBASE_KEY_4
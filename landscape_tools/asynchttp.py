@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from landscape_tools.metrics import metrics
+
+#
+# asyncio front end for HTTP requests. Requests go through one shared requests.Session, so
+# connections are pooled across all callers, and run on a worker thread pool so they can
+# overlap within an event loop. A semaphore caps the number of requests in flight, and the
+# HostScheduler applies per host limits and circuit breaking on top of that.
+#
+class AsyncHTTP:
+
+    maxConcurrency = 16
+    retries = 3
+
+    def __init__(self, maxConcurrency = None, scheduler = None):
+        # requests is only imported once a client is needed, to keep startup fast
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        from landscape_tools.hostscheduler import HostScheduler
+
+        if maxConcurrency:
+            self.maxConcurrency = maxConcurrency
+        self.scheduler = scheduler if scheduler else HostScheduler()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.maxConcurrency, pool_maxsize=self.maxConcurrency, max_retries=Retry(total=self.retries, backoff_factor=0.5))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.maxConcurrency, thread_name_prefix='asynchttp')
+        # asyncio primitives are bound to the loop they are first used in, so keep one
+        # semaphore per event loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._semaphores:
+                self._semaphores[loop] = asyncio.Semaphore(self.maxConcurrency)
+            return self._semaphores[loop]
+
+    #
+    # GET url; 5xx responses count as failures for the host's circuit breaker unless
+    # countServerErrors is False, such as when fetching many files from one host where an
+    # error for one doesn't mean the others will fail
+    #
+    async def get(self, url, countServerErrors = True, **kwargs):
+        # wait on the per host limits first so a busy host doesn't hold up the global slots
+        async with self.scheduler.request(url) as failed:
+            async with self.semaphore():
+                response = await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(self.session.get, url, **kwargs))
+                failed(countServerErrors and response.status_code >= 500)
+        metrics.recordResponse(response)
+
+        return response
+
+_client = None
+_clientLock = threading.Lock()
+
+#
+# Returns the process wide AsyncHTTP client
+#
+def getClient():
+    global _client
+    with _clientLock:
+        if _client is None:
+            _client = AsyncHTTP()
+        return _client
+
+#
+# Stops the process wide client's worker threads and closes its connections; getClient()
+# creates a new one if needed again. Used before forking worker processes, which would
+# otherwise inherit locks held by those threads.
+#
+def shutdown():
+    global _client
+    with _clientLock:
+        if _client is not None:
+            _client.executor.shutdown(wait=True)
+            _client.session.close()
+            _client = None
+
+#
+# Runs a coroutine to completion for the synchronous API
+#
+def run(coroutine):
+    return asyncio.run(coroutine)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from landscape_tools.metrics import metrics
+
+#
+# Persistent key/value cache with a TTL, shorter TTL for negative ( not found ) entries, and a
+# cap on the number of entries where the least recently used entries are evicted first.
+# Entries are kept in memory and written to cachefile on save(); with no cachefile it only
+# lives for the length of the run.
+#
+class Cache:
+
+    name = 'cache'
+    cachefile = None
+    ttl = 60*60*24*30 # 30 days
+    negativeTTL = 60*60*24 # 1 day
+    maxEntries = 50000
+
+    hits = 0
+    misses = 0
+
+    def __init__(self, name = None, cachefile = None, ttl = None, negativeTTL = None, maxEntries = None):
+        if name:
+            self.name = name
+        if cachefile:
+            self.cachefile = cachefile
+        if ttl is not None:
+            self.ttl = ttl
+        if negativeTTL is not None:
+            self.negativeTTL = negativeTTL
+        if maxEntries is not None:
+            self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.cachefile or not os.path.isfile(self.cachefile):
+            return
+        try:
+            with open(self.cachefile, 'r', encoding='utf8') as fp:
+                entries = json.load(fp)
+        except (OSError, ValueError):
+            # a corrupt cache is treated as an empty one
+            return
+        now = time.time()
+        with self._lock:
+            for key, entry in entries.items():
+                if not self._expired(entry, now):
+                    self._entries[key] = entry
+
+    def save(self):
+        if not self.cachefile:
+            return
+        with self._lock:
+            entries = dict(self._entries)
+        directory = os.path.dirname(os.path.abspath(self.cachefile))
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf8', dir=directory, delete=False) as fp:
+            json.dump(entries, fp)
+        os.replace(fp.name, self.cachefile)
+
+    def _expired(self, entry, now):
+        storedtime, negative, value = entry
+        return (now - storedtime) > (self.negativeTTL if negative else self.ttl)
+
+    #
+    # Returns a (found, value) tuple so cached negative entries can be told apart from misses
+    #
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry, time.time()):
+                self._entries.pop(key, None)
+                self.misses += 1
+                metrics.increment(self.name+'.cache.misses')
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.increment(self.name+'.cache.hits')
+            return True, entry[2]
+
+    def set(self, key, value, negative = False):
+        with self._lock:
+            self._entries[key] = [time.time(), negative, value]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
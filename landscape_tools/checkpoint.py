@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import logging
+import os
+import pickle
+import tempfile
+
+from landscape_tools.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+#
+# Saves the state of a landscape build to a directory so an interrupted build can pick up
+# where it left off. State is kept in named parts, each pickled to its own file so the
+# large ones only need to be written once.
+#
+# Each part is written to a temporary file and moved into place, so a crash while saving
+# leaves the previous checkpoint as it was. Parts that can't be read are ignored.
+#
+class Checkpoint:
+
+    # bump when the saved state changes shape so old checkpoints are ignored
+    version = 1
+    # logos hosted between each save while hosting logos
+    logoBatch = 100
+
+    def __init__(self, statedir, name = 'checkpoint'):
+        self.directory = os.path.join(statedir, name)
+
+    def path(self, part):
+        return os.path.join(self.directory, part+'.pickle')
+
+    def save(self, part, state):
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=part, suffix='.tmp', delete=False) as fp:
+            pickle.dump({'version': self.version, 'state': state}, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(fp.name, self.path(part))
+        metrics.increment('checkpoint.saves')
+
+    def load(self, part):
+        try:
+            with open(self.path(part), 'rb') as fp:
+                saved = pickle.load(fp)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring unreadable checkpoint %s - %s", self.path(part), e)
+            return None
+        if not isinstance(saved, dict) or saved.get('version') != self.version:
+            logger.warning("Ignoring checkpoint %s saved by a different version", self.path(part))
+            return None
+
+        return saved['state']
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.pickle') or filename.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, filename))
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
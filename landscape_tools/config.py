@@ -9,9 +9,6 @@
 import sys
 import os
 
-## third party modules
-import ruamel.yaml
-
 class Config:
 
     project = ''
@@ -24,8 +21,15 @@ class Config:
     missingcsvfile = 'missing.csv'
     hostedLogosDir = 'hosted_logos'
     memberSuffix = None
+    crunchbaseAPI = False
+    crunchbaseCacheFile = 'crunchbasecache.json'
+    crunchbaseCacheTTL = 60*60*24*30 # 30 days
+    fuzzyMatchThreshold = None
+    logoCacheFile = None
 
     def __init__(self, config_file):
+        import ruamel.yaml
+
         if config_file != '' and os.path.isfile(config_file):
             try:
                 with open(config_file, 'r') as stream:
@@ -49,3 +53,13 @@ class Config:
                 self.memberSuffix = data_loaded['memberSuffix']
             if 'hostedLogosDir' in data_loaded:
                 self.hostedLogosDir = data_loaded['hostedLogosDir']
+            if 'crunchbaseAPI' in data_loaded:
+                self.crunchbaseAPI = data_loaded['crunchbaseAPI']
+            if 'crunchbaseCacheFile' in data_loaded:
+                self.crunchbaseCacheFile = data_loaded['crunchbaseCacheFile']
+            if 'crunchbaseCacheTTL' in data_loaded:
+                self.crunchbaseCacheTTL = data_loaded['crunchbaseCacheTTL']
+            if 'fuzzyMatchThreshold' in data_loaded:
+                self.fuzzyMatchThreshold = data_loaded['fuzzyMatchThreshold']
+            if 'logoCacheFile' in data_loaded:
+                self.logoCacheFile = data_loaded['logoCacheFile']
@@ -5,48 +5,161 @@
 #
 # encoding=utf8
 
+## built in modules
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from pycrunchbase import CrunchBase
+## third party modules
+import requests
 
 from landscape_tools.members import Members
 from landscape_tools.member import Member
+from landscape_tools.ratelimiter import RateLimiter
+from landscape_tools.cache import Cache
+from landscape_tools.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 class CrunchbaseAPIMembers(Members):
 
     crunchbaseKey = ''
+    maxWorkers = 8
+    # Crunchbase API allows 200 calls per minute
+    requestsPerSecond = 3
+    cachefile = None
+    cacheTTL = None
+    _client = None
+    _ratelimiter = None
+    _cache = None
 
     def loadData(self):
         return
 
+    @property
+    def client(self):
+        if self._client is None:
+            from pycrunchbase import CrunchBase
+            if not self.crunchbaseKey and 'CRUNCHBASE_KEY' in os.environ:
+                self.crunchbaseKey = os.getenv('CRUNCHBASE_KEY')
+            self._client = CrunchBase(self.crunchbaseKey)
+        return self._client
+
+    @property
+    def ratelimiter(self):
+        if self._ratelimiter is None:
+            self._ratelimiter = RateLimiter(rate=self.requestsPerSecond, burst=self.requestsPerSecond)
+        return self._ratelimiter
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = Cache(name='crunchbaseapi', cachefile=self.cachefile, ttl=self.cacheTTL)
+        return self._cache
+
     def find(self, org, website):
-        normalizedorg = self.normalizeCompany(org)
-        normalizedwebsite = self.normalizeURL(website)
-
-        if not self.crunchbaseKey and 'CRUNCHBASE_KEY' in os.environ:
-            self.crunchbaseKey = os.getenv('CRUNCHBASE_KEY')
-        cb = CrunchBase(self.crunchbaseKey)
-
-        members = []
-        for result in cb.organizations(org):
-            company = cb.organization(result.permalink)
-            if self.normalizeCompany(company.name) == normalizedorg:
-                member = Member()
-                try:
-                    member.orgname = company.name
-                except ValueError as e:
-                    pass
-                try:
-                    member.website = self.normalizeURL(company.homepage_url)
-                except ValueError as e:
-                    pass
-                try:
-                    member.crunchbase = "https://www.crunchbase.com/organization/{org}".format(org=result.permalink)
-                except ValueError as e:
-                    pass
-
-                members.append(member)
-
-        return members
+        return self.find_many([(org, website)])[0]
+
+    #
+    # Batch lookup; orgs is a list of (org, website) tuples and the results are returned
+    # as a list of Member lists in the same order.
+    #
+    def find_many(self, orgs):
+        orgs = list(orgs)
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            # search first, then only fetch the details of results whose name matches
+            searches = list(executor.map(lambda org: self._search(org[0]), orgs))
+            permalinks = []
+            for (org, website), results in zip(orgs, searches):
+                normalizedorg = self.normalizeCompany(org)
+                permalinks.append([result['permalink'] for result in results if self.normalizeCompany(result['name']) == normalizedorg])
+
+            uniquepermalinks = list(dict.fromkeys(permalink for matches in permalinks for permalink in matches))
+            companies = dict(zip(uniquepermalinks, executor.map(self._organization, uniquepermalinks)))
+
+        found = []
+        for matches in permalinks:
+            found.append([self._toMember(permalink, companies[permalink]) for permalink in matches if companies[permalink]])
+
+        self.cache.save()
+
+        return found
+
+    def findByPermalink(self, permalink):
+        return self.findByPermalinks([permalink])[0]
+
+    #
+    # Batch lookup of organizations by crunchbase permalink, skipping the search; results
+    # are returned as a list of Member lists in the same order
+    #
+    def findByPermalinks(self, permalinks):
+        permalinks = [permalink.lower() if permalink else None for permalink in permalinks]
+        uniquepermalinks = list(dict.fromkeys(permalink for permalink in permalinks if permalink))
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            companies = dict(zip(uniquepermalinks, executor.map(self._organization, uniquepermalinks)))
+        self.cache.save()
+
+        return [[self._toMember(permalink, companies[permalink])] if permalink and companies[permalink] else [] for permalink in permalinks]
+
+    #
+    # Search and organization responses are cached as plain dicts, keyed by the normalized
+    # name and the permalink respectively. Empty responses are cached as negative entries.
+    # A failed request, such as when rate limited, is logged and treated as no match for
+    # this run without being cached, so one failure doesn't abort the whole batch.
+    #
+    def _search(self, org):
+        key = 'search:'+self.normalizeCompany(org).lower()
+        found, results = self.cache.get(key)
+        if found:
+            return results
+
+        try:
+            with self.ratelimiter:
+                metrics.increment('crunchbaseapi.requests')
+                response = self.client.organizations(org)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Crunchbase API search for %s failed - %s", org, e)
+            metrics.increment('crunchbaseapi.errors')
+            return []
+
+        results = [{'name': result.name, 'permalink': result.permalink} for result in response] if response else []
+        self.cache.set(key, results, negative = not results)
+
+        return results
+
+    def _organization(self, permalink):
+        key = 'organization:'+permalink
+        found, company = self.cache.get(key)
+        if found:
+            return company
+
+        try:
+            with self.ratelimiter:
+                metrics.increment('crunchbaseapi.requests')
+                response = self.client.organization(permalink)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Crunchbase API lookup of %s failed - %s", permalink, e)
+            metrics.increment('crunchbaseapi.errors')
+            return None
+
+        company = {'name': response.name, 'homepage_url': response.homepage_url} if response else None
+        self.cache.set(key, company, negative = company is None)
+
+        return company
 
+    def _toMember(self, permalink, company):
+        member = Member()
+        try:
+            member.orgname = company['name']
+        except ValueError as e:
+            pass
+        try:
+            member.website = self.normalizeURL(company['homepage_url'])
+        except ValueError as e:
+            pass
+        try:
+            member.crunchbase = "https://www.crunchbase.com/organization/{org}".format(org=permalink)
+        except ValueError as e:
+            pass
 
+        return member
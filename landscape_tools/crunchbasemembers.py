@@ -6,46 +6,427 @@
 # encoding=utf8
 
 ## built in modules
+import contextlib
 import csv
-import os.path
+import gzip
+import io
+import itertools
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tarfile
+import tempfile
+import threading
 
+from landscape_tools import urls
 from landscape_tools.members import Members
 from landscape_tools.member import Member
+from landscape_tools.domains import siteKey
+from landscape_tools.fuzzymatch import FuzzyIndex
 
+logger = logging.getLogger(__name__)
+
+#
+# Members from the Crunchbase bulk export. bulkdatafile can be organizations.csv itself,
+# organizations.csv compressed with gzip ( .csv.gz ) or zstandard ( .csv.zst ), or the
+# bulk export tarball as downloaded ( .tar.gz or .tar.zst ). Compressed files are
+# decompressed and parsed as they are read, in a single pass, without extracting them to
+# disk; for tarballs the organizations.csv member is found by name and the rest skipped.
+# zstandard is optional and only imported when reading a .zst file.
+#
 class CrunchbaseMembers(Members):
 
     bulkdatafile = 'organizations.csv'
+    # looked for in order when bulkdatafile isn't given and organizations.csv doesn't exist
+    bulkdatafallbacks = ['organizations.csv.gz', 'organizations.csv.zst', 'bulk_export.tar.gz', 'bulk_export.tar.zst']
+    # name of the member to read from a bulk export tarball
+    tarmember = 'organizations.csv'
+    # uncompressed / compressed size, for estimating the size of a compressed file when it
+    # doesn't record its uncompressed size
+    compressionRatio = 5
+    # Member attribute for each column used, looked up by name in the header row
+    columns = {'name': 'orgname', 'homepage_url': 'website', 'cb_url': 'crunchbase'}
+    # positions of the columns used if the header row doesn't name them
+    defaultColumns = (1, 11, 4)
+    # If more than 1, an uncompressed bulk export is parsed in this many worker processes,
+    # each taking byte ranges of at least chunkBytes at a time
+    loadWorkers = None
+    chunkBytes = 16*1024*1024
+
+    # If set, the bulk export is loaded into an on-disk sqlite index instead of memory when
+    # the estimated size of the loaded members would exceed memoryBudget bytes.
+    memoryBudget = None
+    # approximate bytes used by each Member loaded from the bulk export
+    memberBytes = 450
+    # rows read to estimate the average row size
+    samplerows = 1000
+    indexed = False
+    indexfile = None
+    _index = None
+    _indexLock = None
+    _tempindexfile = False
+    _permalinks = None
 
-    def __init__(self, bulkdatafile = None, loadData = False):
+    def __init__(self, bulkdatafile = None, loadData = False, memoryBudget = None):
         if bulkdatafile:
             self.bulkdatafile = bulkdatafile
+        elif not os.path.isfile(self.bulkdatafile):
+            self.bulkdatafile = next((fallback for fallback in self.bulkdatafallbacks if os.path.isfile(fallback)), self.bulkdatafile)
+        if memoryBudget:
+            self.memoryBudget = memoryBudget
         super().__init__(loadData)
 
     def loadData(self):
-        if os.path.isfile(self.bulkdatafile):
-            print("--Loading Crunchbase bulk export data--")
+        if not os.path.isfile(self.bulkdatafile):
+            return
+
+        if self.loadWorkers and self.loadWorkers > 1 and not self._compressed():
+            if self.memoryBudget and self.estimateMemory() > self.memoryBudget:
+                logger.info("--Loading Crunchbase bulk export data into an on-disk index with %d workers to stay within the memory budget--", self.loadWorkers)
+                self._createIndex()
+                self._fillIndex(record for records in self._parseParallel() for record in records)
+                return
+
+            logger.info("--Loading Crunchbase bulk export data with %d workers--", self.loadWorkers)
+            self._mergeParallel(self._parseParallel())
+            return
+
+        # the memory estimate is made from the first rows read, which are then parsed along
+        # with the rest so the file is only read once
+        with self._open() as (csvfile, size):
+            sample = list(itertools.islice(csvfile, self.samplerows))
+            rows = self._reader(itertools.chain(sample, csvfile))
+            if self.memoryBudget and self._estimate(size, sample) > self.memoryBudget:
+                logger.info("--Loading Crunchbase bulk export data into an on-disk index to stay within the memory budget--")
+                self.loadIndex(rows)
+                return
+
+            logger.info("--Loading Crunchbase bulk export data--")
+            for orgname, website, crunchbase in rows:
+                self.members.append(self._toMember(orgname, website, crunchbase))
+
+    def _rows(self):
+        with self._open() as (csvfile, size):
+            yield from self._reader(csvfile)
+
+    # (orgname, website, crunchbase) for each row after the header
+    def _reader(self, lines):
+        memberreader = csv.reader(lines, delimiter=',', quotechar='"')
+
+        return self._project(memberreader, self._columnPositions(next(memberreader, None)))
+
+    def _columnPositions(self, header):
+        positions = dict(zip(self.columns.values(), self.defaultColumns))
+        for position, field in enumerate(header or []):
+            if field.strip() in self.columns:
+                positions[self.columns[field.strip()]] = position
+
+        return positions['orgname'], positions['website'], positions['crunchbase']
+
+    def _project(self, rows, positions):
+        orgnamecolumn, websitecolumn, crunchbasecolumn = positions
+        width = max(positions)
+        for row in rows:
+            if len(row) > width:
+                yield row[orgnamecolumn], row[websitecolumn], row[crunchbasecolumn]
+
+    def _compressed(self):
+        return self.bulkdatafile.lower().endswith(('.gz', '.tgz', '.zst'))
+
+    #
+    # Opens bulkdatafile for reading as text, decompressing it as it's read. Yields the
+    # file and the size of the uncompressed CSV data in bytes, or None if that isn't known
+    # without reading it all.
+    #
+    @contextlib.contextmanager
+    def _open(self):
+        filename = self.bulkdatafile.lower()
+        if filename.endswith('.tar.gz') or filename.endswith('.tgz'):
+            with tarfile.open(self.bulkdatafile, mode='r|gz') as tar:
+                with self._openTarMember(tar) as opened:
+                    yield opened
+        elif filename.endswith('.gz'):
+            with gzip.open(self.bulkdatafile, mode='rt', encoding='utf8', newline='') as csvfile:
+                yield csvfile, self._gzipSize()
+        elif filename.endswith('.zst'):
+            zstandard = self._zstandard()
+            with open(self.bulkdatafile, 'rb') as fp:
+                size = zstandard.frame_content_size(fp.read(18))
+                fp.seek(0)
+                with zstandard.ZstdDecompressor().stream_reader(fp) as stream:
+                    if filename.endswith('.tar.zst'):
+                        with tarfile.open(fileobj=stream, mode='r|') as tar:
+                            with self._openTarMember(tar) as opened:
+                                yield opened
+                    else:
+                        yield io.TextIOWrapper(stream, encoding='utf8', newline=''), size if size >= 0 else None
+        else:
             with open(self.bulkdatafile, newline='') as csvfile:
-                memberreader = csv.reader(csvfile, delimiter=',', quotechar='"')
-                fields = next(memberreader)
-                for row in memberreader:
-                    member = Member()
-                    try:
-                        member.membership = ''
-                    except ValueError as e:
-                        pass # avoids all the Exceptions for logo
-                    try:
-                        member.orgname = row[1]
-                    except ValueError as e:
-                        pass # avoids all the Exceptions for logo
-                    try:
-                        member.website = row[11]
-                    except ValueError as e:
-                        pass # avoids all the Exceptions for logo
-                    try:
-                        member.crunchbase = row[4]
-                    except ValueError as e:
-                        pass # avoids all the Exceptions for logo
-
-                    self.members.append(member)
+                yield csvfile, os.path.getsize(self.bulkdatafile)
+
+    # tar is read as a stream, so members can only be read in the order they are in. Files
+    # extracted from a streamed tar can't be wrapped in a TextIOWrapper, so lines are
+    # decoded as they are read.
+    @contextlib.contextmanager
+    def _openTarMember(self, tar):
+        for tarinfo in tar:
+            if tarinfo.isfile() and os.path.basename(tarinfo.name) == self.tarmember:
+                with tar.extractfile(tarinfo) as fp:
+                    yield (line.decode('utf8') for line in fp), tarinfo.size
+                return
+
+        raise ValueError("{} not found in {}".format(self.tarmember, self.bulkdatafile))
+
+    # gzip records the uncompressed size modulo 2^32 in its last 4 bytes
+    def _gzipSize(self):
+        compressed = os.path.getsize(self.bulkdatafile)
+        with open(self.bulkdatafile, 'rb') as fp:
+            fp.seek(-4, os.SEEK_END)
+            size = int.from_bytes(fp.read(4), 'little')
+        while size < compressed:
+            size += 2**32
+
+        return size
+
+    def _zstandard(self):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading {} needs the zstandard module - install it with 'pip install zstandard'".format(self.bulkdatafile))
+
+        return zstandard
+
+    def _toMember(self, orgname, website, crunchbase):
+        member = Member()
+        try:
+            member.membership = ''
+        except ValueError as e:
+            pass # avoids all the Exceptions for logo
+        try:
+            member.orgname = orgname
+        except ValueError as e:
+            pass # avoids all the Exceptions for logo
+        try:
+            member.website = website
+        except ValueError as e:
+            pass # avoids all the Exceptions for logo
+        try:
+            member.crunchbase = crunchbase
+        except ValueError as e:
+            pass # avoids all the Exceptions for logo
+
+        return member
+
+    #
+    # Estimate how much memory loading the bulk export would take from the average row size
+    # of the first rows in the file.
+    #
+    def estimateMemory(self, samplerows = None):
+        with self._open() as (csvfile, size):
+            return self._estimate(size, list(itertools.islice(csvfile, samplerows or self.samplerows)))
+
+    def _estimate(self, size, sample):
+        if size is None:
+            size = os.path.getsize(self.bulkdatafile) * self.compressionRatio
+        samplesize = sum(len(line.encode('utf8')) for line in sample)
+        rows = size / (samplesize / len(sample)) if samplesize else 0
+
+        return rows * self.memberBytes
+
+    #
+    # Parallel loading splits the file into byte ranges ending on a row boundary and parses
+    # each range in a worker process. Workers normalize the names and URLs as they parse,
+    # returning records of (normalizedorg, orgname, website, domain, crunchbase, permalink),
+    # so the main process only has to merge them into the members list and its indexes.
+    # Records come back in file order, so the result is the same as loading serially.
+    #
+    def _parseParallel(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        with open(self.bulkdatafile, 'rb') as fp:
+            header = fp.readline()
+        positions = self._columnPositions(next(csv.reader([header.decode('utf8')]), None))
+        ranges = self.byteRanges(self.loadWorkers * 4)
+        # the workers only need the file and offsets, so they are started fresh rather than
+        # forked; the bulk export is loaded while HTTP client and service threads are running,
+        # and a forked worker could inherit a lock one of them held
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+        with ProcessPoolExecutor(max_workers=self.loadWorkers, mp_context=context) as executor:
+            yield from executor.map(_parseRange, [self.bulkdatafile] * len(ranges), [start for start, end in ranges], [end for start, end in ranges], [positions] * len(ranges))
+
+    #
+    # Splits the rows after the header into about chunks byte ranges of at least
+    # chunkBytes, returned as (start, end) offsets. A range only ends on a newline that's
+    # outside a quoted field, which is when the number of quote characters before it is
+    # even, since quotes inside quoted fields are doubled.
+    #
+    def byteRanges(self, chunks):
+        size = os.path.getsize(self.bulkdatafile)
+        with open(self.bulkdatafile, 'rb') as fp:
+            quotes = 0
+            offsets = []
+            targets = []
+            rangeBytes = max(size // max(chunks, 1), self.chunkBytes)
+            while True:
+                # scan to the end of the record the target offset falls in
+                line = fp.readline()
+                quotes += line.count(b'"')
+                if line and quotes % 2:
+                    continue
+                position = fp.tell()
+                offsets.append(position)
+                if not line or position >= size:
+                    break
+                target = position + rangeBytes
+                # count the quotes up to the next target offset in blocks
+                while position < min(target, size):
+                    block = fp.read(min(1024*1024, target - position))
+                    quotes += block.count(b'"')
+                    position += len(block)
+            if offsets[-1] < size:
+                offsets.append(size)
+
+        return [(start, end) for start, end in zip(offsets, offsets[1:]) if end > start]
+
+    # records for the rows between the byte offsets start and end
+    def parseRange(self, start, end, positions):
+        with open(self.bulkdatafile, 'rb') as fp:
+            fp.seek(start)
+            data = fp.read(end - start).decode('utf8')
+        rows = csv.reader(io.StringIO(data, newline=''), delimiter=',', quotechar='"')
+
+        return [self._record(orgname, website, crunchbase) for orgname, website, crunchbase in self._project(rows, positions)]
+
+    # the normalized values stored for a member; website and crunchbase are None if invalid
+    def _record(self, orgname, website, crunchbase):
+        website = urls.normalizeWebsite(website)
+        crunchbase = urls.normalizeCrunchbase(crunchbase)
+
+        return (self.normalizeCompany(orgname), orgname, website, siteKey(website), crunchbase, urls.crunchbasePermalink(crunchbase) if crunchbase else None)
+
+    def _mergeParallel(self, parsed):
+        self.index()
+        permalinks = self.permalinkIndex()
+        for records in parsed:
+            for normalizedorg, orgname, website, domain, crunchbase, permalink in records:
+                position = len(self.members)
+                self.members.append(Member.fromNormalized(orgname, website, crunchbase, membership = ''))
+                self._names.setdefault(normalizedorg, []).append(position)
+                if domain:
+                    self._domains.setdefault(domain, []).append(position)
+                if permalink:
+                    permalinks.setdefault(permalink, []).append(position)
+        self._indexed = len(self.members)
+        self._permalinks = (len(self.members), permalinks, self.members)
+
+    #
+    # Indexed mode keeps just the columns used for matching in sqlite, so only the rows
+    # returned by find() are turned into Member objects.
+    #
+    def loadIndex(self, rows = None):
+        self._createIndex()
+        self._fillIndex(self._record(orgname, website, crunchbase) for orgname, website, crunchbase in (rows if rows is not None else self._rows()))
+
+    def _createIndex(self):
+        if not self.indexfile:
+            fd, self.indexfile = tempfile.mkstemp(suffix='.sqlite')
+            os.close(fd)
+            self._tempindexfile = True
+        self._connectIndex(self.indexfile)
+        self._index.execute("DROP TABLE IF EXISTS members")
+        self._index.execute("CREATE TABLE members (normalizedorg TEXT, orgname TEXT, website TEXT, domain TEXT, crunchbase TEXT, permalink TEXT)")
+
+    def _fillIndex(self, records):
+        self._index.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?, ?)", records)
+        self._index.execute("CREATE INDEX members_normalizedorg ON members (normalizedorg)")
+        self._index.execute("CREATE INDEX members_domain ON members (domain)")
+        self._index.execute("CREATE INDEX members_permalink ON members (permalink)")
+        self._index.commit()
+        self.indexed = True
+
+    #
+    # Reopens the index read only; used by worker processes forked from the one that
+    # built it, since sqlite connections can't be shared across a fork.
+    #
+    def attachIndex(self):
+        if self.indexed:
+            self._connectIndex('file:{}?mode=ro'.format(self.indexfile), uri=True)
+            # the index belongs to the process that built it
+            self._tempindexfile = False
+
+    #
+    # The index is loaded on one thread and searched from others when serving builds, so
+    # its connection is shared between threads with a lock around each query
+    #
+    def _connectIndex(self, database, **kwargs):
+        self._index = sqlite3.connect(database, check_same_thread=False, **kwargs)
+        self._indexLock = threading.Lock()
+
+    def _query(self, sql, parameters):
+        with self._indexLock:
+            return self._index.execute(sql, parameters).fetchall()
+
+    def find(self, org, website):
+        if not self.indexed:
+            return super().find(org, website)
+
+        found = []
+        for orgname, memberwebsite, crunchbase in self._query(
+                "SELECT orgname, website, crunchbase FROM members WHERE normalizedorg = ? OR domain = ?",
+                (self.normalizeCompany(org), siteKey(website))
+                ):
+            found.append(self._toMember(orgname, memberwebsite, crunchbase))
+
+        return found
+
+    #
+    # The fuzzy index takes a few times the memory of the members it's built over, so with a
+    # memory budget Crunchbase isn't fuzzy matched and an empty index is returned
+    #
+    def fuzzyIndex(self):
+        if self.memoryBudget:
+            return FuzzyIndex()
+
+        return super().fuzzyIndex()
+
+    #
+    # Members with the given crunchbase permalink, found through an index built the first
+    # time it's called
+    #
+    def findByPermalink(self, permalink):
+        if not permalink:
+            return []
+        permalink = permalink.lower()
+        if self.indexed:
+            return [self._toMember(orgname, website, crunchbase) for orgname, website, crunchbase in self._query(
+                "SELECT orgname, website, crunchbase FROM members WHERE permalink = ?",
+                (permalink,)
+                )]
+
+        return [self.members[position] for position in self.permalinkIndex().get(permalink, [])]
+
+    def permalinkIndex(self):
+        if self._permalinks is None or self._permalinks[2] is not self.members or self._permalinks[0] > len(self.members):
+            self._permalinks = (0, {}, self.members)
+        indexed, permalinks, members = self._permalinks
+        for position in range(indexed, len(self.members)):
+            permalink = self.members[position].crunchbasePermalink
+            if permalink:
+                permalinks.setdefault(permalink, []).append(position)
+        self._permalinks = (len(self.members), permalinks, self.members)
+
+        return permalinks
 
+    def close(self):
+        if self._index:
+            with self._indexLock:
+                self._index.close()
+                self._index = None
+            self.indexed = False
+        if self._tempindexfile and os.path.isfile(self.indexfile):
+            os.remove(self.indexfile)
 
+# worker process entry point for CrunchbaseMembers._parseParallel()
+def _parseRange(bulkdatafile, start, end, positions):
+    return CrunchbaseMembers(bulkdatafile = bulkdatafile).parseRange(start, end, positions)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import ipaddress
+import os
+import threading
+from urllib.parse import urlsplit
+
+#
+# Public suffix rules, used to find the registered domain ( eTLD+1 ) of a website so that
+# https://www.foo.com/about and http://foo.com are seen as the same site. Rules are read
+# from a file in the Public Suffix List format; the full list, including the private
+# domains section, is bundled with landscape_tools and used by default so no network access
+# is needed.
+#
+class SuffixList:
+
+    suffixfile = os.path.join(os.path.dirname(__file__), 'public_suffix_list.dat')
+    # sites where many unrelated organizations have pages, so the registered domain doesn't
+    # say whose website it is; siteKey() keeps the path for these
+    sharedHosts = {
+        'github.com', 'gitlab.com', 'bitbucket.org', 'sourceforge.net', 'linkedin.com',
+        'facebook.com', 'twitter.com', 'x.com', 'instagram.com', 'youtube.com', 'medium.com',
+        'google.com', 'wix.com', 'wordpress.com', 'tumblr.com', 'substack.com', 'notion.site',
+        'angel.co', 'crunchbase.com', 'meetup.com', 'npmjs.com', 'about.me', 'linktr.ee',
+        'opencollective.com', 'eventbrite.com'
+    }
+
+    def __init__(self, suffixfile = None):
+        if suffixfile:
+            self.suffixfile = suffixfile
+        self.rules = set()
+        self.wildcards = set()
+        self.exceptions = set()
+        with open(self.suffixfile, encoding='utf8') as fp:
+            for line in fp:
+                rule = line.strip().split(' ')[0].lower()
+                if not rule or rule.startswith('//'):
+                    continue
+                if rule.startswith('!'):
+                    self.exceptions.add(rule[1:])
+                elif rule.startswith('*.'):
+                    self.wildcards.add(rule[2:])
+                else:
+                    self.rules.add(rule)
+
+    def hostname(self, url):
+        if not url:
+            return None
+        if '//' not in url:
+            url = '//' + url
+        try:
+            return urlsplit(url.strip()).hostname
+        except ValueError:
+            return None
+
+    #
+    # Returns the public suffix of hostname, or the last label if no rule matches
+    #
+    def suffix(self, hostname):
+        labels = hostname.split('.')
+        for i in range(len(labels)):
+            candidate = '.'.join(labels[i:])
+            if candidate in self.exceptions:
+                return '.'.join(labels[i+1:])
+            if candidate in self.rules or '.'.join(labels[i+1:]) in self.wildcards:
+                return candidate
+
+        return labels[-1]
+
+    #
+    # Returns the registered domain for url, the host itself for IP addresses, or None if
+    # there isn't one ( no host, or the host is a public suffix )
+    #
+    def registeredDomain(self, url):
+        hostname = self.hostname(url)
+        if not hostname:
+            return None
+        hostname = hostname.rstrip('.')
+        try:
+            ipaddress.ip_address(hostname)
+            return hostname
+        except ValueError:
+            pass
+
+        suffix = self.suffix(hostname)
+        if hostname == suffix:
+            return None
+
+        return '.'.join(hostname[:-len(suffix)-1].split('.')[-1:] + [suffix])
+
+    #
+    # Returns what identifies the site at url: its registered domain, or for shared hosts
+    # the host and path, such as github.com/foo. None if there isn't one, including the
+    # front page of a shared host.
+    #
+    def siteKey(self, url):
+        domain = self.registeredDomain(url)
+        if domain not in self.sharedHosts:
+            return domain
+        if '//' not in url:
+            url = '//' + url
+        try:
+            path = urlsplit(url.strip()).path.rstrip('/').lower()
+        except ValueError:
+            return None
+        if not path:
+            return None
+        hostname = self.hostname(url).rstrip('.')
+        if hostname.startswith('www.'):
+            hostname = hostname[4:]
+
+        return hostname + path
+
+_suffixes = None
+_suffixesLock = threading.Lock()
+
+def _suffixList():
+    global _suffixes
+    if _suffixes is None:
+        with _suffixesLock:
+            if _suffixes is None:
+                _suffixes = SuffixList()
+
+    return _suffixes
+
+#
+# Returns the registered domain of url using the bundled suffix list
+#
+def registeredDomain(url):
+    return _suffixList().registeredDomain(url)
+
+#
+# Returns the key websites are matched on using the bundled suffix list; see
+# SuffixList.siteKey()
+#
+def siteKey(url):
+    return _suffixList().siteKey(url)
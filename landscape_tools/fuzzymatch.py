@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import math
+import re
+import unicodedata
+
+#
+# Fuzzy organization name matching for when normalized names don't match exactly, such as
+# 'Intl.' versus 'International', accented characters or words in a different order.
+#
+# Names are reduced to a canonical form ( accents and punctuation removed, abbreviations
+# expanded, legal suffixes dropped and words sorted ) and compared by the Jaccard
+# similarity of their character n-grams. An inverted index from n-gram to names blocks the
+# search: only names sharing one of the query's rarest n-grams are scored. Taking enough
+# of them that any name over the threshold has to share at least one keeps the results the
+# same as scoring every name, unless maxCandidates is set.
+#
+class FuzzyIndex:
+
+    threshold = 0.8
+    ngram = 3
+    # If set, at most this many names are scored for a single query, keeping the ones
+    # sharing the most n-grams. This bounds the time a query with only common n-grams can
+    # take, but a name over the threshold can then be missed.
+    maxCandidates = None
+
+    abbreviations = {
+        'intl': 'international',
+        'univ': 'university',
+        'assoc': 'association',
+        'assn': 'association',
+        'natl': 'national',
+        'mfg': 'manufacturing',
+        'svcs': 'services',
+        'tech': 'technology',
+        'technologies': 'technology',
+        'labs': 'laboratories',
+        'lab': 'laboratories',
+        '&': 'and'
+    }
+    stopwords = ['the', 'and', 'of', 'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'llc', 'llp', 'plc', 'gmbh', 'ag', 'sa', 'bv', 'ab', 'pty', 'pte', 'srl', 'spa']
+
+    def __init__(self, names = None, threshold = None, ngram = None):
+        if threshold:
+            self.threshold = threshold
+        if ngram:
+            self.ngram = ngram
+        self.grams = []
+        self.postings = {}
+        for name in names or []:
+            self.add(name)
+
+    def canonicalName(self, name):
+        if not name:
+            return ''
+        name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+        name = name.replace('&', ' & ')
+        tokens = []
+        for token in re.split(r"[^\w&]+", name.replace("'", '')):
+            token = self.abbreviations.get(token, token)
+            if token and token not in self.stopwords:
+                tokens.append(token)
+
+        return ' '.join(sorted(tokens))
+
+    def ngrams(self, name):
+        padded = ' {} '.format(self.canonicalName(name))
+        if len(padded) <= self.ngram:
+            return frozenset([padded]) if padded.strip() else frozenset()
+
+        return frozenset(padded[i:i+self.ngram] for i in range(len(padded) - self.ngram + 1))
+
+    # adds name to the index, returning its position
+    def add(self, name):
+        position = len(self.grams)
+        grams = self.ngrams(name)
+        self.grams.append(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(position)
+
+        return position
+
+    def __len__(self):
+        return len(self.grams)
+
+    #
+    # Positions of the names that could score at least threshold against grams
+    #
+    def candidates(self, grams, threshold):
+        # a name with Jaccard similarity >= threshold shares at least threshold * |grams|
+        # of them, so it must share one of any len(grams) - that + 1 of them
+        blockSize = len(grams) - math.ceil(threshold * len(grams)) + 1
+        blockGrams = sorted((gram for gram in grams if gram in self.postings), key=lambda gram: len(self.postings[gram]))[:blockSize]
+        shared = {}
+        for gram in blockGrams:
+            for position in self.postings[gram]:
+                shared[position] = shared.get(position, 0) + 1
+        if self.maxCandidates and len(shared) > self.maxCandidates:
+            return sorted(shared, key=lambda position: -shared[position])[:self.maxCandidates]
+
+        return list(shared)
+
+    #
+    # Returns a list of (position, score) for names scoring at least threshold against
+    # name, best first
+    #
+    def search(self, name, threshold = None):
+        return self.search_many([name], threshold)[0]
+
+    def search_many(self, names, threshold = None):
+        threshold = threshold if threshold else self.threshold
+        results = []
+        for name in names:
+            grams = self.ngrams(name)
+            if not grams:
+                results.append([])
+                continue
+            # score the candidate set in one pass; Jaccard from the intersection size
+            # avoids building the union
+            scored = []
+            for position in self.candidates(grams, threshold):
+                candidate = self.grams[position]
+                intersection = len(grams & candidate)
+                score = intersection / (len(grams) + len(candidate) - intersection)
+                if score >= threshold:
+                    scored.append((position, score))
+            scored.sort(key=lambda match: (-match[1], match[0]))
+            results.append(scored)
+
+        return results
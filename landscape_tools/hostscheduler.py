@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+## third party modules
+import requests
+
+from landscape_tools.ratelimiter import RateLimiter
+from landscape_tools.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+#
+# Raised instead of making a request to a host whose circuit breaker is open. It is a
+# ConnectionError so callers handle it the same way as the host being unreachable.
+#
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+#
+# Opens after failureThreshold failures in a row, failing requests fast until resetTimeout
+# seconds have passed. After that a single trial request is let through; if it succeeds
+# the breaker closes, otherwise it opens again.
+#
+class CircuitBreaker:
+
+    failureThreshold = 5
+    resetTimeout = 60
+
+    def __init__(self, failureThreshold = None, resetTimeout = None):
+        if failureThreshold:
+            self.failureThreshold = failureThreshold
+        if resetTimeout is not None:
+            self.resetTimeout = resetTimeout
+        self.failures = 0
+        self.openedAt = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.openedAt is None:
+            return 'closed'
+        if time.monotonic() - self.openedAt >= self.resetTimeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.openedAt = None
+            self._trial = False
+
+    # returns True if this failure opened the breaker
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.openedAt is not None or self.failures >= self.failureThreshold:
+                opened = self.openedAt is None
+                self.openedAt = time.monotonic()
+                return opened
+            return False
+
+#
+# Per host request limits: a cap on concurrent requests, a token bucket rate limit and a
+# circuit breaker. Latency and failures for each host are recorded in the run metrics.
+#
+class HostScheduler:
+
+    # most member logos are served from the same host, so these are kept generous
+    maxPerHost = 8
+    requestsPerSecond = 50
+    burst = 50
+    failureThreshold = 5
+    resetTimeout = 60
+
+    def __init__(self, maxPerHost = None, requestsPerSecond = None, failureThreshold = None, resetTimeout = None):
+        if maxPerHost:
+            self.maxPerHost = maxPerHost
+        if requestsPerSecond:
+            self.requestsPerSecond = requestsPerSecond
+            self.burst = requestsPerSecond
+        if failureThreshold:
+            self.failureThreshold = failureThreshold
+        if resetTimeout is not None:
+            self.resetTimeout = resetTimeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url):
+        hostname = urlsplit(url).netloc.lower()
+        with self._lock:
+            if hostname not in self._hosts:
+                self._hosts[hostname] = {
+                    'ratelimiter': RateLimiter(rate=self.requestsPerSecond, burst=self.burst),
+                    'breaker': CircuitBreaker(failureThreshold=self.failureThreshold, resetTimeout=self.resetTimeout),
+                    # asyncio primitives are bound to the loop they are first used in
+                    'semaphores': weakref.WeakKeyDictionary()
+                }
+            return hostname, self._hosts[hostname]
+
+    def breaker(self, url):
+        return self.host(url)[1]['breaker']
+
+    #
+    # Wraps a request to url; raises CircuitOpenError if the host's breaker is open.
+    # Exceptions and 5xx responses count as failures for the host; callers report the
+    # response status through the yielded function.
+    #
+    @asynccontextmanager
+    async def request(self, url):
+        hostname, host = self.host(url)
+        if not host['breaker'].allow():
+            metrics.increment('http.circuitopen.rejected')
+            raise CircuitOpenError("Circuit open for {} after repeated failures".format(hostname))
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = host['semaphores'].setdefault(loop, asyncio.Semaphore(self.maxPerHost))
+        async with semaphore:
+            # the breaker may have opened while this request was waiting
+            if host['breaker'].state == 'open':
+                metrics.increment('http.circuitopen.rejected')
+                raise CircuitOpenError("Circuit open for {} after repeated failures".format(hostname))
+            await host['ratelimiter'].acquireAsync()
+            start = time.perf_counter()
+            status = {'failed': False}
+            def failed(isfailed = True):
+                status['failed'] = isfailed
+            try:
+                yield failed
+            except Exception:
+                status['failed'] = True
+                raise
+            finally:
+                metrics.recordHost(hostname, time.perf_counter() - start, status['failed'])
+                if status['failed']:
+                    if host['breaker'].failure():
+                        metrics.increment('http.circuitopen')
+                        logger.warning("Too many failures from %s - skipping requests to it for %d seconds", hostname, host['breaker'].resetTimeout)
+                else:
+                    host['breaker'].success()
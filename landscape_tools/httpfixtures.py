@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import base64
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+## third party modules
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+#
+# Records every HTTP exchange made through requests into a gzipped JSON archive, or replays
+# them from one without touching the network. All requests made by the loaders, the
+# Crunchbase API client and hostLogo go through HTTPAdapter.send(), so that is what gets
+# swapped out while the fixtures are active.
+#
+# Responses are matched on method and URL; if the same URL was fetched more than once the
+# responses are replayed in order, with the last one repeated.
+#
+class HTTPFixtures:
+
+    archive = None
+    mode = 'replay'
+    # seconds to sleep before returning each replayed response
+    latency = 0
+    # query parameters that hold credentials and shouldn't be written to the archive
+    scrubParams = ['user_key', 'key', 'api_key']
+
+    def __init__(self, archive = None, mode = None, latency = None):
+        if archive:
+            self.archive = archive
+        if mode:
+            if mode not in ['record', 'replay']:
+                raise ValueError("HTTPFixtures mode must be 'record' or 'replay' - '{}' provided".format(mode))
+            self.mode = mode
+        if latency is not None:
+            self.latency = latency
+        self.exchanges = {}
+        self._replayed = {}
+        self._lock = threading.Lock()
+        self._send = None
+
+    def start(self):
+        if self.mode == 'replay':
+            self.load()
+        self._send = HTTPAdapter.send
+        fixtures = self
+        def send(adapter, request, *args, **kwargs):
+            return fixtures.send(adapter, request, *args, **kwargs)
+        HTTPAdapter.send = send
+
+        return self
+
+    def stop(self):
+        if self._send:
+            HTTPAdapter.send = self._send
+            self._send = None
+        if self.mode == 'record':
+            self.save()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def key(self, method, url):
+        return method.upper()+' '+self.scrubURL(url)
+
+    def scrubURL(self, url):
+        parts = urlsplit(url)
+        query = urlencode([(name, 'REDACTED' if name in self.scrubParams else value) for name, value in parse_qsl(parts.query, keep_blank_values=True)])
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, query, parts.fragment))
+
+    def send(self, adapter, request, *args, **kwargs):
+        key = self.key(request.method, request.url)
+        if self.mode == 'record':
+            response = self._send(adapter, request, *args, **kwargs)
+            with self._lock:
+                self.exchanges.setdefault(key, []).append({
+                    'status': response.status_code,
+                    'reason': response.reason,
+                    'headers': dict(response.headers),
+                    'url': self.scrubURL(response.url),
+                    'content': base64.b64encode(response.content).decode('ascii')
+                    })
+            return response
+
+        with self._lock:
+            recorded = self.exchanges.get(key)
+            if not recorded:
+                raise requests.exceptions.ConnectionError("No recorded response for {}".format(key), request=request)
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+            exchange = recorded[min(index, len(recorded) - 1)]
+        if self.latency:
+            time.sleep(self.latency)
+
+        return self.buildResponse(request, exchange)
+
+    def buildResponse(self, request, exchange):
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.reason = exchange['reason']
+        response.headers = CaseInsensitiveDict(exchange['headers'])
+        # the archive holds the decoded body, so drop any encoding headers
+        response.headers.pop('Content-Encoding', None)
+        response.headers.pop('Transfer-Encoding', None)
+        response.url = exchange['url']
+        response.request = request
+        response._content = base64.b64decode(exchange['content'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+
+        return response
+
+    def load(self):
+        with gzip.open(self.archive, 'rt', encoding='utf8') as fp:
+            self.exchanges = json.load(fp)['exchanges']
+        logger.info("Replaying %d recorded HTTP requests from %s", sum(len(exchanges) for exchanges in self.exchanges.values()), self.archive)
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.archive))
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            with gzip.open(tmp, 'wt', encoding='utf8') as fp:
+                json.dump({'exchanges': self.exchanges}, fp)
+        os.replace(tmp.name, self.archive)
+        logger.info("Recorded %d HTTP requests to %s", sum(len(exchanges) for exchanges in self.exchanges.values()), self.archive)
@@ -5,13 +5,66 @@
 #
 # encoding=utf8
 
-## third party modules
-import ruamel.yaml
-import requests
+## built in modules
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
 
 from landscape_tools.members import Members
 from landscape_tools.member import Member
+from landscape_tools.metrics import metrics
+from landscape_tools.localsource import LocalLandscapes
+from landscape_tools import asynchttp
 
+logger = logging.getLogger(__name__)
+
+# marks an attribute a member in another landscape doesn't have; pickles by reference so
+# it stays the same object when members are checkpointed or sent to worker processes
+class _Missing:
+
+    def __reduce__(self):
+        return '_MISSING'
+
+    def __repr__(self):
+        return '_MISSING'
+
+_MISSING = _Missing()
+
+# copy of a value loaded from YAML as plain dicts, lists, strings and numbers
+def _plain(value):
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    for plaintype in (str, int, float):
+        if isinstance(value, plaintype):
+            return plaintype(value)
+
+    return value
+
+#
+# The same organization is often listed in many landscapes, so entries are collapsed into
+# one member per normalized name, website and crunchbase URL as they are loaded. Each
+# member keeps a provenance list of (sequence, landscape, changes) with one entry for each
+# landscape listing it, where changes holds the attributes ( such as the logo or twitter )
+# that differ from the first listing. find() returns a member for every listing in the
+# order they were loaded, so overlaying them gives the same result as before.
+#
+# If cachefile is set, the members extracted from each landscape are saved to it along with
+# a fingerprint of the settings.yml and landscape.yml they came from. Landscapes whose
+# files haven't changed since are loaded from the cache rather than parsing their YAML.
+#
+# If landscapesDir is set, landscapes.yml and each landscape's files are read from repos
+# cloned or mirrored under it ( see LocalLandscapes ) instead of being downloaded. Logos are
+# still given as URLs, which LandscapeOutput reads from the local repo ( see
+# readLocalLogo() ) before falling back to downloading them.
+#
 class LandscapeMembers(Members):
 
     landscapeListYAML = 'https://raw.githubusercontent.com/cncf/landscapeapp/master/landscapes.yml'
@@ -19,76 +72,269 @@ class LandscapeMembers(Members):
     landscapeLandscapeYAML = 'https://raw.githubusercontent.com/{repo}/master/landscape.yml'
     landscapeLogo = 'https://raw.githubusercontent.com/{repo}/master/hosted_logos/{logo}'
     skipLandscapes = ['openjsf']
+    landscapesDir = None
+    # repo landscapes.yml is read from when using landscapesDir
+    landscapeListRepo = 'cncf/landscapeapp'
+    _source = None
+    _logoSource = None
+    cachefile = None
+    # if set, cachefile is read but not written, such as when planning changes
+    cacheReadOnly = False
+    # bump when the extracted members change shape so old caches are ignored
+    cacheVersion = 4
 
     def __init__(self, landscapeListYAML = None, loadData = True):
         if landscapeListYAML:
             self.landscapeListYAML = landscapeListYAML
+        self._canonical = {}
+        self._sequence = 0
         super().__init__(loadData)
 
     def loadData(self):
-        print("--Loading other landscape members data--")
+        asynchttp.run(self.loadDataAsync())
 
-        response = requests.get(self.landscapeListYAML)
-        landscapeList = ruamel.yaml.YAML().load(response.content)
+    async def loadDataAsync(self):
+        import ruamel.yaml
 
-        for landscape in landscapeList['landscapes']:
-            if landscape['name'] in self.skipLandscapes:
-                continue
+        logger.info("--Loading other landscape members data--")
 
-            print("Loading "+landscape['name']+"...")
+        if self.landscapesDir:
+            self._source = LocalLandscapes(self.landscapesDir)
+            landscapeListContent = self._source.read(self.landscapeListRepo, 'landscapes.yml')
+            if landscapeListContent is None:
+                raise FileNotFoundError("landscapes.yml from {} not found in {}".format(self.landscapeListRepo, self.landscapesDir))
+        else:
+            response = await asynchttp.getClient().get(self.landscapeListYAML)
+            landscapeListContent = response.content
+        landscapeList = ruamel.yaml.YAML().load(landscapeListContent)
 
-            # first figure out where memberships live
-            response = requests.get(self.landscapeSettingsYAML.format(repo=landscape['repo']))
-            try:
-                settingsYaml = ruamel.yaml.YAML().load(response.content) 
-            except:
-                # skip if the yaml file cannot be loaded
-                continue
-            # skip landscape if not well formed
-            if 'global' not in settingsYaml or settingsYaml['global'] is None or 'membership' not in settingsYaml['global']:
+        landscapes = [landscape for landscape in landscapeList['landscapes'] if landscape['name'] not in self.skipLandscapes]
+        # fetch the settings.yml and landscape.yml files for every landscape at once, then
+        # load them in the order they are listed
+        if self._source:
+            fetched = [self._readLandscape(landscape) for landscape in landscapes]
+        else:
+            fetched = await asyncio.gather(*(self._fetchLandscape(landscape) for landscape in landscapes))
+        cache = self.loadCache()
+        updated = {}
+        for landscape, (fingerprint, contents) in zip(landscapes, fetched):
+            cached = cache.get(landscape['repo'])
+            if fingerprint is None:
+                # keep what was cached from the last time it could be read
+                if cached:
+                    updated[landscape['repo']] = cached
                 continue
-            membershipKey = settingsYaml['global']['membership']
+            members = None
+            if cached and cached[0] == fingerprint:
+                logger.info("Loading %s from cache...", landscape['name'])
+                try:
+                    members = [self._toMember(landscape, item) for item in cached[1]]
+                    metrics.increment('landscapes.cached')
+                    updated[landscape['repo']] = cached
+                except Exception as e:
+                    logger.warning("Ignoring unreadable cache entry for %s - %s", landscape['name'], e)
+            if members is None:
+                logger.info("Loading %s...", landscape['name'])
+                metrics.increment('landscapes.parsed')
+                items = self._extractItems(*contents())
+                members = [self._toMember(landscape, item) for item in items]
+                updated[landscape['repo']] = [fingerprint, items]
+            for member in members:
+                self._addMember(member, landscape['name'])
+        self.saveCache(updated)
+        logger.info("Loaded %d other landscape members from %d listings", len(self.members), self._sequence)
+
+    # content hash of the files a landscape's members are extracted from
+    def fingerprint(self, *contents):
+        digest = hashlib.sha256()
+        for content in contents:
+            digest.update(content if isinstance(content, bytes) else str(content).encode('utf8'))
+            digest.update(b'\0')
+
+        return digest.hexdigest()
+
+    #
+    # Returns {repo: [fingerprint, member items]} from cachefile, or an empty dict if there
+    # isn't one or it can't be read. The cache is JSON holding the plain dicts from
+    # _extractItems(), so reading it can't run any code.
+    #
+    def loadCache(self):
+        if not self.cachefile or not os.path.isfile(self.cachefile):
+            return {}
+        try:
+            with open(self.cachefile, 'r', encoding='utf8') as fp:
+                saved = json.load(fp)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable landscape cache %s - %s", self.cachefile, e)
+            return {}
+        if not isinstance(saved, dict) or saved.get('version') != self.cacheVersion or not isinstance(saved.get('landscapes'), dict):
+            return {}
+
+        return {repo: entry for repo, entry in saved['landscapes'].items() if isinstance(entry, list) and len(entry) == 2}
+
+    # written to a temporary file and moved into place so a crash leaves the old cache
+    def saveCache(self, landscapes):
+        if not self.cachefile or self.cacheReadOnly:
+            return
+        directory = os.path.dirname(os.path.abspath(self.cachefile))
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf8', dir=directory, suffix='.tmp', delete=False) as fp:
+            json.dump({'version': self.cacheVersion, 'landscapes': landscapes}, fp, default=str)
+        os.replace(fp.name, self.cachefile)
+
+    #
+    # Returns (fingerprint, contents) for a landscape, where contents() returns the contents
+    # of its settings.yml and landscape.yml. fingerprint is None if they couldn't be fetched,
+    # and the landscape is skipped.
+    #
+    async def _fetchLandscape(self, landscape):
+        import requests
+
+        client = asynchttp.getClient()
+        # every landscape is fetched from the same host, so one landscape's server errors
+        # aren't held against the host's circuit breaker
+        try:
+            settingsResponse, landscapeResponse = await asyncio.gather(
+                client.get(self.landscapeSettingsYAML.format(repo=landscape['repo']), countServerErrors=False),
+                client.get(self.landscapeLandscapeYAML.format(repo=landscape['repo']), countServerErrors=False)
+                )
+        except requests.exceptions.ConnectionError as e:
+            logger.warning("Skipping %s - couldn't fetch it: %s", landscape['name'], e)
+            return None, None
+        for response in (settingsResponse, landscapeResponse):
+            if response.status_code != 200:
+                logger.warning("Skipping %s - %s returned %d", landscape['name'], response.url, response.status_code)
+                return None, None
 
-            # then load in members only
-            response = requests.get(self.landscapeLandscapeYAML.format(repo=landscape['repo']))
+        return self.fingerprint(settingsResponse.content, landscapeResponse.content), lambda: (settingsResponse.content, landscapeResponse.content)
+
+    #
+    # Same as _fetchLandscape() for a landscape under landscapesDir; fingerprint is None if
+    # it isn't there. Bare mirrors are fingerprinted by revision so their files are only
+    # read if they changed.
+    #
+    def _readLandscape(self, landscape):
+        repo = landscape['repo']
+        found = self._source.repoPath(repo)
+        if not found:
+            logger.warning("Skipping %s - %s isn't in %s", landscape['name'], repo, self.landscapesDir)
+            return None, None
+        read = lambda: (self._source.read(repo, 'settings.yml'), self._source.read(repo, 'landscape.yml'))
+        revision = self._source.revision(repo)
+        if revision:
+            return self.fingerprint(revision), read
+        settingsContent, landscapeContent = read()
+
+        return self.fingerprint(settingsContent, landscapeContent), lambda: (settingsContent, landscapeContent)
+
+    #
+    # the member items listed in a landscape, as plain dicts, before they are collapsed with
+    # those in others
+    #
+    def _extractItems(self, settingsContent, landscapeContent):
+        import ruamel.yaml
+
+        items = []
+        # first figure out where memberships live
+        try:
+            settingsYaml = ruamel.yaml.YAML().load(settingsContent)
+        except:
+            # skip if the yaml file cannot be loaded
+            return items
+        # skip landscape if not well formed
+        if not isinstance(settingsYaml, dict) or 'global' not in settingsYaml or settingsYaml['global'] is None or 'membership' not in settingsYaml['global']:
+            return items
+        membershipKey = settingsYaml['global']['membership']
+
+        # then load in members only
+        try:
+            landscapeYaml = ruamel.yaml.YAML().load(landscapeContent)
+        except:
+            return items
+        for category in landscapeYaml['landscape']:
+            if membershipKey in category['name']:
+                for subcategory in category['subcategories']:
+                    for item in subcategory['items']:
+                        items.append(_plain(item))
+
+        return items
+
+    # builds the Member for an item from _extractItems(), through its setters
+    def _toMember(self, landscape, item):
+        if not item.get('crunchbase'):
+            item = dict(item, crunchbase = '')
+        member = Member()
+        for key, value in item.items():
             try:
-                landscapeYaml = ruamel.yaml.YAML().load(response.content)
-            except:
-                continue
-            for category in landscapeYaml['landscape']:
-                if membershipKey in category['name']:
-                    for subcategory in category['subcategories']:
-                        for item in subcategory['items']:
-                            if not item.get('crunchbase'):
-                                item['crunchbase'] = ''
-                            member = Member()
-                            for key, value in item.items():
-                                try:
-                                    if key != 'enduser':
-                                        setattr(member, key, value)
-                                except ValueError as e:
-                                    pass
-                            try:
-                                member.membership = ''
-                            except ValueError as e:
-                                pass
-                            try:
-                                member.orgname = item['name']
-                            except ValueError as e:
-                                pass
-                            try:
-                                member.website = item['homepage_url']
-                            except ValueError as e:
-                                pass
-                            try:
-                                member.logo = self.normalizeLogo(item['logo'],landscape['repo'])
-                            except ValueError as e:
-                                pass
-                            try:
-                                member.crunchbase = item['crunchbase']
-                            except ValueError as e:
-                                pass
-                            self.members.append(member)
+                if key != 'enduser':
+                    setattr(member, key, value)
+            except ValueError as e:
+                pass
+        try:
+            member.membership = ''
+        except ValueError as e:
+            pass
+        try:
+            member.orgname = item['name']
+        except ValueError as e:
+            pass
+        try:
+            member.website = item['homepage_url']
+        except ValueError as e:
+            pass
+        try:
+            member.logo = self.normalizeLogo(item['logo'],landscape['repo'])
+        except ValueError as e:
+            pass
+        try:
+            member.crunchbase = item['crunchbase']
+        except ValueError as e:
+            pass
+
+        return member
+
+    def _addMember(self, member, landscapeName):
+        self._sequence += 1
+        key = (self.normalizeCompany(member.orgname), member.website, member.crunchbase)
+        canonical = self._canonical.get(key)
+        if canonical is None:
+            member.provenance = [(self._sequence, landscapeName, {})]
+            self._canonical[key] = member
+            self.members.append(member)
+            return
+
+        changes = {name: value for name, value in vars(member).items() if name not in vars(canonical) or vars(canonical)[name] != value}
+        changes.update({name: _MISSING for name in vars(canonical) if name not in vars(member) and name != 'provenance'})
+        canonical.provenance.append((self._sequence, landscapeName, changes))
+
+    #
+    # Returns a list of (landscape, member) for each landscape listing member
+    #
+    def variants(self, member):
+        return [(landscapeName, self._variant(member, changes)) for sequence, landscapeName, changes in getattr(member, 'provenance', [(0, None, {})])]
+
+    def _variant(self, member, changes):
+        if not changes:
+            return member
+        variant = type(member).__new__(type(member))
+        vars(variant).update({name: value for name, value in vars(member).items() if name != 'provenance' and changes.get(name) is not _MISSING})
+        vars(variant).update({name: value for name, value in changes.items() if value is not _MISSING})
+
+        return variant
+
+    def find(self, org, website):
+        return self._listings(super().find(org, website))
+
+    def fuzzyFind(self, org, threshold = None, limit = None):
+        return self._listings(super().fuzzyFind(org, threshold, limit))
+
+    # every listing of members, in the order they were loaded
+    def _listings(self, members):
+        listings = []
+        for member in members:
+            listings.extend((sequence, member, changes) for sequence, landscapeName, changes in getattr(member, 'provenance', [(0, None, {})]))
+        listings.sort(key=lambda listing: listing[0])
+
+        return [self._variant(member, changes) for sequence, member, changes in listings]
 
     def normalizeLogo(self, logo, landscapeRepo):
         if logo is None or logo == '':
@@ -99,3 +345,21 @@ class LandscapeMembers(Members):
 
         return self.landscapeLogo.format(repo=landscapeRepo,logo=logo)
 
+    #
+    # Contents of a logo URL from landscapeLogo, read from the landscape's repo under
+    # landscapesDir; None if landscapesDir isn't set, logo isn't one of those URLs or it
+    # isn't there, in which case it's downloaded as usual
+    #
+    @classmethod
+    def readLocalLogo(cls, logo):
+        if not cls.landscapesDir:
+            return None
+        pattern = re.escape(cls.landscapeLogo).replace(re.escape('{repo}'), '(?P<repo>[^/]+/[^/]+)').replace(re.escape('{logo}'), '(?P<logo>[^/]+)')
+        match = re.fullmatch(pattern, logo)
+        if not match or match['logo'] in ('.', '..'):
+            return None
+        if cls._logoSource is None or cls._logoSource.directory != cls.landscapesDir:
+            cls._logoSource = LocalLandscapes(cls.landscapesDir)
+
+        return cls._logoSource.read(match['repo'], 'hosted_logos/'+match['logo'])
+
@@ -6,27 +6,38 @@
 # encoding=utf8
 
 ## built in modules
+import asyncio
 import csv
+import logging
 import re
 import os
 import unicodedata
 import tempfile
 from pathlib import Path
 
-## third party modules
-import ruamel.yaml
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from landscape_tools import asynchttp
+from landscape_tools.landscapemembers import LandscapeMembers
+from landscape_tools.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 class LandscapeOutput:
 
     landscapefile = 'landscape.yml'
     landscape = None
-    landscapeMembers = []
     missingcsvfile = 'missing.csv'
+    _missingcsvfile = None
     _missingcsvfilewriter = None
     hostedLogosDir = 'hosted_logos'
+    # (hostedLogosDir, set of the files in it), scanned the first time it's needed
+    _hostedLogos = None
+    # If set, a Cache of the outcome of hosting each logo URL - 'hosted', 'rejected' or
+    # 'failed' - used to plan without downloading logos
+    logoCache = None
+    # If set, nothing is downloaded or written: logos are planned from logoCache and the
+    # logos already hosted, and the landscape, missing.csv and hosted logos are left as
+    # they are. changes() describes what a real run would do.
+    dryRun = False
 
     landscapeMemberCategory = 'LF Member Company'
     landscapeMemberClasses = [
@@ -41,6 +52,11 @@ class LandscapeOutput:
     membersErrors = 0
 
     def __init__(self, loadLandscape = False):
+        # kept per instance so several landscapes can be built in the same process
+        self.landscapeMembers = []
+        # member categories as loaded, before being reset, and the rows for missing.csv
+        self.previousMembers = []
+        self.missingMembers = []
         if loadLandscape:
             self.loadLandscape()
 
@@ -66,12 +82,17 @@ class LandscapeOutput:
                 x['subcategories'] = self.landscapeMembers
 
     def loadLandscape(self, reset=False):
+        import ruamel.yaml
+
         with open(self.landscapefile, 'r', encoding="utf8", errors='ignore') as fileobject: 
             self.landscape = ruamel.yaml.YAML().load(fileobject)
             if not self.landscape or not self.landscape['landscape']:
                 self.newLandscape()
             else:
                 if reset:
+                    for x in self.landscape['landscape']:
+                        if x['name'] == self.landscapeMemberCategory:
+                            self.previousMembers = x['subcategories'] or []
                     for landscapeMemberClass in self.landscapeMemberClasses:
                         memberClass = {
                             "subcategory": None,
@@ -90,18 +111,51 @@ class LandscapeOutput:
                             self.landscapeMembers = x['subcategories']
 
     def writeMissing(self, name, logo, homepage_url, crunchbase):
+        self.missingMembers.append({'name': name, 'logo': logo, 'homepage_url': homepage_url, 'crunchbase': crunchbase})
+        if self.dryRun:
+            self.membersErrors = self.membersErrors + 1
+            return
         if self._missingcsvfilewriter is None:
-            self._missingcsvfilewriter = csv.writer(open(self.missingcsvfile, mode='w'), delimiter=',', quotechar='"', quoting=csv.QUOTE_ALL)
+            self._missingcsvfile = open(self.missingcsvfile, mode='w')
+            self._missingcsvfilewriter = csv.writer(self._missingcsvfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_ALL)
             self._missingcsvfilewriter.writerow(['name','logo','homepage_url','crunchbase'])
 
         self.membersErrors = self.membersErrors + 1
         self._missingcsvfilewriter.writerow([name, logo, homepage_url, crunchbase])
 
     def hostLogo(self,logo,orgname):
+        return asynchttp.run(self.hostLogoAsync(logo,orgname))
+
+    #
+    # Hosts the logos for a list of (logo, orgname) tuples concurrently, returning the
+    # results of hostLogo() for each in the same order
+    #
+    def hostLogos(self,logos):
+        return asynchttp.run(self.hostLogosAsync(logos))
+
+    async def hostLogosAsync(self,logos):
+        return await asyncio.gather(*(self.hostLogoAsync(logo,orgname) for logo, orgname in logos))
+
+    #
+    # Hosts logo, either a URL or the local path of one in another landscape's checkout or
+    # mirror, which is copied. Returns the hosted file name, or the logo given if it
+    # couldn't be hosted.
+    #
+    async def hostLogoAsync(self,logo,orgname):
         if logo is None or ('https://' not in logo and 'http://' not in logo):
             return logo
+        if self.dryRun:
+            return self.planLogo(logo,orgname)
+
+        logger.debug("...Hosting logo for %s", orgname)
+        filename = self.logoFilename(orgname)
+        result, outcome = await self._hostLogoAsync(logo,orgname,filename)
+        if self.logoCache is not None:
+            self.logoCache.set(logo, outcome, negative=outcome == 'failed')
+
+        return result
 
-        print("...Hosting logo for "+orgname)
+    def logoFilename(self,orgname):
         filename = str(orgname).strip().replace(' ', '_')
         filename = filename.replace('.', '')
         filename = filename.replace(',', '')
@@ -112,38 +166,131 @@ class LandscapeOutput:
         ## create a random file name in case somehow the generated one doesn't work
         if filename == ".svg":
             filename = os.path.basename(tempfile.NamedTemporaryFile(mode="wb", suffix=".svg").name)
-        
+
+        return filename
+
+    #
+    # What hostLogo() would return for logo, from how hosting it went last time and the
+    # logos already hosted. Logos with no cached outcome are expected to be hosted.
+    #
+    def planLogo(self,logo,orgname):
+        filename = self.logoFilename(orgname)
+        found, outcome = self.logoCache.get(logo) if self.logoCache is not None else (False, None)
+        if not found:
+            metrics.increment('plan.logos.uncached')
+        if outcome == 'rejected':
+            return ''
+        if outcome == 'failed' and filename not in self.hostedLogos():
+            return logo
+
+        return filename
+
+    #
+    # Returns (logo to use, outcome), where outcome is 'hosted', 'rejected' or 'failed' and
+    # is what's recorded in logoCache
+    #
+    async def _hostLogoAsync(self,logo,orgname,filename):
         filenamepath = os.path.normpath(self.hostedLogosDir+"/"+filename)
+        hostedLogos = self.hostedLogos()
         
-        session = requests.Session()
-        retry = Retry(backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount('http://', adapter)
-        session.mount('https://', adapter)        
+        content = await self._readLogoAsync(logo,orgname)
+        if content is None:
+            # failed to get image; if there is already an image there do nothing
+            # if it doesn't exist, return the logo URL given
+            if filename in hostedLogos:
+                return filename, 'failed'
+            else:
+                return logo, 'failed'
+        # catch places where autocrop will reject the image
+        if content.find(b'base64') != -1 or content.find(b'<text') != -1 or content.find(b'<image') != -1 or content.find(b'<tspan') != -1:
+            return '', 'rejected'
+        with open(filenamepath, 'wb') as fp:
+            fp.write(content)
+        hostedLogos.add(filename)
+
+        return filename, 'hosted'
+
+    #
+    # contents of logo, or None if it couldn't be read or downloaded. Logos from other
+    # landscapes are read from their local copies if there are any.
+    #
+    async def _readLogoAsync(self,logo,orgname):
+        if LandscapeMembers.landscapesDir:
+            content = await asyncio.to_thread(LandscapeMembers.readLocalLogo, logo)
+            if content is not None:
+                metrics.increment('logos.local')
+                return content
+
+        import requests
+
         while True:
             try:
-                r = session.get(logo, allow_redirects=True)
+                r = await asynchttp.getClient().get(logo, allow_redirects=True)
                 break
             except requests.exceptions.ChunkedEncodingError:
                 pass
+            except requests.exceptions.ConnectionError as e:
+                # host is down or its circuit breaker is open; treat as a failed download
+                logger.debug("...Couldn't get logo for %s - %s", orgname, e)
+                return None
         if r.status_code != 200:
-            # failed to get image; if there is already an image there do nothing
-            # if it doesn't exist, return the logo URL given
-            if os.path.isfile(filenamepath):
-                return filename
-            else:
-                return logo
-        # catch places where autocrop will reject the image
-        if r.content.find(b'base64') != -1 or r.content.find(b'<text') != -1 or r.content.find(b'<image') != -1 or r.content.find(b'<tspan') != -1:
-            return '';
-        with open(filenamepath, 'wb') as fp:
-            fp.write(r.content)
+            return None
 
-        return filename
+        return r.content
 
     def removeHostedLogo(self,logo):
-        if logo and os.path.isfile(os.path.normpath(self.hostedLogosDir+"/"+logo)):
+        hostedLogos = self.hostedLogos()
+        if logo and logo in hostedLogos and not self.dryRun:
             os.remove(os.path.normpath(self.hostedLogosDir+"/"+logo))
+            hostedLogos.discard(logo)
+
+    #
+    # Names of the files in hostedLogosDir. The directory is scanned once and the result
+    # kept up to date as logos are hosted and removed, rather than checking for each file.
+    #
+    def hostedLogos(self):
+        if self._hostedLogos is None or self._hostedLogos[0] != self.hostedLogosDir:
+            hostedLogos = set()
+            if os.path.isdir(self.hostedLogosDir):
+                with os.scandir(self.hostedLogosDir) as entries:
+                    hostedLogos = {entry.name for entry in entries if entry.is_file() and not entry.name.startswith('.')}
+            self._hostedLogos = (self.hostedLogosDir, hostedLogos)
+
+        return self._hostedLogos[1]
+
+    # logos used by any item in the landscape, in any category
+    def referencedLogos(self):
+        logos = set()
+        def collect(node):
+            if isinstance(node, dict):
+                if isinstance(node.get('logo'), str):
+                    logos.add(node['logo'])
+                for value in node.values():
+                    collect(value)
+            elif isinstance(node, list):
+                for value in node:
+                    collect(value)
+        collect(self.landscape)
+
+        return logos
+
+    #
+    # Removes the logos in hostedLogosDir that no item in the landscape uses, such as those
+    # of members that have left. Returns the names of the logos removed, or that would be
+    # removed if dryRun is set.
+    #
+    def collectLogos(self, dryRun = False):
+        dryRun = dryRun or self.dryRun
+        orphans = sorted(self.hostedLogos() - self.referencedLogos())
+        for logo in orphans:
+            if dryRun:
+                logger.info("...Would remove unused logo %s", logo)
+            else:
+                logger.info("...Removing unused logo %s", logo)
+                self.removeHostedLogo(logo)
+        logger.info("%s %d unused logos from %s", "Found" if dryRun else "Removed", len(orphans), self.hostedLogosDir)
+
+        return orphans
 
     def _removeNulls(self,yamlout):
         dump = re.sub(r'/(- \w+:) null/g', '$1', yamlout)
@@ -158,6 +305,8 @@ class LandscapeOutput:
         return dumper.represent_scalar(u'tag:yaml.org,2002:str', data)
 
     def updateLandscape(self):
+        import ruamel.yaml
+
         # now write it back
         found = False
         for x in self.landscape['landscape']:
@@ -167,7 +316,11 @@ class LandscapeOutput:
                 continue
 
         if not found:
-            print("Couldn't find the membership category in landscape.yml to update - please check your config.yaml settings")
+            logger.warning("Couldn't find the membership category in landscape.yml to update - please check your config.yaml settings")
+
+        if self.dryRun:
+            logger.info("Would add %d members and skip %d members", self.membersAdded, self.membersErrors)
+            return
 
         landscapefileoutput = Path(self.landscapefile)
         ryaml = ruamel.yaml.YAML(typ='rt')
@@ -179,5 +332,49 @@ class LandscapeOutput:
         ryaml.preserve_quotes = False
         ryaml.dump(self.landscape,landscapefileoutput, transform=self._removeNulls)
 
-        print("Successfully added "+str(self.membersAdded)+" members and skipped "+str(self.membersErrors)+" members")
+        if self._missingcsvfile:
+            self._missingcsvfile.close()
+            self._missingcsvfile = None
+            self._missingcsvfilewriter = None
+
+        logger.info("Successfully added %d members and skipped %d members", self.membersAdded, self.membersErrors)
+
+    #
+    # Differences between the member items loaded from the landscape and the ones built,
+    # by item name:
+    #
+    #   added       items that are new, with the category they are in
+    #   updated     items whose attributes or category changed, with the old and new values
+    #   removed     items no longer in the landscape
+    #   missing     members written to missing.csv instead
+    #
+    def changes(self):
+        previous = self._itemsByName(self.previousMembers)
+        current = self._itemsByName(self.landscapeMembers)
+        changes = {'added': [], 'updated': [], 'removed': [], 'missing': list(self.missingMembers)}
+        for name, (category, item) in current.items():
+            if name not in previous:
+                changes['added'].append({'name': name, 'category': category, 'item': dict(item)})
+                continue
+            previousCategory, previousItem = previous[name]
+            changed = {}
+            if category != previousCategory:
+                changed['category'] = {'from': previousCategory, 'to': category}
+            for key in sorted(set(item) | set(previousItem)):
+                if item.get(key) != previousItem.get(key):
+                    changed[key] = {'from': previousItem.get(key), 'to': item.get(key)}
+            if changed:
+                changes['updated'].append({'name': name, 'category': category, 'changes': changed})
+        for name, (category, item) in previous.items():
+            if name not in current:
+                changes['removed'].append({'name': name, 'category': category})
+
+        return changes
+
+    def _itemsByName(self, memberClasses):
+        items = {}
+        for memberClass in memberClasses:
+            for item in memberClass.get('items') or []:
+                items.setdefault(item.get('name'), (memberClass.get('name'), item))
 
+        return items
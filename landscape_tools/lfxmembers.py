@@ -5,11 +5,14 @@
 #
 # encoding=utf8
 
-# third party modules
-import requests
+## built in modules
+import logging
 
 from landscape_tools.members import Members
 from landscape_tools.member import Member
+from landscape_tools import asynchttp
+
+logger = logging.getLogger(__name__)
 
 
 class LFXMembers(Members):
@@ -25,9 +28,12 @@ class LFXMembers(Members):
         super().__init__(loadData)
 
     def loadData(self):
-        print("--Loading LFX Members data--")
+        asynchttp.run(self.loadDataAsync())
+
+    async def loadDataAsync(self):
+        logger.info("--Loading LFX Members data--")
 
-        with requests.get(self.endpointURL.format(self.project)) as endpointResponse:
+        with await asynchttp.getClient().get(self.endpointURL.format(self.project)) as endpointResponse:
             memberList = endpointResponse.json()
             for record in memberList:
                 record['Website'] = '' if 'Website' not in record else record['Website']
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import logging
+import os
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+#
+# Landscape repos that are already cloned or mirrored under a local directory, read without
+# any network access. A repo such as cncf/landscape is looked for as directory/cncf/landscape
+# or directory/landscape, either as a checkout or as a bare git mirror ( with or without a
+# .git suffix ). Files in bare mirrors are read from HEAD with git.
+#
+class LocalLandscapes:
+
+    git = 'git'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._repos = {}
+
+    #
+    # Returns (path, bare) for repo, or None if it isn't under directory
+    #
+    def repoPath(self, repo):
+        # repo names come from landscapes.yml and logo URLs, so don't let them point
+        # outside of directory
+        if any(part in ('', '.', '..') for part in repo.split('/')):
+            return None
+        if repo not in self._repos:
+            self._repos[repo] = None
+            # looked for by owner and name only, since different owners often use the same
+            # repo name
+            for candidate in [repo, repo+'.git']:
+                repopath = os.path.join(self.directory, candidate)
+                if os.path.isdir(repopath):
+                    self._repos[repo] = (repopath, isBareRepo(repopath))
+                    break
+
+        return self._repos[repo]
+
+    # contents of filename in repo as bytes, or None if either isn't there
+    def read(self, repo, filename):
+        found = self.repoPath(repo)
+        if not found:
+            return None
+        repopath, bare = found
+        if bare:
+            return gitShow(repopath, filename, self.git)
+        try:
+            with open(os.path.join(repopath, filename), 'rb') as fp:
+                return fp.read()
+        except OSError:
+            return None
+
+    #
+    # HEAD commit of a bare mirror, which fingerprints everything read from it; None for
+    # checkouts, since their files may not match what's committed
+    #
+    def revision(self, repo):
+        found = self.repoPath(repo)
+        if not found or not found[1]:
+            return None
+        result = runGit(self.git, found[0], 'rev-parse', 'HEAD')
+        if result is None or result.returncode != 0:
+            return None
+
+        return result.stdout.decode('ascii').strip()
+
+def isBareRepo(path):
+    return os.path.isfile(os.path.join(path, 'HEAD')) and os.path.isdir(os.path.join(path, 'objects')) and os.path.isdir(os.path.join(path, 'refs'))
+
+def gitShow(repopath, filename, git = 'git'):
+    result = runGit(git, repopath, 'show', 'HEAD:'+filename.replace(os.sep, '/'))
+    if result is None:
+        return None
+    if result.returncode != 0:
+        logger.debug("Couldn't read %s from %s - %s", filename, repopath, result.stderr.decode('utf8', 'replace').strip())
+        return None
+
+    return result.stdout
+
+_gitMissing = set()
+
+# runs git against the bare repo at repopath, returning None if git isn't installed
+def runGit(git, repopath, *args):
+    try:
+        return subprocess.run([git, '--git-dir', repopath]+list(args), capture_output=True)
+    except FileNotFoundError:
+        if git not in _gitMissing:
+            _gitMissing.add(git)
+            logger.warning("Can't read bare mirrors - %s isn't installed", git)
+        return None
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import logging
+import logging.handlers
+import sys
+import time
+
+logFormat = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+progressLogger = 'landscape_tools.progress'
+
+#
+# Sets up logging for a run. Records are buffered and written out in batches, except for
+# warnings and above which flush the buffer immediately. verbose logs every overlayed field,
+# the default logs one line per member, and quiet only logs warnings and the progress line.
+#
+def setupLogging(verbose = False, quiet = False, stream = None, capacity = 1000):
+    stream = stream if stream else sys.stdout
+    formatter = logging.Formatter(logFormat)
+
+    streamhandler = logging.StreamHandler(stream)
+    streamhandler.setFormatter(formatter)
+    bufferedhandler = logging.handlers.MemoryHandler(capacity=capacity, flushLevel=logging.WARNING, target=streamhandler)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(bufferedhandler)
+    if verbose:
+        root.setLevel(logging.DEBUG)
+    elif quiet:
+        root.setLevel(logging.WARNING)
+    else:
+        root.setLevel(logging.INFO)
+
+    # progress lines are periodic, so they skip the buffer and show even in quiet mode
+    progress = logging.getLogger(progressLogger)
+    for handler in progress.handlers[:]:
+        progress.removeHandler(handler)
+        handler.close()
+    progresshandler = ProgressHandler(stream, bufferedhandler)
+    progresshandler.setFormatter(formatter)
+    progress.addHandler(progresshandler)
+    progress.setLevel(logging.INFO)
+    progress.propagate = False
+
+#
+# Writes progress lines, first flushing the records buffered before them so the output
+# stays in order
+#
+class ProgressHandler(logging.StreamHandler):
+
+    def __init__(self, stream, bufferedhandler):
+        super().__init__(stream)
+        self.bufferedhandler = bufferedhandler
+
+    def emit(self, record):
+        self.bufferedhandler.flush()
+        super().emit(record)
+
+#
+# Logs a progress line with throughput at most once every interval seconds
+#
+class Progress:
+
+    interval = 10
+
+    def __init__(self, total, label = 'members', interval = None):
+        self.total = total
+        self.label = label
+        if interval is not None:
+            self.interval = interval
+        self.count = 0
+        self.startTime = time.perf_counter()
+        self._lastReport = self.startTime
+        self._logger = logging.getLogger(progressLogger)
+
+    def update(self, count = 1):
+        self.count += count
+        now = time.perf_counter()
+        if now - self._lastReport >= self.interval:
+            self._lastReport = now
+            self._log(now)
+
+    def finish(self):
+        self._log(time.perf_counter())
+
+    def rate(self, now = None):
+        elapsed = (now if now else time.perf_counter()) - self.startTime
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def _log(self, now):
+        self._logger.info("Processed %d/%d %s (%.1f %s/sec)", self.count, self.total, self.label, self.rate(now), self.label)
@@ -6,12 +6,12 @@
 # encoding=utf8
 
 ## built in modules
+import logging
 import os
-from urllib.parse import urlparse
 
-## third party modules
-from url_normalize import url_normalize
-import validators
+from landscape_tools import urls
+
+logger = logging.getLogger(__name__)
 
 #
 # Member object to ensure we have normalization on fields. Only required fields are defined; others can be added dynamically.
@@ -42,17 +42,21 @@ class Member:
         if crunchbase is None:
             self._validCrunchbase = False
             raise ValueError("Member.crunchbase must be not be blank for {orgname}".format(orgname=self.orgname))
-        if not crunchbase.startswith('https://www.crunchbase.com/organization/'):
-            # fix the URL if it's not formatted right
-            o = urlparse(crunchbase)
-            if (o.netloc == "crunchbase.com" or o.netloc == "www.crunchbase.com") and o.path.startswith("/organization"):
-                crunchbase = "https://www.crunchbase.com{path}".format(path=o.path)
-            else:
-                self._validCrunchbase = False
-                raise ValueError("Member.crunchbase for {orgname} must be set to a valid crunchbase url - '{crunchbase}' provided".format(crunchbase=crunchbase,orgname=self.orgname))
+        normalizedcrunchbase = urls.normalizeCrunchbase(crunchbase)
+        if normalizedcrunchbase is None:
+            self._validCrunchbase = False
+            raise ValueError("Member.crunchbase for {orgname} must be set to a valid crunchbase url - '{crunchbase}' provided".format(crunchbase=crunchbase,orgname=self.orgname))
 
         self._validCrunchbase = True
-        self.__crunchbase = crunchbase
+        self.__crunchbase = normalizedcrunchbase
+
+    # the organization's permalink from its crunchbase URL, used to look it up directly
+    @property
+    def crunchbasePermalink(self):
+        if not self.crunchbase:
+            return None
+
+        return urls.crunchbasePermalink(self.crunchbase)
 
     @property
     def website(self):
@@ -64,8 +68,8 @@ class Member:
             self._validWebsite = False
             raise ValueError("Member.website must be not be blank for {orgname}".format(orgname=self.orgname))
 
-        normalizedwebsite = url_normalize(website, default_scheme='https')
-        if not validators.url(normalizedwebsite):
+        normalizedwebsite = urls.normalizeWebsite(website)
+        if normalizedwebsite is None:
             self._validWebsite = False
             raise ValueError("Member.website for {orgname} must be set to a valid website - '{website}' provided".format(website=website,orgname=self.orgname))
 
@@ -97,20 +101,33 @@ class Member:
     def twitter(self, twitter):
         if not twitter:
             return
-        if not twitter.startswith('https://twitter.com/'):
-            # fix the URL if it's not formatted right
-            o = urlparse(twitter)
-            if o.netloc == '':
-                twitter = "https://twitter.com/{}".format(twitter)
-            elif (o.netloc == "twitter.com" or o.netloc == "www.twitter.com"):
-                twitter = "https://twitter.com{path}".format(path=o.path)
-            else:
-                self._validTwitter = False
-                raise ValueError("Member.twitter for {orgname} must be either a Twitter handle, or the URL to a twitter handle - '{twitter}' provided".format(twitter=twitter,orgname=self.orgname))
+        normalizedtwitter = urls.normalizeTwitter(twitter)
+        if normalizedtwitter is None:
+            self._validTwitter = False
+            raise ValueError("Member.twitter for {orgname} must be either a Twitter handle, or the URL to a twitter handle - '{twitter}' provided".format(twitter=twitter,orgname=self.orgname))
 
         self._validTwitter = True
-        self.__twitter = twitter
+        self.__twitter = normalizedtwitter
+
 
+    #
+    # Member from an orgname and website and crunchbase URLs that have already been through
+    # normalization, such as those parsed from the Crunchbase bulk export in worker
+    # processes. website and crunchbase are None if they weren't valid.
+    #
+    @classmethod
+    def fromNormalized(cls, orgname, website = None, crunchbase = None, membership = None):
+        member = cls()
+        member.orgname = orgname
+        member.membership = membership
+        if website is not None:
+            member.__website = website
+            member._validWebsite = True
+        if crunchbase is not None:
+            member.__crunchbase = crunchbase
+            member._validCrunchbase = True
+
+        return member
 
     def toLandscapeItemAttributes(self):
         allowedKeys = [
@@ -175,10 +192,9 @@ class Member:
                 key = "orgname"
             try:
                 if (not hasattr(membertooverlay,key) or not getattr(membertooverlay,key)): 
-                    print("...Overlay "+key)
-                    print(".....Old Value - '{}'".format(getattr(membertooverlay,key) if hasattr(membertooverlay,key) else'empty'))
-                    print(".....New Value - '{}'".format(value if value else 'empty'))
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("...Overlay %s for %s - old value '%s', new value '%s'", key, membertooverlay.orgname, getattr(membertooverlay,key) if hasattr(membertooverlay,key) else 'empty', value if value else 'empty')
                     setattr(membertooverlay, key, value)
             except ValueError as e:
-                print(e)
+                logger.debug(e)
 
@@ -9,14 +9,23 @@
 import re
 from abc import ABC, abstractmethod
 
-## third party modules
-from url_normalize import url_normalize
+from landscape_tools import urls
+from landscape_tools.domains import siteKey
+from landscape_tools.fuzzymatch import FuzzyIndex
 
 #
 # Abstract Members class to normalize the methods used for the other ways of getting a member's info
 #
 class Members(ABC):
 
+    _names = None
+    _domains = None
+    _indexed = 0
+    # the members list that was indexed, so the indexes are rebuilt if it's replaced
+    _indexedMembers = None
+    _fuzzyIndex = None
+    _fuzzyMembers = None
+
     def __init__(self, loadData = False):
         self.members = []
         if loadData:
@@ -27,15 +36,68 @@ class Members(ABC):
         pass
 
     def find(self, org, website):
-        normalizedorg = self.normalizeCompany(org)
-        normalizedwebsite = self.normalizeURL(website)
-        found = []
+        return [self.members[position] for position in self._matches(org, website)]
+
+    #
+    # Positions in members of those with the same normalized name as org or the same
+    # website, compared by registered domain except on shared hosts ( see siteKey() )
+    #
+    def _matches(self, org, website):
+        self.index()
+        positions = set(self._names.get(self.normalizeCompany(org), []))
+        domain = siteKey(website)
+        if domain:
+            positions.update(self._domains.get(domain, []))
+
+        return sorted(positions)
+
+    #
+    # Indexes members by normalized name and website. Members appended since the last call
+    # are indexed, and it starts over if the members list has been replaced; reindex()
+    # starts over if members have been changed in place.
+    #
+    def index(self):
+        if self._names is None or self._indexedMembers is not self.members or self._indexed > len(self.members):
+            self._names = {}
+            self._domains = {}
+            self._indexed = 0
+            self._indexedMembers = self.members
+        for position in range(self._indexed, len(self.members)):
+            member = self.members[position]
+            self._names.setdefault(self.normalizeCompany(member.orgname), []).append(position)
+            domain = siteKey(member.website)
+            if domain:
+                self._domains.setdefault(domain, []).append(position)
+        self._indexed = len(self.members)
+
+    def reindex(self):
+        self._names = None
+        self._fuzzyIndex = None
+        self.index()
+
+    #
+    # Members with names similar to org, for when find() doesn't match; threshold is the
+    # lowest similarity accepted, from 0 to 1. Best matches come first, and at most limit
+    # are returned if given.
+    #
+    def fuzzyFind(self, org, threshold = None, limit = None):
+        return [self.members[position] for position, score in self.fuzzyIndex().search(org, threshold)[:limit]]
+
+    def fuzzyIndex(self):
+        if self._fuzzyIndex is None or self._fuzzyMembers is not self.members or len(self._fuzzyIndex) > len(self.members):
+            self._fuzzyIndex = FuzzyIndex()
+            self._fuzzyMembers = self.members
+        for member in self.members[len(self._fuzzyIndex):]:
+            self._fuzzyIndex.add(member.orgname)
 
-        for member in self.members:
-            if ( self.normalizeCompany(member.orgname) == normalizedorg or member.website == website):
-                found.append(member)
+        return self._fuzzyIndex
 
-        return found
+    #
+    # Batch version of find(); orgs is a list of argument tuples for find() and the results
+    # are returned in the same order. Subclasses backed by remote lookups can override this.
+    #
+    def find_many(self, orgs):
+        return [self.find(*org) for org in orgs]
 
     def normalizeCompany(self, company):
 
@@ -74,5 +136,5 @@ class Members(ABC):
         return company.strip()
 
     def normalizeURL(self, url):
-        return url_normalize(url)
+        return urls.normalizeURL(url)
 
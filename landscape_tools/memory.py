@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import json
+import logging
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+#
+# Takes tracemalloc snapshots at points in a run, attributing the growth in allocated memory
+# since the previous snapshot to the component named, along with the source lines that
+# grew the most.
+#
+class MemoryReport:
+
+    topLines = 10
+
+    def __init__(self, topLines = None):
+        if topLines is not None:
+            self.topLines = topLines
+        self.snapshots = []
+        self._previous = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._previous = tracemalloc.take_snapshot()
+
+    def snapshot(self, component):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        stats = snapshot.compare_to(self._previous, 'lineno')
+        self._previous = snapshot
+
+        entry = {
+            'component': component,
+            'bytes': sum(stat.size_diff for stat in stats),
+            'current': current,
+            'peak': peak,
+            'top': [{'line': str(stat.traceback), 'bytes': stat.size_diff, 'count': stat.count_diff} for stat in stats[:self.topLines]]
+        }
+        self.snapshots.append(entry)
+        logger.info("Memory after %s: %.1f MB ( %+.1f MB, peak %.1f MB )", component, current / 1048576, entry['bytes'] / 1048576, peak / 1048576)
+
+        return entry
+
+    def report(self):
+        return {
+            'snapshots': self.snapshots,
+            'components': {snapshot['component']: snapshot['bytes'] for snapshot in self.snapshots},
+            'peak': tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        }
+
+    def writeReport(self, reportfile):
+        with open(reportfile, 'w', encoding='utf8') as fp:
+            json.dump(self.report(), fp, indent=2)
+
+    def stop(self):
+        tracemalloc.stop()
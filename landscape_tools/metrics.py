@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+#
+# Small registry of timers and counters used to build the run report. A process wide
+# instance is available as landscape_tools.metrics.metrics.
+#
+class Metrics:
+
+    def __init__(self):
+        # functions returning stats for in memory caches, kept across resets
+        self.caches = {}
+        self.reset()
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.hosts = {}
+        self.startTime = time.perf_counter()
+        self.startedAt = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(name, time.perf_counter() - start)
+
+    def addTime(self, name, seconds):
+        with self._lock:
+            timer = self.timers.setdefault(name, {'count': 0, 'seconds': 0.0})
+            timer['count'] += 1
+            timer['seconds'] += seconds
+
+    def increment(self, name, value = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def recordResponse(self, response):
+        self.increment('http.requests')
+        self.increment('http.bytes', len(response.content) if response.content else 0)
+        if response.status_code >= 400:
+            self.increment('http.errors')
+
+    def recordHost(self, host, seconds, failed = False):
+        with self._lock:
+            stats = self.hosts.setdefault(host, {'requests': 0, 'failures': 0, 'seconds': 0.0, 'maxSeconds': 0.0})
+            stats['requests'] += 1
+            stats['seconds'] += seconds
+            stats['maxSeconds'] = max(stats['maxSeconds'], seconds)
+            if failed:
+                stats['failures'] += 1
+
+    #
+    # statsfn returns a dict of stats for each cache in a group, included in the report
+    # under caches.name
+    #
+    def registerCaches(self, name, statsfn):
+        self.caches[name] = statsfn
+
+    #
+    # Returns the timers, counters and host stats recorded since the last call and starts
+    # them over, for worker processes to pass back to the parent's merge()
+    #
+    def collect(self):
+        with self._lock:
+            collected = {'timers': self.timers, 'counters': self.counters, 'hosts': self.hosts}
+            self.timers = {}
+            self.counters = {}
+            self.hosts = {}
+
+        return collected
+
+    def merge(self, collected):
+        with self._lock:
+            for name, timer in collected['timers'].items():
+                merged = self.timers.setdefault(name, {'count': 0, 'seconds': 0.0})
+                merged['count'] += timer['count']
+                merged['seconds'] += timer['seconds']
+            for name, value in collected['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for host, stats in collected['hosts'].items():
+                merged = self.hosts.setdefault(host, {'requests': 0, 'failures': 0, 'seconds': 0.0, 'maxSeconds': 0.0})
+                merged['requests'] += stats['requests']
+                merged['failures'] += stats['failures']
+                merged['seconds'] += stats['seconds']
+                merged['maxSeconds'] = max(merged['maxSeconds'], stats['maxSeconds'])
+
+    def report(self):
+        caches = {name: statsfn() for name, statsfn in sorted(self.caches.items())}
+        with self._lock:
+            return {
+                'started': self.startedAt.isoformat(),
+                'seconds': time.perf_counter() - self.startTime,
+                'timers': {name: dict(timer) for name, timer in sorted(self.timers.items())},
+                'counters': dict(sorted(self.counters.items())),
+                'hosts': {host: dict(stats, averageSeconds=stats['seconds'] / stats['requests']) for host, stats in sorted(self.hosts.items())},
+                'caches': caches
+            }
+
+    def writeReport(self, reportfile):
+        with open(reportfile, 'w', encoding='utf8') as fp:
+            json.dump(self.report(), fp, indent=2)
+
+metrics = Metrics()
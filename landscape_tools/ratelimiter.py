@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import asyncio
+import threading
+import time
+
+#
+# Token bucket rate limiter; safe to share between threads. rate is the number of tokens
+# added per second and burst is the most tokens that can be held at once.
+#
+class RateLimiter:
+
+    rate = 1
+    burst = 1
+
+    def __init__(self, rate = None, burst = None):
+        if rate:
+            self.rate = rate
+        if burst:
+            self.burst = burst
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        wait = self._take()
+        while wait:
+            time.sleep(wait)
+            wait = self._take()
+
+    async def acquireAsync(self):
+        wait = self._take()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._take()
+
+    # takes a token if one is available, otherwise returns how long to wait for one
+    def _take(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + ((now - self._updated) * self.rate))
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import ipaddress
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+#
+# Keeps the shared data sources loaded between landscape builds. load() returns a tuple of
+# (lsmembers, cbmembers) and build(configfile, lsmembers, cbmembers) builds one landscape,
+# returning a dict describing the result.
+#
+# The sources are reloaded every refreshInterval seconds on a background thread; builds
+# keep using the current ones until the reload is done, then they are swapped in.
+#
+class LandscapeService:
+
+    refreshInterval = 60*60*6 # 6 hours
+
+    def __init__(self, load, build, refreshInterval = None):
+        self.load = load
+        self.build = build
+        if refreshInterval is not None:
+            self.refreshInterval = refreshInterval
+        self.lsmembers = None
+        self.cbmembers = None
+        self.loadedAt = None
+        self.builds = 0
+        self.refreshing = False
+        # builds and swapping in refreshed sources are done one at a time
+        self._buildLock = threading.Lock()
+        self._refreshLock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.refresh()
+        if self.refreshInterval:
+            self._thread = threading.Thread(target=self._refreshLoop, name='landscapeservice-refresh', daemon=True)
+            self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._buildLock:
+            self._close(self.cbmembers)
+
+    def _refreshLoop(self):
+        while not self._stopped.wait(self.refreshInterval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing data sources failed - keeping the ones already loaded")
+
+    # returns False if a refresh was already running
+    def refresh(self):
+        if not self._refreshLock.acquire(blocking=False):
+            return False
+        try:
+            self.refreshing = True
+            logger.info("Loading data sources")
+            lsmembers, cbmembers = self.load()
+            with self._buildLock:
+                previous = self.cbmembers
+                self.lsmembers = lsmembers
+                self.cbmembers = cbmembers
+                self.loadedAt = datetime.now(timezone.utc)
+                self._close(previous)
+            logger.info("Loaded %d other landscape and %d Crunchbase members", len(lsmembers.members), len(cbmembers.members))
+        finally:
+            self.refreshing = False
+            self._refreshLock.release()
+
+        return True
+
+    def _close(self, cbmembers):
+        if cbmembers is not None and hasattr(cbmembers, 'close'):
+            cbmembers.close()
+
+    def buildLandscape(self, configfile):
+        with self._buildLock:
+            start = time.perf_counter()
+            result = self.build(configfile, self.lsmembers, self.cbmembers)
+            self.builds += 1
+        result = dict(result)
+        result['seconds'] = time.perf_counter() - start
+
+        return result
+
+    def status(self):
+        return {
+            'loadedAt': self.loadedAt.isoformat() if self.loadedAt else None,
+            'refreshing': self.refreshing,
+            'refreshInterval': self.refreshInterval,
+            'builds': self.builds,
+            'members': {
+                'landscapes': len(self.lsmembers.members) if self.lsmembers else 0,
+                'crunchbase': len(self.cbmembers.members) if self.cbmembers else 0
+            }
+        }
+
+#
+# JSON API for a LandscapeService:
+#
+#   GET /status              loaded sources and number of builds
+#   POST /build              body {"config": "path/to/config.yml"}; builds that landscape
+#   POST /refresh            reloads the data sources in the background
+#
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/status':
+            return self.sendJSON(200, self.server.service.status())
+        self.sendJSON(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        service = self.server.service
+        if self.path == '/build':
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                configfile = json.loads(self.rfile.read(length) or b'{}').get('config')
+            except (ValueError, AttributeError) as e:
+                return self.sendJSON(400, {'error': 'Invalid request body - {}'.format(e)})
+            if not configfile:
+                return self.sendJSON(400, {'error': "'config' is required"})
+            if not os.path.isfile(configfile):
+                return self.sendJSON(404, {'error': 'Config file {} not found'.format(configfile)})
+            try:
+                return self.sendJSON(200, service.buildLandscape(configfile))
+            except SystemExit as e:
+                # Config exits when a config file can't be used
+                return self.sendJSON(400, {'error': 'Invalid config file {} - {}'.format(configfile, e)})
+            except Exception as e:
+                logger.exception("Building landscape for %s failed", configfile)
+                return self.sendJSON(500, {'error': str(e)})
+        if self.path == '/refresh':
+            threading.Thread(target=service.refresh, name='landscapeservice-refresh-now', daemon=True).start()
+            return self.sendJSON(202, {'refreshing': True})
+        self.sendJSON(404, {'error': 'Not found'})
+
+    def sendJSON(self, status, body):
+        content = json.dumps(body).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    # client_address is an empty string for Unix sockets
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def server_bind(self):
+        # a socket left behind by an earlier run is replaced, but nothing else is
+        try:
+            mode = os.lstat(self.server_address).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise ValueError("Refusing to serve on {} - it already exists and isn't a socket".format(self.server_address))
+            os.unlink(self.server_address)
+        # the API has no authentication, so only this user can connect to the socket
+        umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+        # BaseHTTPRequestHandler expects these to be set
+        self.server_name = self.server_address
+        self.server_port = 0
+
+#
+# Creates the API server for service. address is either 'host:port' or the path to a Unix
+# socket; a bare port number listens on localhost. The API has no authentication, so
+# listening on anything other than a loopback address is refused unless allowRemote is set.
+#
+def createServer(service, address, allowRemote = False):
+    if '/' in address:
+        server = UnixHTTPServer(address, ServiceRequestHandler)
+    else:
+        host, sep, port = address.rpartition(':')
+        host = host.strip('[]') or 'localhost'
+        if not allowRemote and not isLoopback(host):
+            raise ValueError("Refusing to serve on {} - the API has no authentication, so only loopback addresses are allowed unless remote access is allowed".format(host))
+        server = ThreadingHTTPServer((host, int(port)), ServiceRequestHandler)
+    server.service = service
+
+    return server
+
+# host is 'localhost' or resolves only to loopback addresses
+def isLoopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror:
+        return False
+
+    return bool(addresses) and all(ipaddress.ip_address(address.split('%')[0]).is_loopback for address in addresses)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Copyright this project and it's contributors
+# SPDX-License-Identifier: Apache-2.0
+#
+# encoding=utf8
+
+## built in modules
+import functools
+from urllib.parse import urlparse
+
+from landscape_tools.metrics import metrics
+
+#
+# URL normalization and validation shared by Member and Members. The same websites and
+# crunchbase and twitter URLs are set over and over as members are loaded, overlayed and
+# matched, so results are memoized in process wide caches bounded to maxEntries each.
+# Invalid URLs are cached as None, leaving the caller to raise the error. url_normalize and
+# validators are imported on first use.
+#
+maxEntries = 65536
+
+# normalized website, or None if it isn't a valid URL
+@functools.lru_cache(maxsize=maxEntries)
+def normalizeWebsite(website):
+    from url_normalize import url_normalize
+    import validators
+
+    normalizedwebsite = url_normalize(website, default_scheme='https')
+    if not validators.url(normalizedwebsite):
+        return None
+
+    return normalizedwebsite
+
+@functools.lru_cache(maxsize=maxEntries)
+def normalizeURL(url):
+    from url_normalize import url_normalize
+
+    return url_normalize(url)
+
+# crunchbase organization URL in the https://www.crunchbase.com/organization/ form, or None
+@functools.lru_cache(maxsize=maxEntries)
+def normalizeCrunchbase(crunchbase):
+    if crunchbase.startswith('https://www.crunchbase.com/organization/'):
+        return crunchbase
+    # fix the URL if it's not formatted right
+    o = urlparse(crunchbase)
+    if (o.netloc == "crunchbase.com" or o.netloc == "www.crunchbase.com") and o.path.startswith("/organization"):
+        return "https://www.crunchbase.com{path}".format(path=o.path)
+
+    return None
+
+@functools.lru_cache(maxsize=maxEntries)
+def crunchbasePermalink(crunchbase):
+    path = [part for part in urlparse(crunchbase).path.split('/') if part]
+
+    return path[1].lower() if len(path) > 1 else None
+
+# twitter URL from a handle or twitter URL, or None if it's neither
+@functools.lru_cache(maxsize=maxEntries)
+def normalizeTwitter(twitter):
+    if twitter.startswith('https://twitter.com/'):
+        return twitter
+    # fix the URL if it's not formatted right
+    o = urlparse(twitter)
+    if o.netloc == '':
+        return "https://twitter.com/{}".format(twitter)
+    if (o.netloc == "twitter.com" or o.netloc == "www.twitter.com"):
+        return "https://twitter.com{path}".format(path=o.path)
+
+    return None
+
+caches = {
+    'website': normalizeWebsite,
+    'url': normalizeURL,
+    'crunchbase': normalizeCrunchbase,
+    'crunchbasePermalink': crunchbasePermalink,
+    'twitter': normalizeTwitter
+}
+
+#
+# Hits, misses and hit rate for each cache, for the run report
+#
+def cacheStats():
+    stats = {}
+    for name, cached in caches.items():
+        info = cached.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hitRate': info.hits / lookups if lookups else 0.0,
+            'entries': info.currsize,
+            'maxEntries': info.maxsize
+        }
+
+    return stats
+
+def clearCaches():
+    for cached in caches.values():
+        cached.cache_clear()
+
+metrics.registerCaches('urls', cacheStats)
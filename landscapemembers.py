@@ -10,87 +10,573 @@ from landscape_tools.lfxmembers import LFXMembers
 from landscape_tools.landscapemembers import LandscapeMembers
 from landscape_tools.crunchbasemembers import CrunchbaseMembers
 from landscape_tools.landscapeoutput import LandscapeOutput
+from landscape_tools.metrics import metrics
+from landscape_tools.log import setupLogging, Progress
+from landscape_tools.memory import MemoryReport
+from landscape_tools.checkpoint import Checkpoint
+from landscape_tools.cache import Cache
+from landscape_tools.domains import siteKey
+from landscape_tools import asynchttp
 
 from datetime import datetime
-from argparse import ArgumentParser,FileType
+from argparse import ArgumentParser
+import asyncio
+import cProfile
+import hashlib
+import json
+import logging
+import logging.handlers
+import math
+import multiprocessing
 import os
 from os import path
+import sys
+
+logger = logging.getLogger('landscapemembers')
 
 def main():
-    
+
     startTime = datetime.now()
 
     # load config
     parser = ArgumentParser()
-    parser.add_argument("-c", "--config", dest="configfile", type=FileType('r'), help="name of YAML config file")
+    parser.add_argument("-c", "--config", dest="configfiles", action="append", help="name of YAML config file; pass more than once to build several landscapes sharing the loaded data sources")
+    parser.add_argument("--report", dest="reportfile", help="write a JSON report of stage timings and counters to this file")
+    parser.add_argument("--profile", dest="profilefile", help="run under cProfile and write the stats to this file")
+    parser.add_argument("--memory-report", dest="memoryreportfile", help="write a JSON report of memory allocated by each data source to this file")
+    parser.add_argument("--crunchbase-bulk-data", dest="bulkdata", nargs='?', const='', help="match members against the Crunchbase bulk export in this file; without a file organizations.csv or bulk_export.tar.gz is used")
+    parser.add_argument("--memory-budget", dest="memorybudget", type=int, help="soft memory budget in MB; bulk data sources larger than this are indexed on disk instead of loaded into memory")
+    parser.add_argument("--record", dest="recordfile", help="record every HTTP request made to this archive file")
+    parser.add_argument("--replay", dest="replayfile", help="replay HTTP requests from an archive made with --record instead of using the network")
+    parser.add_argument("--replay-latency", dest="replaylatency", type=float, default=0, help="milliseconds to wait before each replayed response")
+    parser.add_argument("-v", "--verbose", dest="verbose", action="store_true", help="log every field overlayed on each member")
+    parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", help="only log warnings, errors and periodic progress")
+    parser.add_argument("--progress-interval", dest="progressinterval", type=float, default=10, help="seconds between progress lines")
+    parser.add_argument("--state-dir", dest="statedir", help="save checkpoints of the build to this directory so it can be resumed if interrupted")
+    parser.add_argument("--resume", dest="resume", action="store_true", help="continue from the last checkpoint in --state-dir")
+    parser.add_argument("--shards", dest="shards", type=int, help="match members across this many worker processes")
+    parser.add_argument("--load-workers", dest="loadworkers", type=int, help="parse the Crunchbase bulk export across this many worker processes")
+    parser.add_argument("--gc-logos", dest="gclogos", nargs='?', const='delete', choices=['delete', 'dry-run'], help="after writing the landscape remove the hosted logos it doesn't use; 'dry-run' only lists them")
+    parser.add_argument("--landscape-cache", dest="landscapecache", help="file to keep the members extracted from other landscapes in between runs, so unchanged landscapes aren't parsed again; keep it outside the landscape repo")
+    parser.add_argument("--landscapes-dir", dest="landscapesdir", help="read the other landscapes from repos cloned or mirrored under this directory as owner/name instead of downloading them")
+    parser.add_argument("--plan", dest="planfile", help="load and match members without downloading logos or writing the landscape, and write the changes a real run would make as JSON to this file ( '-' for stdout, in which case logging goes to stderr )")
+    parser.add_argument("--serve", dest="serve", help="keep the data sources loaded and serve build requests on this host:port or Unix socket path")
+    parser.add_argument("--serve-remote", dest="serveremote", action="store_true", help="allow --serve to listen on addresses other than loopback ones; the API has no authentication")
+    parser.add_argument("--refresh-interval", dest="refreshinterval", type=float, default=360, help="minutes between reloading the data sources when serving")
     args = parser.parse_args()
-    if args.configfile:
-        config = Config(args.configfile)
+    if args.resume and not args.statedir:
+        parser.error("--resume requires --state-dir")
+    if args.planfile and args.serve:
+        parser.error("--plan can't be used with --serve")
+    if args.bulkdata and not os.path.isfile(args.bulkdata):
+        parser.error("--crunchbase-bulk-data file {} not found".format(args.bulkdata))
+    # keep stdout for the plan when it's written there
+    setupLogging(verbose=args.verbose, quiet=args.quiet, stream=sys.stderr if args.planfile == '-' else None)
+    if args.loadworkers:
+        CrunchbaseMembers.loadWorkers = args.loadworkers
+    LandscapeMembers.cachefile = args.landscapecache or None
+    # planning doesn't write anything, but can still use what's cached
+    LandscapeMembers.cacheReadOnly = bool(args.planfile)
+    if args.landscapesdir:
+        LandscapeMembers.landscapesDir = args.landscapesdir
+    if args.configfiles:
+        configfiles = args.configfiles
     elif os.path.isfile("config.yml"):
-        config = Config("config.yml")
+        configfiles = ["config.yml"]
     else:
-        config = Config("config.yaml")
+        configfiles = ["config.yaml"]
+
+    profiler = None
+    if args.profilefile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # modules only needed for some options are imported when they are used, to keep
+    # startup fast
+    fixtures = None
+    if args.recordfile or args.replayfile:
+        from landscape_tools.httpfixtures import HTTPFixtures
+    if args.recordfile:
+        fixtures = HTTPFixtures(archive = args.recordfile, mode = 'record').start()
+    elif args.replayfile:
+        fixtures = HTTPFixtures(archive = args.replayfile, mode = 'replay', latency = args.replaylatency / 1000).start()
+
+    memoryreport = MemoryReport() if args.memoryreportfile else None
+
+    memorybudget = args.memorybudget * 1048576 if args.memorybudget else None
+    try:
+        if args.serve:
+            serve(args.serve, args.refreshinterval * 60, memorybudget = memorybudget, bulkdata = args.bulkdata, allowRemote = args.serveremote)
+        elif len(configfiles) > 1:
+            built = buildLandscapes(configfiles, memoryreport = memoryreport, memorybudget = memorybudget, bulkdata = args.bulkdata, statedir = args.statedir, resume = args.resume, shards = args.shards, gclogos = args.gclogos, plan = bool(args.planfile), progressinterval = args.progressinterval)
+        else:
+            config = loadConfig(configfiles[0])
+            checkpoint = getCheckpoint(args.statedir, config) if not args.planfile else None
+            built = [(config, buildLandscape(config, memoryreport = memoryreport, memorybudget = memorybudget, bulkdata = args.bulkdata, checkpoint = checkpoint, resume = args.resume, shards = args.shards, gclogos = args.gclogos, plan = bool(args.planfile), progressinterval = args.progressinterval))]
+        if args.planfile:
+            writePlan(args.planfile, built)
+    finally:
+        # keep whatever was recorded even if the run fails partway through
+        if fixtures:
+            fixtures.stop()
+
+    if memoryreport:
+        memoryreport.writeReport(args.memoryreportfile)
+        memoryreport.stop()
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profilefile)
+    if args.reportfile:
+        metrics.writeReport(args.reportfile)
+    logger.info("This took %s seconds", datetime.now() - startTime)
+
+#
+# Build the landscapes for several config files, loading the other landscape and Crunchbase
+# data once for all of them. Relative paths in each config are taken as relative to the
+# directory the config file is in.
+#
+def buildLandscapes(configfiles, memoryreport = None, memorybudget = None, bulkdata = None, statedir = None, resume = False, shards = None, gclogos = None, plan = False, progressinterval = None):
+    configs = [loadConfig(configfile) for configfile in configfiles]
+    lsmembers, cbmembers = loadSharedSources(memoryreport, memorybudget, bulkdata)
+
+    built = []
+    for configfile, config in zip(configfiles, configs):
+        logger.info("--%s landscape for %s--", "Planning" if plan else "Building", configfile)
+        checkpoint = getCheckpoint(statedir, config) if not plan else None
+        built.append((config, buildLandscape(config, lsmembers = lsmembers, cbmembers = cbmembers, memoryreport = memoryreport, checkpoint = checkpoint, resume = resume, shards = shards, gclogos = gclogos, plan = plan, progressinterval = progressinterval)))
 
-    # load member data sources
-    lfxmembers = LFXMembers(project = config.project)
-    cbmembers = CrunchbaseMembers()
-    lsmembers = LandscapeMembers()
+    cbmembers.close()
+
+    return built
+
+#
+# Write the changes planned for each of the built (config, LandscapeOutput) as JSON, keyed
+# on the landscape file they are for
+#
+def writePlan(planfile, built):
+    plan = json.dumps({config.landscapefile: lflandscape.changes() for config, lflandscape in built}, indent=2, default=str)
+    if planfile == '-':
+        print(plan)
+        return
+    with open(planfile, 'w', encoding='utf8') as fp:
+        fp.write(plan)
+
+#
+# Keep the other landscape and Crunchbase data loaded, reloading it every refreshInterval
+# seconds, and build landscapes on request until interrupted
+#
+def serve(address, refreshInterval, memorybudget = None, bulkdata = None, allowRemote = False):
+    from landscape_tools.service import LandscapeService, createServer
+
+    def build(configfile, lsmembers, cbmembers):
+        logger.info("--Building landscape for %s--", configfile)
+        config = loadConfig(configfile)
+        lflandscape = buildLandscape(config, lsmembers = lsmembers, cbmembers = cbmembers)
+        return {
+            'config': configfile,
+            'landscapefile': config.landscapefile,
+            'missingcsvfile': config.missingcsvfile,
+            'added': lflandscape.membersAdded,
+            'missing': lflandscape.membersErrors
+        }
+
+    server = createServer(None, address, allowRemote = allowRemote)
+    server.service = LandscapeService(load = lambda: loadSharedSources(memorybudget = memorybudget, bulkdata = bulkdata), build = build, refreshInterval = refreshInterval).start()
+    service = server.service
+    logger.info("Serving build requests on %s", address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+#
+# Load a config file, taking relative paths in it as relative to the directory it is in
+#
+def loadConfig(configfile):
+    config = Config(configfile)
+    configdir = os.path.dirname(os.path.abspath(configfile))
+    config.landscapefile = path.join(configdir, config.landscapefile)
+    config.missingcsvfile = path.join(configdir, config.missingcsvfile)
+    config.hostedLogosDir = path.join(configdir, config.hostedLogosDir)
+    if config.logoCacheFile:
+        config.logoCacheFile = path.join(configdir, config.logoCacheFile)
+
+    return config
+
+#
+# Checkpoints for each landscape are kept apart, keyed on where the landscape is written
+#
+def getCheckpoint(statedir, config):
+    if not statedir:
+        return None
+
+    return Checkpoint(statedir, hashlib.sha1(path.abspath(config.landscapefile).encode('utf8')).hexdigest()[:16])
+
+#
+# Load the data sources that are the same for every landscape built
+#
+def loadSharedSources(memoryreport = None, memorybudget = None, bulkdata = None):
+    lsmembers = LandscapeMembers(loadData = False)
+    loadSources([('landscapes', 'LandscapeMembers', lsmembers)], memoryreport)
+    cbmembers = loadCrunchbase(memoryreport, memorybudget, bulkdata)
+
+    return lsmembers, cbmembers
+
+#
+# Build the landscape for config. The other landscape and Crunchbase data sources are loaded
+# unless already loaded ones are passed in. If a checkpoint is given the build's progress is
+# saved to it as it goes, and with resume the build continues from what was saved. Matching
+# is split across shards worker processes if given. The Crunchbase bulk export is only
+# loaded if bulkdata is given, as described in loadCrunchbase(). gclogos set to 'delete' removes hosted
+# logos the written landscape doesn't use, and 'dry-run' just lists them. With plan, members
+# are matched but nothing is downloaded or written; the LandscapeOutput returned has the
+# changes a real build would make. Progress lines are logged every progressinterval seconds
+# if given.
+#
+def buildLandscape(config, lsmembers = None, cbmembers = None, memoryreport = None, memorybudget = None, bulkdata = None, checkpoint = None, resume = False, shards = None, gclogos = None, plan = False, progressinterval = None):
 
     lflandscape = LandscapeOutput()
+    lflandscape.dryRun = plan
+    if plan:
+        checkpoint = None
+    if config.logoCacheFile:
+        lflandscape.logoCache = Cache(name='logos', cachefile=config.logoCacheFile)
     lflandscape.landscapeMemberCategory = config.landscapeMemberCategory
     lflandscape.landscapeMemberClasses = config.landscapeMemberClasses
     lflandscape.landscapefile = config.landscapefile
     lflandscape.missingcsvfile = config.missingcsvfile
     lflandscape.hostedLogosDir = config.hostedLogosDir
-    if path.exists(config.landscapefile):
-        lflandscape.loadLandscape(reset=True)
+    with metrics.timer('load.landscapefile'):
+        if path.exists(config.landscapefile):
+            lflandscape.loadLandscape(reset=True)
+        else:
+            lflandscape.newLandscape()
+
+    progressState = checkpoint.load('progress') if checkpoint and resume else None
+    if progressState:
+        # members were already matched, so the data sources aren't needed
+        logger.info("--Resuming from checkpoint with %d of %d logos hosted--", len(progressState['logos']), len(progressState['pending']))
+        memberClasses = {memberClass['name']: memberClass for memberClass in lflandscape.landscapeMembers}
+        pending = [(member, memberClasses[name]) for member, name in progressState['pending']]
+        logos = progressState['logos']
+    else:
+        pending = matchMembers(config, lflandscape, lsmembers, cbmembers, memoryreport, memorybudget, checkpoint, resume, shards, bulkdata, progressinterval)
+        logos = []
+        if checkpoint:
+            checkpoint.save('progress', {'pending': [(member, memberClass['name']) for member, memberClass in pending], 'logos': logos})
+
+    # host the logos, saving after each batch if checkpointing
+    batch = checkpoint.logoBatch if checkpoint else max(len(pending), 1)
+    with metrics.timer('hostlogo'):
+        for start in range(len(logos), len(pending), batch):
+            logos += lflandscape.hostLogos([(member.logo, member.orgname) for member, memberClass in pending[start:start+batch]])
+            if checkpoint:
+                checkpoint.save('progress', {'pending': [(member, memberClass['name']) for member, memberClass in pending], 'logos': logos})
+    if lflandscape.logoCache is not None and not plan:
+        lflandscape.logoCache.save()
+
+    # Now update the landscapeMembers, reported separately from matching the members
+    progress = Progress(len(pending), label = 'items', interval = progressinterval)
+    for (member, memberClass), logo in zip(pending, logos):
+        progress.update()
+        try:
+            member.logo = logo
+        except ValueError as e:
+            pass
+
+        # Write out to missing.csv if it's missing key parameters
+        if not member.isValidLandscapeItem():
+            logger.info("...Missing key attributes for %s - skip", member.orgname)
+            lflandscape.removeHostedLogo(member.logo)
+            lflandscape.writeMissing(
+                member.orgname,
+                member.logo,
+                member.website,
+                member.crunchbase
+                )
+        # otherwise we can add it
+        else:
+            logger.info("...%s %s to Landscape", "Would add" if plan else "Added", member.orgname)
+            lflandscape.membersAdded += 1
+            # host the logo
+            if config.memberSuffix:
+                member.entrysuffix = config.memberSuffix
+            memberClass['items'].append(member.toLandscapeItemAttributes())
+
+    progress.finish()
+    if memoryreport:
+        memoryreport.snapshot('LandscapeOutput')
+
+    with metrics.timer('write.landscapefile'):
+        lflandscape.updateLandscape()
+    if gclogos:
+        with metrics.timer('gclogos'):
+            metrics.increment('logos.unused', len(lflandscape.collectLogos(dryRun = gclogos == 'dry-run')))
+    if checkpoint:
+        checkpoint.clear()
+    metrics.increment('members.added', lflandscape.membersAdded)
+    metrics.increment('members.missing', lflandscape.membersErrors)
+
+    return lflandscape
+
+#
+# Load the member data sources and overlay the other landscape and Crunchbase data onto
+# each LFX member, returning a list of (member, memberClass) to add to the landscape
+#
+def matchMembers(config, lflandscape, lsmembers = None, cbmembers = None, memoryreport = None, memorybudget = None, checkpoint = None, resume = False, shards = None, bulkdata = None, progressinterval = None):
+
+    # load member data sources, or take them from the checkpoint if resuming
+    lfxmembers = LFXMembers(project = config.project, loadData = False)
+    sources = [('lfx', 'LFXMembers', lfxmembers)]
+    if lsmembers is None:
+        lsmembers = LandscapeMembers(loadData = False)
+        sources.append(('landscapes', 'LandscapeMembers', lsmembers))
+    sourcesState = checkpoint.load('sources') if checkpoint and resume else None
+    if sourcesState and all(name in sourcesState for name, component, members in sources):
+        logger.info("--Resuming with data sources from checkpoint--")
+        for name, component, members in sources:
+            members.members = sourcesState[name]
+    else:
+        loadSources(sources, memoryreport)
+        if checkpoint:
+            checkpoint.save('sources', {name: members.members for name, component, members in sources})
+    loadedcbmembers = cbmembers is None
+    if loadedcbmembers:
+        cbmembers = loadCrunchbase(memoryreport, memorybudget, bulkdata)
+
+    # Iterate through the LFXMembers and overlay data from the other sources
+    memberClasses = {}
+    for memberClass in lflandscape.landscapeMembers:
+        memberClasses.setdefault(memberClass['name'], memberClass)
+    if config.fuzzyMatchThreshold:
+        # build these before any worker processes are forked so they are shared
+        with metrics.timer('index.fuzzy'):
+            lsmembers.fuzzyIndex()
+            cbmembers.fuzzyIndex()
+        if cbmembers.memoryBudget:
+            logger.info("Not fuzzy matching against Crunchbase with a memory budget set")
+    progress = Progress(len(lfxmembers.members), interval = progressinterval)
+    if shards and shards > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        matches = matchSharded(shards, lfxmembers.members, (config, list(memberClasses), lsmembers, cbmembers), progress)
     else:
-        lflandscape.newLandscape()
-
-    # Iterate through the LFXMembers and update the landscapeMembers
-    for member in lfxmembers.members:
-        print("Processing "+member.orgname)
-        for memberClass in lflandscape.landscapeMembers:
-            landscapeMemberClass = next((item for item in config.landscapeMemberClasses if item["name"] == member.membership), None)
-            if ( not landscapeMemberClass is None ) and ( landscapeMemberClass['name'] == member.membership ) and ( memberClass['name'] == landscapeMemberClass['category'] ) :
-                # lookup in other landscapes
-                for lookupmember in lsmembers.find(member.orgname, member.website):
-                    print("...Overlay other landscape data")
-                    lookupmember.overlay(member)
-                
-                # overlay crunchbase data
-                for cbmember in cbmembers.find(member.orgname,member.website):
-                    if (not member.crunchbase and cbmember):
-                        print("...Updating crunchbase from Crunchbase")
-                        member.crunchbase = cbmember.crunchbase
-                        
-                try:
-                    member.logo = lflandscape.hostLogo(logo=member.logo,orgname=member.orgname)
-                except ValueError as e:
-                    pass
-
-                # Write out to missing.csv if it's missing key parameters
-                if not member.isValidLandscapeItem():
-                    print("...Missing key attributes - skip")
-                    lflandscape.removeHostedLogo(member.logo)
-                    lflandscape.writeMissing(
-                        member.orgname,
-                        member.logo,
-                        member.website,
-                        member.crunchbase
-                        )
-                # otherwise we can add it
-                else:
-                    print("...Added to Landscape")
-                    lflandscape.membersAdded += 1
-                    # host the logo
-                    if config.memberSuffix:
-                        member.entrysuffix = config.memberSuffix
-                    memberClass['items'].append(member.toLandscapeItemAttributes())
-                break
-
-    lflandscape.updateLandscape()
-    print("This took "+str(datetime.now() - startTime)+" seconds")
+        if shards and shards > 1:
+            logger.warning("Worker processes can't share the loaded data sources on this platform - matching in this process")
+        matches = []
+        for member in lfxmembers.members:
+            progress.update()
+            matches.append((member, matchMember(config, memberClasses, member, lsmembers, cbmembers)))
+    pending = [(member, memberClasses[category]) for member, category in matches if category is not None]
+
+    progress.finish()
+    if loadedcbmembers:
+        cbmembers.close()
+
+    # lookup any members still missing crunchbase in one batch against the Crunchbase API
+    if config.crunchbaseAPI:
+        unmatched = [member for member, memberClass in pending if not member.crunchbase]
+        logger.info("--Looking up %d members in the Crunchbase API--", len(unmatched))
+        from landscape_tools.crunchbaseapimembers import CrunchbaseAPIMembers
+        cbapi = CrunchbaseAPIMembers()
+        cbapi.cachefile = config.crunchbaseCacheFile
+        cbapi.cacheTTL = config.crunchbaseCacheTTL
+        with metrics.timer('crunchbaseapi'):
+            cbapimatches = cbapi.find_many([(member.orgname, member.website) for member in unmatched])
+        for member, cbapimembers in zip(unmatched, cbapimatches):
+            for cbmember in cbapimembers:
+                if (not member.crunchbase and cbmember.crunchbase):
+                    logger.debug("...Updating crunchbase from Crunchbase API for %s", member.orgname)
+                    member.crunchbase = cbmember.crunchbase
+
+        # and fetch the organization directly for those with a crunchbase URL but no website
+        nowebsite = [member for member, memberClass in pending if member.crunchbasePermalink and not member.website]
+        if nowebsite:
+            with metrics.timer('crunchbaseapi'):
+                cbapimatches = cbapi.findByPermalinks([member.crunchbasePermalink for member in nowebsite])
+            for member, cbapimembers in zip(nowebsite, cbapimatches):
+                checkCrunchbaseWebsite(member, cbapimembers, 'Crunchbase API')
+
+    return pending
+
+#
+# Overlay the other landscape and Crunchbase data onto member, returning the category it
+# goes in or None if its membership isn't one in the landscape
+#
+def matchMember(config, categories, member, lsmembers, cbmembers):
+    logger.debug("Processing %s", member.orgname)
+    landscapeMemberClass = next((item for item in config.landscapeMemberClasses if item["name"] == member.membership), None)
+    if landscapeMemberClass is None or landscapeMemberClass['category'] not in categories:
+        return None
+
+    # lookup in other landscapes
+    with metrics.timer('match.landscapes'):
+        lookupmembers = lsmembers.find(member.orgname, member.website)
+    if not lookupmembers and config.fuzzyMatchThreshold:
+        with metrics.timer('match.fuzzy'):
+            lookupmembers = lsmembers.fuzzyFind(member.orgname, config.fuzzyMatchThreshold, limit = 1)
+        if lookupmembers:
+            logger.debug("...Matched %s to %s in other landscapes by similar name", member.orgname, lookupmembers[0].orgname)
+            metrics.increment('match.fuzzy.landscapes')
+    for lookupmember in lookupmembers:
+        logger.debug("...Overlay other landscape data for %s", member.orgname)
+        with metrics.timer('overlay'):
+            lookupmember.overlay(member)
+
+    # overlay crunchbase data, going straight to the organization if the crunchbase URL
+    # is already known
+    if member.crunchbasePermalink:
+        with metrics.timer('match.crunchbase.permalink'):
+            cbmatches = cbmembers.findByPermalink(member.crunchbasePermalink)
+        checkCrunchbaseWebsite(member, cbmatches, 'Crunchbase')
+        return landscapeMemberClass['category']
+
+    with metrics.timer('match.crunchbase'):
+        cbmatches = cbmembers.find(member.orgname,member.website)
+    if not cbmatches and config.fuzzyMatchThreshold:
+        with metrics.timer('match.fuzzy'):
+            cbmatches = cbmembers.fuzzyFind(member.orgname, config.fuzzyMatchThreshold, limit = 1)
+        if cbmatches:
+            logger.debug("...Matched %s to %s in Crunchbase by similar name", member.orgname, cbmatches[0].orgname)
+            metrics.increment('match.fuzzy.crunchbase')
+    for cbmember in cbmatches:
+        if (not member.crunchbase and cbmember.crunchbase):
+            logger.debug("...Updating crunchbase from Crunchbase for %s", member.orgname)
+            member.crunchbase = cbmember.crunchbase
+
+    return landscapeMemberClass['category']
+
+#
+# Fill in a missing website from the organization found by the member's crunchbase URL, or
+# count it if the two don't agree
+#
+def checkCrunchbaseWebsite(member, cbmatches, source):
+    for cbmember in cbmatches[:1]:
+        if not cbmember.website:
+            continue
+        if not member.website:
+            try:
+                member.website = cbmember.website
+                logger.debug("...Updating website from %s for %s", source, member.orgname)
+                metrics.increment('match.crunchbase.website')
+            except ValueError as e:
+                logger.debug(e)
+        elif siteKey(member.website) != siteKey(cbmember.website):
+            logger.debug("...Website %s for %s doesn't match %s from %s", member.website, member.orgname, cbmember.website, source)
+            metrics.increment('match.crunchbase.mismatch')
+
+# (config, categories, lsmembers, cbmembers) for the shard workers. It is set before the
+# pool is forked so the workers share the loaded data sources rather than each getting a
+# pickled copy.
+_shardSources = None
+
+def initShardWorker():
+    config, categories, lsmembers, cbmembers = _shardSources
+    if hasattr(cbmembers, 'attachIndex'):
+        cbmembers.attachIndex()
+    # drop the log records and metrics inherited from the parent, which still has them
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.BufferingHandler):
+            with handler.lock:
+                handler.buffer.clear()
+    metrics.reset()
+
+#
+# Returns the matches for members, along with the metrics recorded matching them for the
+# parent to merge into its own
+#
+def matchShard(members):
+    config, categories, lsmembers, cbmembers = _shardSources
+    matches = [(member, matchMember(config, categories, member, lsmembers, cbmembers)) for member in members]
+    # log output is buffered and the workers don't flush it when they exit
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+    return matches, metrics.collect()
+
+#
+# Match members across a pool of worker processes. Members are split into contiguous
+# shards and the results put back together in shard order, so the output is the same as
+# matching them one by one in this process.
+#
+def matchSharded(shards, members, sources, progress):
+    from concurrent.futures import ProcessPoolExecutor
+    global _shardSources
+    # a few shards per worker evens out the load when some members take longer to match
+    shardsize = max(math.ceil(len(members) / (shards * 4)), 1)
+    memberShards = [members[start:start+shardsize] for start in range(0, len(members), shardsize)]
+    matches = []
+    _shardSources = sources
+    # build the indexes before forking so the workers share them, rather than each building
+    # its own copy the first time it looks a member up
+    config, categories, lsmembers, cbmembers = sources
+    with metrics.timer('index.exact'):
+        lsmembers.index()
+        if not cbmembers.indexed:
+            cbmembers.index()
+            cbmembers.permalinkIndex()
+    # the workers don't make HTTP requests, and forking while the client's threads are
+    # running could leave a worker with a lock one of them held
+    asynchttp.shutdown()
+    try:
+        with metrics.timer('match.sharded'):
+            with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context('fork'), initializer=initShardWorker) as executor:
+                for shard, collected in executor.map(matchShard, memberShards):
+                    progress.update(len(shard))
+                    matches.extend(shard)
+                    metrics.merge(collected)
+    finally:
+        _shardSources = None
+    metrics.increment('match.shards', len(memberShards))
+
+    return matches
+
+#
+# Load a list of (name, component, members) remote data sources
+#
+def loadSources(sources, memoryreport = None):
+    if memoryreport:
+        # load one at a time so the memory used can be attributed to each source
+        for name, component, members in sources:
+            with metrics.timer('load.'+name):
+                members.loadData()
+            memoryreport.snapshot(component)
+    else:
+        asynchttp.run(loadRemoteSources(sources))
+
+    for name, component, members in sources:
+        metrics.increment('members.'+name, len(members.members))
+
+#
+# Fetch the remote data sources in the same event loop so the requests overlap
+#
+async def loadRemoteSources(sources):
+    async def timed(name, coroutine):
+        with metrics.timer(name):
+            return await coroutine
+
+    await asyncio.gather(*(timed('load.'+name, members.loadDataAsync()) for name, component, members in sources))
+
+#
+# Load the Crunchbase bulk export from the bulkdata file, or from where CrunchbaseMembers
+# looks for it by default if bulkdata is ''. If bulkdata is None nothing is loaded, so
+# members are only matched against Crunchbase through the API if it's enabled. A bulk
+# export that can't be found is warned about rather than failing the run.
+#
+def loadCrunchbase(memoryreport = None, memorybudget = None, bulkdata = None):
+    with metrics.timer('load.crunchbase'):
+        cbmembers = CrunchbaseMembers(bulkdatafile = bulkdata, loadData = bulkdata is not None, memoryBudget = memorybudget)
+    if bulkdata is not None and not os.path.isfile(cbmembers.bulkdatafile):
+        if bulkdata:
+            logger.warning("Crunchbase bulk export %s not found - not matching members against it", bulkdata)
+        else:
+            logger.warning("No Crunchbase bulk export found as %s - not matching members against it", ', '.join([CrunchbaseMembers.bulkdatafile] + CrunchbaseMembers.bulkdatafallbacks))
+    if memoryreport:
+        memoryreport.snapshot('CrunchbaseMembers')
+    metrics.increment('members.crunchbase', len(cbmembers.members))
+
+    return cbmembers
 
 if __name__ == '__main__':
     main()
@@ -11,6 +11,24 @@ from unittest.mock import Mock, MagicMock, patch
 from unittest import mock
 import tempfile
 import os
+import copy
+import pickle
+import json
+import io
+import gzip
+import tarfile
+import csv
+import shutil
+import subprocess
+import base64
+import sys
+import asyncio
+import threading
+import time
+import logging
+import socket
+import stat
+import http.client
 import responses
 from responses.registries import OrderedRegistry
 import requests
@@ -21,6 +39,25 @@ from landscape_tools.members import Members
 from landscape_tools.lfxmembers import LFXMembers
 from landscape_tools.landscapemembers import LandscapeMembers
 from landscape_tools.crunchbasemembers import CrunchbaseMembers
+from landscape_tools.crunchbaseapimembers import CrunchbaseAPIMembers
+from landscape_tools.ratelimiter import RateLimiter
+from landscape_tools.cache import Cache
+from landscape_tools.metrics import Metrics, metrics
+from landscape_tools.log import setupLogging, Progress
+from landscape_tools.memory import MemoryReport
+from landscape_tools.httpfixtures import HTTPFixtures
+from landscape_tools.asynchttp import AsyncHTTP
+from landscape_tools import asynchttp
+from landscape_tools.hostscheduler import HostScheduler, CircuitBreaker, CircuitOpenError
+from landscape_tools.service import LandscapeService, createServer
+from landscape_tools.checkpoint import Checkpoint
+from landscape_tools.domains import SuffixList, registeredDomain, siteKey
+from landscape_tools.localsource import LocalLandscapes
+from landscape_tools.fuzzymatch import FuzzyIndex
+from landscape_tools import urls
+
+import benchmarks
+import landscapemembers
 from landscape_tools.landscapeoutput import LandscapeOutput
 
 class TestConfig(unittest.TestCase):
@@ -90,6 +127,8 @@ project: a09410000182dD2AAI # Academy Software Foundation
         self.assertEqual(config.missingcsvfile,'missing.csv')
         self.assertEqual(config.hostedLogosDir,'hosted_logos')
         self.assertIsNone(config.memberSuffix)
+        self.assertFalse(config.crunchbaseAPI)
+        self.assertIsNone(config.fuzzyMatchThreshold)
         self.assertEqual(config.project,"a09410000182dD2AAI")
 
         os.unlink(tmpfilename.name)
@@ -142,6 +181,12 @@ class TestMember(unittest.TestCase):
 
             self.assertFalse(member._validCrunchbase)
 
+    def testCrunchbasePermalink(self):
+        member = Member()
+        self.assertIsNone(member.crunchbasePermalink)
+        member.crunchbase = 'https://www.crunchbase.com/organization/Visual-Effects-Society/'
+        self.assertEqual(member.crunchbasePermalink,'visual-effects-society')
+
     def testSetWebsiteValid(self):
         validWebsiteURLs = [
             {'before':'https://crunchbase.com/','after':'https://crunchbase.com/'},
@@ -433,6 +478,78 @@ class TestMembers(unittest.TestCase):
         
         self.assertEqual(len(members.find(member.orgname,member.website)),2)
     
+    @patch("landscape_tools.members.Members.__abstractmethods__", set())
+    def testFindRegisteredDomain(self):
+        members = Members()
+
+        member = Member()
+        member.orgname = 'test'
+        member.website = 'https://www.foo.co.uk/about'
+        members.members.append(member)
+
+        self.assertTrue(members.find('dog','http://foo.co.uk'))
+        self.assertTrue(members.find('dog','https://blog.foo.co.uk/'))
+        self.assertFalse(members.find('dog','https://bar.co.uk/'))
+
+        # members added after a find are indexed on the next one
+        member = Member()
+        member.orgname = 'dog'
+        member.website = 'https://dog.com'
+        members.members.append(member)
+        self.assertEqual(members.find('dog','https://www.foo.co.uk/'),members.members)
+
+    @patch("landscape_tools.members.Members.__abstractmethods__", set())
+    def testFindSharedHost(self):
+        members = Members()
+        for name, website in [('Acme','https://github.com/acme'),('Other Corp','https://www.github.com/othercorp/'),('Site','https://sites.google.com/view/site'),('Wix','https://wix1.wixsite.com/home')]:
+            member = Member()
+            member.orgname = name
+            member.website = website
+            members.members.append(member)
+
+        self.assertEqual(members.find('Brand New Co','https://github.com/brandnew'),[])
+        self.assertEqual(members.find('Brand New Co','https://github.com/'),[])
+        self.assertEqual([member.orgname for member in members.find('Brand New Co','http://GitHub.com/Acme/')],['Acme'])
+        self.assertEqual(members.find('Brand New Co','https://sites.google.com/view/other'),[])
+        self.assertEqual(members.find('Brand New Co','https://wix2.wixsite.com/home'),[])
+        self.assertEqual([member.orgname for member in members.find('Brand New Co','https://wix1.wixsite.com/about')],['Wix'])
+
+    @patch("landscape_tools.members.Members.__abstractmethods__", set())
+    def testFindReplacedMembers(self):
+        members = Members()
+        for name in ['dog','cat']:
+            member = Member()
+            member.orgname = name
+            members.members.append(member)
+        self.assertTrue(members.find('dog',None))
+        self.assertTrue(members.fuzzyFind('dog'))
+
+        # a new list of the same length is indexed again
+        replaced = []
+        for name in ['mouse','eel']:
+            member = Member()
+            member.orgname = name
+            replaced.append(member)
+        members.members = replaced
+        self.assertEqual(members.find('dog',None),[])
+        self.assertEqual(members.find('mouse',None),replaced[:1])
+        self.assertEqual(members.fuzzyFind('mouse'),replaced[:1])
+
+    @patch("landscape_tools.members.Members.__abstractmethods__", set())
+    def testFuzzyFind(self):
+        members = Members()
+        for name in ['International Business Machines','Intel','Société Générale']:
+            member = Member()
+            member.orgname = name
+            members.members.append(member)
+
+        self.assertFalse(members.find('IBM Intl.',None))
+        self.assertEqual([member.orgname for member in members.fuzzyFind('Intl. Business Machines Corp.')],['International Business Machines'])
+        self.assertEqual([member.orgname for member in members.fuzzyFind('Generale Societe')],['Société Générale'])
+        self.assertEqual(members.fuzzyFind('Intel Capital'),[])
+        self.assertEqual([member.orgname for member in members.fuzzyFind('Intel Capital', threshold=0.3)],['Intel'])
+        self.assertEqual(len(members.fuzzyFind('Intel', threshold=0.01, limit=2)),2)
+
     @patch("landscape_tools.members.Members.__abstractmethods__", set())
     def testNormalizeCompanyEmptyOrg(self):
         members = Members(loadData=False)
@@ -449,6 +566,221 @@ class TestMembers(unittest.TestCase):
             members = Members(loadData=False)
             self.assertEqual(members.normalizeCompany(company["name"]),company["normalized"])
 
+@unittest.skipUnless(shutil.which('git'), 'needs git')
+class TestLocalLandscapes(unittest.TestCase):
+
+    landscape = """
+landscape:
+  - category:
+    name: Members
+    subcategories:
+      - subcategory:
+        name: Premier
+        items:
+          - item:
+            name: {name}
+            homepage_url: https://{name}.com/
+            logo: {name}.svg
+"""
+
+    def _writeRepo(self, path, name):
+        os.makedirs(os.path.join(path,'hosted_logos'))
+        with open(os.path.join(path,'settings.yml'),'w') as fp:
+            fp.write("global:\n  membership: Members\n")
+        with open(os.path.join(path,'landscape.yml'),'w') as fp:
+            fp.write(self.landscape.format(name=name))
+        with open(os.path.join(path,'hosted_logos',name+'.svg'),'w') as fp:
+            fp.write('<svg>{}</svg>'.format(name))
+
+    def _git(self, *args):
+        subprocess.run(['git','-c','user.name=test','-c','user.email=test@example.com']+list(args), check=True, capture_output=True)
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tempdir.name,'repos')
+        os.makedirs(os.path.join(self.directory,'cncf','landscapeapp'))
+        with open(os.path.join(self.directory,'cncf','landscapeapp','landscapes.yml'),'w') as fp:
+            fp.write("landscapes:\n  - landscape:\n    name: one\n    repo: one/landscape\n  - landscape:\n    name: two\n    repo: two/mirror\n  - landscape:\n    name: three\n    repo: three/landscape\n")
+        self._writeRepo(os.path.join(self.directory,'one','landscape'), 'dog')
+        # a bare mirror of a repo with the cat landscape
+        source = os.path.join(self.tempdir.name,'source')
+        self._writeRepo(source, 'cat')
+        self._git('-C',source,'init','-q')
+        self._git('-C',source,'add','.')
+        self._git('-C',source,'commit','-q','-m','cat')
+        self._git('clone','-q','--mirror',source,os.path.join(self.directory,'two','mirror.git'))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testRead(self):
+        # repos are only found under their owner, not by name alone
+        os.makedirs(os.path.join(self.directory,'landscape'))
+        source = LocalLandscapes(self.directory)
+        self.assertEqual(source.repoPath('one/landscape'),(os.path.join(self.directory,'one','landscape'),False))
+        self.assertEqual(source.repoPath('two/mirror'),(os.path.join(self.directory,'two','mirror.git'),True))
+        self.assertIsNone(source.repoPath('three/landscape'))
+        self.assertEqual(source.read('two/mirror','settings.yml'),b"global:\n  membership: Members\n")
+        self.assertIsNone(source.read('two/mirror','missing.yml'))
+        self.assertIsNone(source.read('one/landscape','missing.yml'))
+        self.assertIsNone(source.revision('one/landscape'))
+        self.assertEqual(len(source.revision('two/mirror')),40)
+        self.assertEqual(source.read('two/mirror','hosted_logos/cat.svg'),b'<svg>cat</svg>')
+        self.assertIsNone(source.read('../repos/one/landscape','settings.yml'))
+
+        # without git, bare mirrors can't be read but checkouts still can
+        source = LocalLandscapes(self.directory)
+        source.git = 'git-not-installed'
+        self.assertIsNone(source.read('two/mirror','settings.yml'))
+        self.assertIsNone(source.revision('two/mirror'))
+        self.assertEqual(source.read('one/landscape','hosted_logos/dog.svg'),b'<svg>dog</svg>')
+
+    def testReadLocalLogo(self):
+        with patch.object(LandscapeMembers,'landscapesDir',self.directory):
+            self.assertEqual(LandscapeMembers.readLocalLogo('https://raw.githubusercontent.com/two/mirror/master/hosted_logos/cat.svg'),b'<svg>cat</svg>')
+            self.assertEqual(LandscapeMembers.readLocalLogo('https://raw.githubusercontent.com/one/landscape/master/hosted_logos/dog.svg'),b'<svg>dog</svg>')
+            self.assertIsNone(LandscapeMembers.readLocalLogo('https://raw.githubusercontent.com/one/landscape/master/hosted_logos/cat.svg'))
+            self.assertIsNone(LandscapeMembers.readLocalLogo('https://raw.githubusercontent.com/../source/master/hosted_logos/cat.svg'))
+            self.assertIsNone(LandscapeMembers.readLocalLogo('https://dog.com/dog.svg'))
+        self.assertIsNone(LandscapeMembers.readLocalLogo('https://raw.githubusercontent.com/one/landscape/master/hosted_logos/dog.svg'))
+
+    def testLoadData(self):
+        with patch('landscape_tools.asynchttp.getClient',side_effect=AssertionError("nothing should be downloaded")):
+            members = LandscapeMembers(loadData = False)
+            members.landscapesDir = self.directory
+            members.cachefile = os.path.join(self.tempdir.name,'landscapecache.json')
+            members.loadData()
+            self.assertEqual([(member.orgname, member.logo) for member in members.members],[
+                ('dog','https://raw.githubusercontent.com/one/landscape/master/hosted_logos/dog.svg'),
+                ('cat','https://raw.githubusercontent.com/two/mirror/master/hosted_logos/cat.svg')
+                ])
+
+            landscape = LandscapeOutput()
+            with tempfile.TemporaryDirectory() as hostedLogosDir, patch.object(LandscapeMembers,'landscapesDir',self.directory):
+                landscape.hostedLogosDir = hostedLogosDir
+                self.assertEqual(landscape.hostLogos([(member.logo, member.orgname) for member in members.members]),['dog.svg','cat.svg'])
+                with open(os.path.join(hostedLogosDir,'cat.svg'),'rb') as fp:
+                    self.assertEqual(fp.read(),b'<svg>cat</svg>')
+
+            # the mirror is unchanged, so it's loaded from the cache without reading its files
+            cached = LandscapeMembers(loadData = False)
+            cached.landscapesDir = self.directory
+            cached.cachefile = members.cachefile
+            with patch.object(LocalLandscapes,'read',autospec=True,side_effect=LocalLandscapes.read) as read:
+                cached.loadData()
+            self.assertEqual([call.args[1] for call in read.call_args_list],['cncf/landscapeapp','one/landscape','one/landscape'])
+            self.assertEqual([member.orgname for member in cached.members],['dog','cat'])
+
+    @responses.activate
+    def testHostLogoFallsBackToDownload(self):
+        responses.add(
+            method=responses.GET,
+            url='https://raw.githubusercontent.com/one/landscape/master/hosted_logos/cat.svg',
+            body=b'<svg>downloaded</svg>'
+            )
+        landscape = LandscapeOutput()
+        with tempfile.TemporaryDirectory() as hostedLogosDir, patch.object(LandscapeMembers,'landscapesDir',self.directory):
+            landscape.hostedLogosDir = hostedLogosDir
+            self.assertEqual(landscape.hostLogo('https://raw.githubusercontent.com/one/landscape/master/hosted_logos/cat.svg','cat'),'cat.svg')
+            with open(os.path.join(hostedLogosDir,'cat.svg'),'rb') as fp:
+                self.assertEqual(fp.read(),b'<svg>downloaded</svg>')
+
+class TestDomains(unittest.TestCase):
+
+    def testRegisteredDomain(self):
+        self.assertEqual(registeredDomain('https://www.foo.com/about'),'foo.com')
+        self.assertEqual(registeredDomain('http://FOO.com:8080'),'foo.com')
+        self.assertEqual(registeredDomain('foo.com'),'foo.com')
+        self.assertEqual(registeredDomain('https://www.foo.co.uk/'),'foo.co.uk')
+        self.assertEqual(registeredDomain('https://dog.github.io/project'),'dog.github.io')
+        self.assertEqual(registeredDomain('https://foo.bar.newtld/'),'bar.newtld')
+        self.assertEqual(registeredDomain('https://192.168.1.1/'),'192.168.1.1')
+        self.assertIsNone(registeredDomain('https://co.uk/'))
+        self.assertIsNone(registeredDomain(None))
+        self.assertIsNone(registeredDomain(''))
+
+    def testSiteKey(self):
+        self.assertEqual(siteKey('https://www.foo.com/about'),'foo.com')
+        self.assertEqual(siteKey('https://www.github.com/Foo/'),'github.com/foo')
+        self.assertEqual(siteKey('https://sites.google.com/view/foo'),'sites.google.com/view/foo')
+        self.assertEqual(siteKey('https://foo.wixsite.com/bar'),'foo.wixsite.com')
+        self.assertIsNone(siteKey('https://github.com/'))
+        self.assertIsNone(siteKey(None))
+
+    def testWildcardRules(self):
+        with tempfile.NamedTemporaryFile(mode='w',suffix='.dat') as suffixfile:
+            suffixfile.write("// comment\n*.ck\n!www.ck\ncom\n")
+            suffixfile.flush()
+            suffixes = SuffixList(suffixfile.name)
+
+            self.assertEqual(suffixes.registeredDomain('https://a.foo.co.ck/'),'foo.co.ck')
+            self.assertEqual(suffixes.registeredDomain('https://a.www.ck/'),'www.ck')
+            self.assertIsNone(suffixes.registeredDomain('https://co.ck/'))
+
+class TestFuzzyIndex(unittest.TestCase):
+
+    def testCanonicalName(self):
+        index = FuzzyIndex()
+        self.assertEqual(index.canonicalName("Int'l Widgets & Gadgets, Inc."),'gadgets international widgets')
+        self.assertEqual(index.canonicalName('Zürich Tech Labs GmbH'),'laboratories technology zurich')
+        self.assertEqual(index.canonicalName(None),'')
+
+    def testBlockingMatchesFullScan(self):
+        rand = benchmarks.random.Random(1)
+        names = [benchmarks.companyName(rand, i) for i in range(2000)]
+        index = FuzzyIndex(names)
+        for query in names[:20] + ['Acme Intl', 'Zzyzx']:
+            grams = index.ngrams(query)
+            candidates = index.candidates(grams, index.threshold)
+            self.assertLess(len(candidates), len(names) / 4)
+            expected = []
+            for position, name in enumerate(names):
+                candidate = index.ngrams(name)
+                score = len(grams & candidate) / len(grams | candidate)
+                if score >= index.threshold:
+                    expected.append(position)
+            self.assertEqual(sorted(position for position, score in index.search(query)),expected)
+
+    def testMaxCandidates(self):
+        # every name shares the query's n-grams, so blocking can't narrow them down
+        names = ['Acme {}'.format('x' * (i % 7)) for i in range(50)] + ['Acme']
+        index = FuzzyIndex(names, threshold=0.5)
+        self.assertEqual(len(index.candidates(index.ngrams('Acme'), 0.5)),len(names))
+        self.assertIn((len(names) - 1, 1.0),index.search('Acme'))
+        index.maxCandidates = 10
+        self.assertEqual(len(index.candidates(index.ngrams('Acme'), 0.5)),10)
+
+    def testSearchMany(self):
+        index = FuzzyIndex(['Dog Co.','Cat Ltd'], threshold=0.9)
+        self.assertEqual(index.search_many(['dog','CAT','bird','']),[[(0, 1.0)],[(1, 1.0)],[],[]])
+
+class TestURLs(unittest.TestCase):
+
+    def testNormalize(self):
+        self.assertEqual(urls.normalizeWebsite('foo.com'),'https://foo.com/')
+        self.assertIsNone(urls.normalizeWebsite('not a website'))
+        self.assertEqual(urls.normalizeCrunchbase('http://crunchbase.com/organization/foo'),'https://www.crunchbase.com/organization/foo')
+        self.assertIsNone(urls.normalizeCrunchbase('https://foo.com/organization/foo'))
+        self.assertEqual(urls.normalizeTwitter('foo'),'https://twitter.com/foo')
+        self.assertEqual(urls.normalizeTwitter('http://www.twitter.com/foo'),'https://twitter.com/foo')
+        self.assertIsNone(urls.normalizeTwitter('https://foo.com/foo'))
+
+    def testCacheStats(self):
+        urls.clearCaches()
+        for i in range(3):
+            member = Member()
+            member.orgname = 'dog'
+            member.website = 'https://dog.com'
+            with self.assertRaises(ValueError):
+                member.website = 'not a website'
+
+        stats = urls.cacheStats()['website']
+        self.assertEqual(stats['misses'],2)
+        self.assertEqual(stats['hits'],4)
+        self.assertAlmostEqual(stats['hitRate'],4/6)
+        self.assertEqual(stats['entries'],2)
+        self.assertEqual(metrics.report()['caches']['urls']['website']['hits'],4)
+
 class TestLFXMembers(unittest.TestCase):
 
     def testFind(self):
@@ -669,6 +1001,227 @@ landscape:
         self.assertEqual(members.members[0].orgname,"Academy of Motion Picture Arts and Sciences")
         self.assertEqual(members.members[1].orgname,"Blender Foundation")
     
+    @responses.activate
+    def testLoadDataServerErrors(self):
+        members = LandscapeMembers(loadData = False)
+        repos = ['broken/landscape{}'.format(i) for i in range(12)] + ['working/landscape']
+        responses.add(
+            method=responses.GET,
+            url=members.landscapeListYAML,
+            body="landscapes:\n" + "".join("  - landscape:\n    name: {}\n    repo: {}\n".format(repo.replace('/','-'), repo) for repo in repos)
+            )
+        for repo in repos[:-1]:
+            responses.add(method=responses.GET, url=members.landscapeSettingsYAML.format(repo=repo), status=503)
+            responses.add(method=responses.GET, url=members.landscapeLandscapeYAML.format(repo=repo), status=503)
+        responses.add(
+            method=responses.GET,
+            url=members.landscapeSettingsYAML.format(repo='working/landscape'),
+            body="global:\n  membership: Members\n"
+            )
+        responses.add(
+            method=responses.GET,
+            url=members.landscapeLandscapeYAML.format(repo='working/landscape'),
+            body="""
+landscape:
+  - category:
+    name: Members
+    subcategories:
+      - subcategory:
+        name: Premier
+        items:
+          - item:
+            name: Blender Foundation
+            homepage_url: https://blender.org/
+            logo: blender_foundation.svg
+"""
+            )
+        # one host serves every landscape, so their errors mustn't open its circuit breaker
+        # and abort the rest
+        with patch.object(asynchttp,'_client',AsyncHTTP()):
+            with self.assertLogs('landscape_tools.landscapemembers', level='WARNING') as logs:
+                members.loadData()
+        self.assertEqual([member.orgname for member in members.members],['Blender Foundation'])
+        self.assertEqual(len([line for line in logs.output if 'returned 503' in line]),12)
+
+    @responses.activate
+    def testLoadDataConnectionError(self):
+        members = LandscapeMembers(loadData = False)
+        responses.add(
+            method=responses.GET,
+            url=members.landscapeListYAML,
+            body="landscapes:\n  - landscape:\n    name: down\n    repo: down/landscape\n"
+            )
+        responses.add(
+            method=responses.GET,
+            url=members.landscapeSettingsYAML.format(repo='down/landscape'),
+            body=requests.exceptions.ConnectionError('down')
+            )
+        responses.add(
+            method=responses.GET,
+            url=members.landscapeLandscapeYAML.format(repo='down/landscape'),
+            body=requests.exceptions.ConnectionError('down')
+            )
+        with patch.object(asynchttp,'_client',AsyncHTTP()):
+            with self.assertLogs('landscape_tools.landscapemembers', level='WARNING') as logs:
+                members.loadData()
+        self.assertEqual(members.members,[])
+        self.assertIn("Skipping down - couldn't fetch it",logs.output[0])
+
+    @responses.activate
+    def testDeduplicate(self):
+        settings = """
+global:
+  membership: Members
+"""
+        landscape = """
+landscape:
+  - category:
+    name: Members
+    subcategories:
+      - subcategory:
+        name: Premier
+        items:
+{items}
+"""
+        item = """          - item:
+            name: {name}
+            homepage_url: {website}
+            logo: {logo}
+            crunchbase: https://www.crunchbase.com/organization/{name}
+"""
+        responses.add(method=responses.GET, url=LandscapeMembers.landscapeListYAML, body="""
+landscapes:
+  - landscape:
+    name: one
+    repo: one/landscape
+  - landscape:
+    name: two
+    repo: two/landscape
+""")
+        for repo, items in [
+                ('one/landscape', item.format(name='dog', website='https://dog.com/', logo='dog.svg')),
+                ('two/landscape', item.format(name='dog', website='https://dogs.org/', logo='dogs.svg') +
+                    item.format(name='dog', website='https://dog.com/', logo='dog2.svg') + "            twitter: https://twitter.com/dog\n" +
+                    item.format(name='cat', website='https://cat.com/', logo='cat.svg'))
+                ]:
+            responses.add(method=responses.GET, url=LandscapeMembers.landscapeSettingsYAML.format(repo=repo), body=settings)
+            responses.add(method=responses.GET, url=LandscapeMembers.landscapeLandscapeYAML.format(repo=repo), body=landscape.format(items=items))
+        members = LandscapeMembers(loadData = False)
+        members.loadData()
+
+        self.assertEqual([member.orgname for member in members.members],['dog','dog','cat'])
+        self.assertEqual([(landscape, member.logo, member.twitter) for landscape, member in members.variants(members.members[0])],[
+            ('one','https://raw.githubusercontent.com/one/landscape/master/hosted_logos/dog.svg',None),
+            ('two','https://raw.githubusercontent.com/two/landscape/master/hosted_logos/dog2.svg','https://twitter.com/dog')
+            ])
+
+        found = members.find('dog','https://dog.com/')
+        self.assertEqual([member.logo.split('/')[-1] for member in found],['dog.svg','dogs.svg','dog2.svg'])
+        member = Member()
+        member.orgname = 'dog'
+        for lookupmember in found:
+            lookupmember.overlay(member)
+        self.assertEqual(member.website,'https://dog.com/')
+        self.assertEqual(member.logo,'https://raw.githubusercontent.com/one/landscape/master/hosted_logos/dog.svg')
+        self.assertEqual(member.twitter,'https://twitter.com/dog')
+
+        # the collapsed members survive being pickled for checkpoints and worker processes
+        restored = LandscapeMembers(loadData = False)
+        restored.members = pickle.loads(pickle.dumps(members.members))
+        self.assertEqual([member.twitter for member in restored.find('dog','https://dog.com/')],[None,None,'https://twitter.com/dog'])
+
+    @responses.activate
+    def testLoadDataCached(self):
+        landscape = """
+landscape:
+  - category:
+    name: Members
+    subcategories:
+      - subcategory:
+        name: Premier
+        items:
+          - item:
+            name: {name}
+            homepage_url: https://{name}.com/
+            logo: {name}.svg
+            twitter: https://twitter.com/{name}
+"""
+        responses.add(method=responses.GET, url=LandscapeMembers.landscapeListYAML, body="""
+landscapes:
+  - landscape:
+    name: one
+    repo: one/landscape
+  - landscape:
+    name: two
+    repo: two/landscape
+""")
+        for repo, name in [('one/landscape','dog'),('two/landscape','cat')]:
+            responses.add(method=responses.GET, url=LandscapeMembers.landscapeSettingsYAML.format(repo=repo), body="global:\n  membership: Members\n")
+            responses.add(method=responses.GET, url=LandscapeMembers.landscapeLandscapeYAML.format(repo=repo), body=landscape.format(name=name))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            cachefile = os.path.join(tempdir,'landscapecache.json')
+            members = LandscapeMembers(loadData = False)
+            members.cachefile = cachefile
+            members.loadData()
+            self.assertTrue(os.path.isfile(cachefile))
+
+            responses.replace(responses.GET, LandscapeMembers.landscapeLandscapeYAML.format(repo='two/landscape'), body=landscape.format(name='mouse'))
+            cached = LandscapeMembers(loadData = False)
+            cached.cachefile = cachefile
+            with patch.object(LandscapeMembers,'_extractItems',wraps=cached._extractItems) as extractItems:
+                cached.loadData()
+            self.assertEqual([call.args[1] for call in extractItems.call_args_list],[landscape.format(name='mouse').encode('utf8')])
+            self.assertEqual([(member.orgname, member.website, member.logo, member.twitter) for member in cached.members],[
+                ('dog','https://dog.com/','https://raw.githubusercontent.com/one/landscape/master/hosted_logos/dog.svg','https://twitter.com/dog'),
+                ('mouse','https://mouse.com/','https://raw.githubusercontent.com/two/landscape/master/hosted_logos/mouse.svg','https://twitter.com/mouse')
+                ])
+            self.assertEqual([landscape for landscape, member in cached.variants(cached.members[0])],['one'])
+
+            # members are cached as the plain items they are built from
+            entry = cached.loadCache()['one/landscape']
+            self.assertEqual(entry[1],[{'item': None, 'name': 'dog', 'homepage_url': 'https://dog.com/', 'logo': 'dog.svg', 'twitter': 'https://twitter.com/dog'}])
+            self.assertIs(type(entry[1][0]['name']),str)
+
+            # a landscape that can't be fetched is skipped, keeping its cache entry for next time
+            responses.replace(responses.GET, LandscapeMembers.landscapeLandscapeYAML.format(repo='two/landscape'), status=503)
+            failed = LandscapeMembers(loadData = False)
+            failed.cachefile = cachefile
+            with self.assertLogs('landscape_tools.landscapemembers', level='WARNING'):
+                failed.loadData()
+            self.assertEqual([member.orgname for member in failed.members],['dog'])
+            self.assertEqual(failed.loadCache()['two/landscape'][1][0]['name'],'mouse')
+
+            # a cache entry that can't be turned back into members is parsed again
+            responses.replace(responses.GET, LandscapeMembers.landscapeLandscapeYAML.format(repo='two/landscape'), body=landscape.format(name='mouse'))
+            corrupt = failed.loadCache()
+            corrupt['two/landscape'] = (corrupt['two/landscape'][0], ['not an item'])
+            failed.saveCache(corrupt)
+            reparsed = LandscapeMembers(loadData = False)
+            reparsed.cachefile = cachefile
+            with self.assertLogs('landscape_tools.landscapemembers', level='WARNING'):
+                reparsed.loadData()
+            self.assertEqual([member.orgname for member in reparsed.members],['dog','mouse'])
+            self.assertEqual(reparsed.loadCache()['two/landscape'][1][0]['name'],'mouse')
+
+            # an unreadable cache is ignored
+            with open(cachefile,'wb') as fp:
+                fp.write(b'not json')
+            members = LandscapeMembers(loadData = False)
+            members.cachefile = cachefile
+            members.loadData()
+            self.assertEqual(len(members.members),2)
+            self.assertEqual(set(members.loadCache()),{'one/landscape','two/landscape'})
+
+            # a read-only cache is never written
+            os.unlink(cachefile)
+            members = LandscapeMembers(loadData = False)
+            members.cachefile = cachefile
+            members.cacheReadOnly = True
+            members.loadData()
+            self.assertEqual(len(members.members),2)
+            self.assertFalse(os.path.exists(cachefile))
+
     @responses.activate
     def testLoadDataSkipLandscape(self):
         members = LandscapeMembers(loadData = False)
@@ -893,6 +1446,557 @@ e1393508-30ea-8a36-3f96dd3226033abd,Wetpaint,organization,wetpaint,https://www.c
 
         os.unlink(tmpfilename.name)
 
+    def testLoadDataBulkDataIndexed(self):
+        testcsvfilecontents = """
+uuid,name,type,permalink,cb_url,rank,created_at,updated_at,legal_name,roles,domain,homepage_url,country_code,state_code,region,city,address,postal_code,status,short_description,category_list,category_groups_list,num_funding_rounds,total_funding_usd,total_funding,total_funding_currency_code,founded_on,last_funding_on,closed_on,employee_count,email,phone,facebook_url,linkedin_url,twitter_url,logo_url,alias1,alias2,alias3,primary_role,num_exits
+e1393508-30ea-8a36-3f96dd3226033abd,Wetpaint,organization,wetpaint,https://www.crunchbase.com/organization/wetpaint,145154,2007-05-25 13:51:27,2019-06-24 22:19:25,,company,wetpaint.com,http://www.wetpaint.com/,USA,NY,New York,New York,902 Broadway 11th Floor New,10010,acquired,Wetpaint offers an online social publishing platform that helps digital publishers grow their customer base.,"Publishing,Social Media,Social Media Management","Content and Publishing,Internet Services,Media and Entertainment,Sales and Marketing",3,39750000,39750000,USD,2005-06-01,2008-05-19,,51-100,info@wetpaint.com,206-859-6300,https://www.facebook.com/Wetpaint,https://www.linkedin.com/company/wetpaint,https://twitter.com/wetpainttv,"https://crunchbase-production-res.cloudinary.com/image/upload/c_lpad,h_120,w_120,f_jpg/v1397180177/2036b3394a37152e0ff69f27c71bc883.jpg",,,,company,
+"""
+        tmpfilename = tempfile.NamedTemporaryFile(mode='w',delete=False)
+        tmpfilename.write(testcsvfilecontents)
+        tmpfilename.close()
+
+        members = CrunchbaseMembers(bulkdatafile = tmpfilename.name, memoryBudget = 1)
+        members.loadData()
+        self.assertTrue(members.indexed)
+        self.assertEqual(members.members,[])
+        found = members.find('Wetpaint','http://www.foo.com/')
+        self.assertEqual(found[0].crunchbase,'https://www.crunchbase.com/organization/wetpaint')
+        self.assertEqual(found[0].website,'http://www.wetpaint.com/')
+        self.assertTrue(members.find('Wetpaint, Inc.','http://www.foo.com/'))
+        self.assertTrue(members.find('Wetpainter','http://www.wetpaint.com/'))
+        self.assertFalse(members.find('Wetpainter','http://www.foo.com/'))
+
+        self.assertEqual(members.findByPermalink('wetpaint')[0].website,'http://www.wetpaint.com/')
+        self.assertEqual(members.findByPermalink('wetpainter'),[])
+
+        # when serving, builds search the index from other threads than the one that loaded it
+        found = []
+        thread = threading.Thread(target=lambda: found.extend(members.find('Wetpaint','http://www.foo.com/')))
+        thread.start()
+        thread.join()
+        self.assertEqual(found[0].orgname,'Wetpaint')
+
+        attached = copy.copy(members)
+        attached.attachIndex()
+        self.assertTrue(attached.find('Wetpaint','http://www.foo.com/'))
+        attached.close()
+        self.assertTrue(os.path.exists(members.indexfile))
+
+        indexfile = members.indexfile
+        members.close()
+        self.assertFalse(os.path.exists(indexfile))
+
+        members = CrunchbaseMembers(bulkdatafile = tmpfilename.name, memoryBudget = 1024*1024*1024)
+        members.loadData()
+        self.assertFalse(members.indexed)
+        self.assertTrue(members.members)
+        self.assertTrue(members.find('Wetpaint','http://www.foo.com/'))
+
+        os.unlink(tmpfilename.name)
+
+    def testFuzzyFindMemoryBudget(self):
+        members = CrunchbaseMembers()
+        members.members.append(members._toMember('Acme International','https://acme.com/','https://www.crunchbase.com/organization/acme'))
+        self.assertEqual(members.fuzzyFind('Acme Intl')[0].orgname,'Acme International')
+        members = CrunchbaseMembers(memoryBudget = 1024*1024*1024)
+        members.members.append(members._toMember('Acme International','https://acme.com/','https://www.crunchbase.com/organization/acme'))
+        self.assertEqual(members.fuzzyFind('Acme Intl'),[])
+        self.assertEqual(len(members.fuzzyIndex()),0)
+
+    def testFindByPermalink(self):
+        members = CrunchbaseMembers()
+        members.members.append(members._toMember('Wetpaint','http://www.wetpaint.com/','https://www.crunchbase.com/organization/wetpaint'))
+        members.members.append(members._toMember('Foo','http://www.foo.com/',''))
+
+        self.assertEqual(members.findByPermalink('wetpaint'),members.members[:1])
+        self.assertEqual(members.findByPermalink('WetPaint'),members.members[:1])
+        self.assertEqual(members.findByPermalink('foo'),[])
+        self.assertEqual(members.findByPermalink(None),[])
+
+        members.members.append(members._toMember('Foo','http://www.foo.com/','https://www.crunchbase.com/organization/foo'))
+        self.assertEqual(members.findByPermalink('foo'),members.members[2:])
+
+    def testEstimateMemory(self):
+        with tempfile.NamedTemporaryFile(mode='w') as tmpfilename:
+            tmpfilename.write("uuid,name\n"+("a"*99+"\n")*100)
+            tmpfilename.flush()
+
+            members = CrunchbaseMembers(bulkdatafile = tmpfilename.name)
+            members.memberBytes = 10
+            self.assertAlmostEqual(members.estimateMemory(),1010,delta=20)
+
+    bulkdatacsv = """uuid,name,type,permalink,cb_url,rank,created_at,updated_at,legal_name,roles,domain,homepage_url
+1,Wetpaint,organization,wetpaint,https://www.crunchbase.com/organization/wetpaint,1,,,,company,wetpaint.com,http://www.wetpaint.com/
+2,"Foo, Inc.",organization,foo,https://www.crunchbase.com/organization/foo,2,,,,company,foo.com,http://www.foo.com/
+"""
+
+    def _writeTarball(self, filename, mode):
+        with tarfile.open(filename, mode) as tar:
+            for name, contents in [('bulk_export/people.csv', 'uuid,name\n1,Someone\n'), ('bulk_export/organizations.csv', self.bulkdatacsv)]:
+                data = contents.encode('utf8')
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.size = len(data)
+                tar.addfile(tarinfo, io.BytesIO(data))
+
+    def testLoadDataCompressed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvgz = os.path.join(tmpdir, 'organizations.csv.gz')
+            with gzip.open(csvgz, 'wt', encoding='utf8') as fp:
+                fp.write(self.bulkdatacsv)
+            targz = os.path.join(tmpdir, 'bulk_export.tar.gz')
+            self._writeTarball(targz, 'w:gz')
+
+            for bulkdatafile in [csvgz, targz]:
+                for memoryBudget in [None, 1]:
+                    members = CrunchbaseMembers(bulkdatafile = bulkdatafile, memoryBudget = memoryBudget)
+                    members.loadData()
+                    self.assertEqual(members.indexed, memoryBudget == 1)
+                    found = members.find('Foo, Inc.','http://www.bar.com/')
+                    self.assertEqual(found[0].crunchbase,'https://www.crunchbase.com/organization/foo')
+                    self.assertEqual(found[0].website,'http://www.foo.com/')
+                    self.assertTrue(members.find('Wetpainter','http://www.wetpaint.com/'))
+                    self.assertFalse(members.find('Someone',None))
+                    members.close()
+
+                members = CrunchbaseMembers(bulkdatafile = bulkdatafile)
+                members.memberBytes = 1
+                self.assertAlmostEqual(members.estimateMemory(),2,delta=1)
+
+    def _writeBulkData(self, filename, rows):
+        with open(filename, 'w', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['uuid','name','type','permalink','cb_url','rank','created_at','updated_at','legal_name','roles','domain','homepage_url'])
+            for i in range(rows):
+                writer.writerow([i,'Company "{}"\nInc.'.format(i) if i % 7 == 0 else 'Company {}'.format(i),'organization','company-{}'.format(i),'https://www.crunchbase.com/organization/company-{}'.format(i),i,'','','','company','','https://company{}.com/'.format(i) if i % 5 else 'not a website'])
+
+    def testByteRanges(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bulkdatafile = os.path.join(tmpdir, 'organizations.csv')
+            self._writeBulkData(bulkdatafile, 200)
+            members = CrunchbaseMembers(bulkdatafile = bulkdatafile)
+            members.chunkBytes = 100
+            ranges = members.byteRanges(50)
+            self.assertGreater(len(ranges), 10)
+            with open(bulkdatafile, 'rb') as fp:
+                data = fp.read()
+            self.assertEqual(ranges[0][0], data.index(b'\n')+1)
+            self.assertEqual(ranges[-1][1], len(data))
+            for (start, end), (nextstart, nextend) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, nextstart)
+            for start, end in ranges:
+                # every range holds whole rows
+                self.assertEqual(data[end-1:end], b'\n')
+                self.assertEqual(data[:end].count(b'"') % 2, 0)
+
+    def testLoadDataParallel(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bulkdatafile = os.path.join(tmpdir, 'organizations.csv')
+            self._writeBulkData(bulkdatafile, 300)
+            serial = CrunchbaseMembers(bulkdatafile = bulkdatafile, loadData = True)
+
+            parallel = CrunchbaseMembers(bulkdatafile = bulkdatafile)
+            parallel.loadWorkers = 3
+            parallel.chunkBytes = 500
+            parallel.loadData()
+            self.assertEqual(len(parallel.members), 300)
+            self.assertEqual([(member.orgname, member.website, member.crunchbase) for member in parallel.members], [(member.orgname, member.website, member.crunchbase) for member in serial.members])
+            self.assertEqual(parallel.members[7].orgname, 'Company "7"\nInc.')
+            self.assertFalse(parallel.members[5]._validWebsite)
+            for org, website in [('Company 3', None), ('Nothing', 'https://www.company4.com/'), ('Company "7"\nInc.', None)]:
+                self.assertEqual(parallel.find(org, website), [parallel.members[serial.members.index(found)] for found in serial.find(org, website)])
+            self.assertEqual(parallel.findByPermalink('company-8'), parallel.members[8:9])
+
+            parallel.close()
+            indexed = CrunchbaseMembers(bulkdatafile = bulkdatafile, memoryBudget = 1)
+            indexed.loadWorkers = 3
+            indexed.chunkBytes = 500
+            indexed.loadData()
+            self.assertTrue(indexed.indexed)
+            self.assertEqual(indexed.find('Company 3', None)[0].website, 'https://company3.com/')
+            self.assertEqual(indexed.findByPermalink('company-8')[0].orgname, 'Company 8')
+            indexed.close()
+
+    def testColumnsByName(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv') as tmpfile:
+            tmpfile.write("cb_url,homepage_url,name\nhttps://www.crunchbase.com/organization/wetpaint,http://www.wetpaint.com/,Wetpaint\n")
+            tmpfile.flush()
+
+            members = CrunchbaseMembers(bulkdatafile = tmpfile.name, loadData = True)
+            self.assertEqual(members.members[0].orgname, 'Wetpaint')
+            self.assertEqual(members.members[0].website, 'http://www.wetpaint.com/')
+            self.assertEqual(members.members[0].crunchbase, 'https://www.crunchbase.com/organization/wetpaint')
+
+    def testLoadDataZstandardMissing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvzst = os.path.join(tmpdir, 'organizations.csv.zst')
+            with open(csvzst, 'wb') as fp:
+                fp.write(b'not read')
+            with patch.dict('sys.modules', {'zstandard': None}):
+                with self.assertRaisesRegex(ImportError, 'zstandard'):
+                    CrunchbaseMembers(bulkdatafile = csvzst, loadData = True)
+
+    def testLoadDataTarballWithoutOrganizations(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            targz = os.path.join(tmpdir, 'bulk_export.tar.gz')
+            members = CrunchbaseMembers(bulkdatafile = targz)
+            members.tarmember = 'companies.csv'
+            self._writeTarball(targz, 'w:gz')
+            with self.assertRaises(ValueError):
+                members.loadData()
+
+    def testBulkDataFallbacks(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cwd = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                self.assertEqual(CrunchbaseMembers().bulkdatafile,'organizations.csv')
+                self._writeTarball('bulk_export.tar.gz', 'w:gz')
+                self.assertEqual(CrunchbaseMembers().bulkdatafile,'bulk_export.tar.gz')
+                self.assertEqual(CrunchbaseMembers(loadData = True).find('Wetpaint',None)[0].orgname,'Wetpaint')
+                self.assertEqual(CrunchbaseMembers(bulkdatafile = 'other.csv').bulkdatafile,'other.csv')
+            finally:
+                os.chdir(cwd)
+
+class TestCrunchbaseAPIMembers(unittest.TestCase):
+
+    def _mockResult(self, name, **kwargs):
+        # name is reserved by Mock(), so set it after creating the mock
+        result = Mock(**kwargs)
+        result.name = name
+        return result
+
+    def _mockClient(self):
+        client = Mock()
+        client.organizations.side_effect = lambda name: {
+            'Wetpaint': [self._mockResult('Wetpaint',permalink='wetpaint'), self._mockResult('Wetpainter',permalink='wetpainter')],
+            'Foo': [self._mockResult('Foo, Inc.',permalink='foo-inc')],
+            }.get(name)
+        client.organization.side_effect = lambda permalink: self._mockResult(permalink.capitalize(),homepage_url='https://{}.com'.format(permalink))
+
+        return client
+
+    def testFind(self):
+        members = CrunchbaseAPIMembers()
+        members._client = self._mockClient()
+
+        found = members.find('Wetpaint','https://wetpaint.com')
+        self.assertEqual(len(found),1)
+        self.assertEqual(found[0].crunchbase,'https://www.crunchbase.com/organization/wetpaint')
+        self.assertEqual(found[0].website,'https://wetpaint.com/')
+        members.client.organization.assert_called_once_with('wetpaint')
+
+    def testFindByPermalinks(self):
+        members = CrunchbaseAPIMembers()
+        members.requestsPerSecond = 100
+        members._client = self._mockClient()
+
+        found = members.findByPermalinks(['wetpaint',None,'Wetpaint'])
+        self.assertEqual(found[0][0].website,'https://wetpaint.com/')
+        self.assertEqual(found[1],[])
+        self.assertEqual(found[2][0].crunchbase,'https://www.crunchbase.com/organization/wetpaint')
+        members.client.organization.assert_called_once_with('wetpaint')
+        members.client.organizations.assert_not_called()
+
+    def testFindNoResults(self):
+        members = CrunchbaseAPIMembers()
+        members._client = self._mockClient()
+
+        self.assertEqual(members.find('Bar','https://bar.com'),[])
+        members.client.organization.assert_not_called()
+
+    def testFindMany(self):
+        members = CrunchbaseAPIMembers()
+        members.requestsPerSecond = 100
+        members._client = self._mockClient()
+
+        found = members.find_many([('Foo',''),('Bar',''),('Wetpaint','')])
+        self.assertEqual(len(found),3)
+        self.assertEqual(found[0][0].crunchbase,'https://www.crunchbase.com/organization/foo-inc')
+        self.assertEqual(found[1],[])
+        self.assertEqual(found[2][0].crunchbase,'https://www.crunchbase.com/organization/wetpaint')
+        self.assertEqual(members.client.organization.call_count,2)
+
+    def testFindCached(self):
+        members = CrunchbaseAPIMembers()
+        members._client = self._mockClient()
+
+        members.find('Wetpaint','https://wetpaint.com')
+        members.find('Wetpaint, Inc.','https://wetpaint.com')
+        members.find('Bar','https://bar.com')
+        members.find('Bar','https://bar.com')
+        self.assertEqual(members.client.organizations.call_count,2)
+        members.client.organization.assert_called_once_with('wetpaint')
+
+    def testFindCachedPersistent(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            members = CrunchbaseAPIMembers()
+            members.cachefile = os.path.join(tempdir,'cache.json')
+            members._client = self._mockClient()
+            members.find('Wetpaint','https://wetpaint.com')
+
+            members = CrunchbaseAPIMembers()
+            members.cachefile = os.path.join(tempdir,'cache.json')
+            members._client = self._mockClient()
+            found = members.find('Wetpaint','https://wetpaint.com')
+            self.assertEqual(found[0].crunchbase,'https://www.crunchbase.com/organization/wetpaint')
+            members.client.organizations.assert_not_called()
+            members.client.organization.assert_not_called()
+
+    def testFindRequestFailed(self):
+        members = CrunchbaseAPIMembers()
+        members.requestsPerSecond = 100
+        members._client = self._mockClient()
+        def organizations(name):
+            if name == 'Foo':
+                raise requests.exceptions.HTTPError('429 Client Error')
+            return [self._mockResult(name,permalink=name.lower())]
+        members._client.organizations.side_effect = organizations
+        members._client.organization.side_effect = requests.exceptions.HTTPError('503 Server Error')
+
+        with self.assertLogs('landscape_tools.crunchbaseapimembers','WARNING'):
+            self.assertEqual(members.find_many([('Foo',''),('Wetpaint','')]),[[],[]])
+            self.assertEqual(members.findByPermalinks(['wetpaint']),[[]])
+        # failures aren't cached, so they're looked up again
+        self.assertEqual(members.cache.get('search:'+members.normalizeCompany('Foo').lower()),(False,None))
+        self.assertEqual(members.cache.get('organization:wetpaint'),(False,None))
+
+        members._client = self._mockClient()
+        self.assertEqual(members.findByPermalinks(['wetpaint'])[0][0].website,'https://wetpaint.com/')
+
+    def testClientReused(self):
+        members = CrunchbaseAPIMembers()
+        members.crunchbaseKey = 'key'
+        self.assertIs(members.client,members.client)
+
+class TestCache(unittest.TestCase):
+
+    def testGetSet(self):
+        cache = Cache()
+        self.assertEqual(cache.get('foo'),(False, None))
+        cache.set('foo','bar')
+        self.assertEqual(cache.get('foo'),(True, 'bar'))
+        self.assertEqual(cache.hits,1)
+        self.assertEqual(cache.misses,1)
+
+    def testNegative(self):
+        cache = Cache(negativeTTL=0)
+        cache.set('foo',None,negative=True)
+        cache.set('bar',None)
+        with patch('time.time', return_value=cache._entries['foo'][0]+1):
+            self.assertEqual(cache.get('foo'),(False, None))
+            self.assertEqual(cache.get('bar'),(True, None))
+
+    def testExpired(self):
+        cache = Cache(ttl=10)
+        cache.set('foo','bar')
+        with patch('time.time', return_value=cache._entries['foo'][0]+11):
+            self.assertEqual(cache.get('foo'),(False, None))
+        self.assertEqual(len(cache),0)
+
+    def testEviction(self):
+        cache = Cache(maxEntries=2)
+        cache.set('a',1)
+        cache.set('b',2)
+        cache.get('a')
+        cache.set('c',3)
+        self.assertEqual(cache.get('b'),(False, None))
+        self.assertEqual(cache.get('a'),(True, 1))
+        self.assertEqual(cache.get('c'),(True, 3))
+
+    def testSaveLoad(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = Cache(cachefile=os.path.join(tempdir,'cache.json'))
+            cache.set('foo',{'name':'bar'})
+            cache.save()
+
+            cache = Cache(cachefile=os.path.join(tempdir,'cache.json'))
+            self.assertEqual(cache.get('foo'),(True, {'name':'bar'}))
+
+    def testLoadCorrupt(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir,'cache.json'),'w') as fp:
+                fp.write('{not json')
+            cache = Cache(cachefile=os.path.join(tempdir,'cache.json'))
+            self.assertEqual(len(cache),0)
+
+class TestMetrics(unittest.TestCase):
+
+    def testTimer(self):
+        testmetrics = Metrics()
+        with testmetrics.timer('foo'):
+            pass
+        with testmetrics.timer('foo'):
+            pass
+        self.assertEqual(testmetrics.timers['foo']['count'],2)
+        self.assertGreaterEqual(testmetrics.timers['foo']['seconds'],0)
+
+    def testTimerException(self):
+        testmetrics = Metrics()
+        with self.assertRaises(ValueError):
+            with testmetrics.timer('foo'):
+                raise ValueError()
+        self.assertEqual(testmetrics.timers['foo']['count'],1)
+
+    def testIncrement(self):
+        testmetrics = Metrics()
+        testmetrics.increment('foo')
+        testmetrics.increment('foo',5)
+        self.assertEqual(testmetrics.counters['foo'],6)
+
+    @responses.activate
+    def testRecordResponse(self):
+        responses.add(
+            method=responses.GET,
+            url='https://someurl.com/boom.svg',
+            body=b'this is image data'
+            )
+        testmetrics = Metrics()
+        testmetrics.recordResponse(requests.get('https://someurl.com/boom.svg'))
+        self.assertEqual(testmetrics.counters['http.requests'],1)
+        self.assertEqual(testmetrics.counters['http.bytes'],18)
+        self.assertNotIn('http.errors',testmetrics.counters)
+
+    def testCollectAndMerge(self):
+        worker = Metrics()
+        worker.increment('foo', 2)
+        worker.addTime('bar', 1.5)
+        worker.recordHost('someurl.com', 2.0, failed = True)
+        collected = worker.collect()
+        self.assertEqual(worker.counters,{})
+
+        testmetrics = Metrics()
+        testmetrics.increment('foo')
+        testmetrics.addTime('bar', 0.5)
+        testmetrics.recordHost('someurl.com', 1.0)
+        testmetrics.merge(pickle.loads(pickle.dumps(collected)))
+        self.assertEqual(testmetrics.counters['foo'],3)
+        self.assertEqual(testmetrics.timers['bar'],{'count': 2, 'seconds': 2.0})
+        self.assertEqual(testmetrics.hosts['someurl.com'],{'requests': 2, 'failures': 1, 'seconds': 3.0, 'maxSeconds': 2.0})
+
+    def testWriteReport(self):
+        testmetrics = Metrics()
+        testmetrics.increment('foo')
+        with testmetrics.timer('bar'):
+            pass
+        with tempfile.TemporaryDirectory() as tempdir:
+            testmetrics.writeReport(os.path.join(tempdir,'report.json'))
+            with open(os.path.join(tempdir,'report.json')) as fp:
+                report = json.load(fp)
+        self.assertEqual(report['counters']['foo'],1)
+        self.assertEqual(report['timers']['bar']['count'],1)
+        self.assertIn('started',report)
+        self.assertIn('seconds',report)
+
+class TestLog(unittest.TestCase):
+
+    def tearDown(self):
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.setLevel(logging.WARNING)
+        progress = logging.getLogger('landscape_tools.progress')
+        for handler in progress.handlers[:]:
+            progress.removeHandler(handler)
+        progress.propagate = True
+
+    def testSetupLoggingDefault(self):
+        stream = io.StringIO()
+        setupLogging(stream=stream)
+        logging.getLogger('landscape_tools.member').debug('hidden')
+        logging.getLogger('landscape_tools.member').info('shown')
+        logging.getLogger().handlers[0].flush()
+        self.assertNotIn('hidden',stream.getvalue())
+        self.assertIn('shown',stream.getvalue())
+
+    def testSetupLoggingVerbose(self):
+        stream = io.StringIO()
+        setupLogging(verbose=True, stream=stream)
+        logging.getLogger('landscape_tools.member').debug('shown')
+        logging.getLogger().handlers[0].flush()
+        self.assertIn('shown',stream.getvalue())
+
+    def testSetupLoggingQuiet(self):
+        stream = io.StringIO()
+        setupLogging(quiet=True, stream=stream)
+        logging.getLogger('landscape_tools.member').info('hidden')
+        Progress(10, interval=0).update()
+        logging.getLogger().handlers[0].flush()
+        self.assertNotIn('hidden',stream.getvalue())
+        self.assertIn('Processed 1/10 members',stream.getvalue())
+
+    def testSetupLoggingBuffered(self):
+        stream = io.StringIO()
+        setupLogging(stream=stream, capacity=10)
+        logging.getLogger('landscape_tools.member').info('buffered')
+        self.assertEqual(stream.getvalue(),'')
+        logging.getLogger('landscape_tools.member').warning('flushed')
+        self.assertIn('buffered',stream.getvalue())
+        self.assertIn('flushed',stream.getvalue())
+
+    def testProgressAfterBuffered(self):
+        stream = io.StringIO()
+        setupLogging(stream=stream, capacity=10)
+        logging.getLogger('landscape_tools.member').info('buffered')
+        Progress(10, interval=0).update()
+        output = stream.getvalue()
+        self.assertLess(output.index('buffered'),output.index('Processed 1/10 members'))
+
+    def testProgress(self):
+        progress = Progress(10, interval=3600)
+        with self.assertNoLogs('landscape_tools.progress'):
+            progress.update()
+            progress.update(2)
+        self.assertEqual(progress.count,3)
+        with self.assertLogs('landscape_tools.progress') as logs:
+            progress.finish()
+        self.assertIn('Processed 3/10 members',logs.output[0])
+
+class TestMemoryReport(unittest.TestCase):
+
+    def testSnapshot(self):
+        memoryreport = MemoryReport(topLines=3)
+        data = [str(i)*100 for i in range(1000)]
+        entry = memoryreport.snapshot('foo')
+        memoryreport.stop()
+
+        self.assertEqual(entry['component'],'foo')
+        self.assertGreater(entry['bytes'],100000)
+        self.assertLessEqual(len(entry['top']),3)
+        self.assertEqual(memoryreport.report()['components'],{'foo':entry['bytes']})
+
+    def testWriteReport(self):
+        memoryreport = MemoryReport()
+        memoryreport.snapshot('foo')
+        memoryreport.snapshot('bar')
+        with tempfile.TemporaryDirectory() as tempdir:
+            memoryreport.writeReport(os.path.join(tempdir,'report.json'))
+            memoryreport.stop()
+            with open(os.path.join(tempdir,'report.json')) as fp:
+                report = json.load(fp)
+        self.assertEqual([snapshot['component'] for snapshot in report['snapshots']],['foo','bar'])
+
+class TestRateLimiter(unittest.TestCase):
+
+    def testAcquireWithinBurst(self):
+        ratelimiter = RateLimiter(rate=1, burst=5)
+        with patch('time.sleep') as sleep:
+            for i in range(5):
+                ratelimiter.acquire()
+            sleep.assert_not_called()
+
+    def testAcquireWaitsWhenEmpty(self):
+        ratelimiter = RateLimiter(rate=1000, burst=1)
+        ratelimiter.acquire()
+        with ratelimiter:
+            pass
+        self.assertLess(ratelimiter._tokens,1)
+
+    def testAcquireAsync(self):
+        ratelimiter = RateLimiter(rate=1000, burst=1)
+        asyncio.run(ratelimiter.acquireAsync())
+        asyncio.run(ratelimiter.acquireAsync())
+        self.assertLess(ratelimiter._tokens,1)
+
 class TestLandscapeOutput(unittest.TestCase):
 
     def testNewLandscape(self):
@@ -995,6 +2099,29 @@ landscape:
             self.assertEqual(landscape.landscape['landscape'][0]['subcategories'][0]['name'],"Good")
             self.assertEqual(landscape.landscape['landscape'][0]['subcategories'][1]['name'],"Bad")
 
+    def testLandscapeMembersPerInstance(self):
+        landscape1 = LandscapeOutput()
+        landscape1.landscapeMemberClasses = [{"name": "Good Membership", "category": "Good"}]
+        landscape1.newLandscape()
+        landscape2 = LandscapeOutput()
+        landscape2.landscapeMemberClasses = [{"name": "Bad Membership", "category": "Bad"}]
+        landscape2.newLandscape()
+
+        self.assertEqual([x['name'] for x in landscape1.landscapeMembers],['Good'])
+        self.assertEqual([x['name'] for x in landscape2.landscapeMembers],['Bad'])
+
+    def testUpdateLandscapeClosesMissing(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            landscape = LandscapeOutput()
+            landscape.landscapefile = os.path.join(tempdir,'landscape.yml')
+            landscape.missingcsvfile = os.path.join(tempdir,'missing.csv')
+            landscape.newLandscape()
+            landscape.writeMissing('dog','dog.svg','https://dog.com','')
+            landscape.updateLandscape()
+
+            with open(landscape.missingcsvfile) as fp:
+                self.assertEqual(fp.read(),'"name","logo","homepage_url","crunchbase"\n"dog","dog.svg","https://dog.com",""\n')
+
     @responses.activate
     def testHostLogo(self):
         responses.add(
@@ -1079,6 +2206,27 @@ landscape:
             landscape.hostedLogosDir = tempdir
             landscape.hostLogo('https://someurl.com/boom.svg','privée')
 
+    @responses.activate
+    def testHostLogos(self):
+        responses.add(
+            method=responses.GET,
+            url='https://someurl.com/boom.svg',
+            body=b'this is image data'
+            )
+        responses.add(
+            method=responses.GET,
+            url='https://someurl.com/bar.svg',
+            body=b'this is image data'
+            )
+
+        landscape = LandscapeOutput()
+        with tempfile.TemporaryDirectory() as tempdir:
+            landscape.hostedLogosDir = tempdir
+            self.assertEqual(
+                landscape.hostLogos([('https://someurl.com/boom.svg','dog'),(None,'cat'),('https://someurl.com/bar.svg','mouse')]),
+                ['dog.svg',None,'mouse.svg']
+                )
+
     def testHostLogoLogoisNone(self):
         landscape = LandscapeOutput()
         self.assertEqual(landscape.hostLogo(None,'dog'),None)
@@ -1128,7 +2276,775 @@ landscape:
 
             self.assertFalse(os.path.exists(tmpfilename.name))
 
+    @responses.activate
+    def testHostedLogosIndex(self):
+        responses.add(
+            method=responses.GET,
+            url='https://someurl.com/boom.svg',
+            body=b'this is image data'
+            )
+        with tempfile.TemporaryDirectory() as tempdir:
+            for filename in ['dog.svg', '.gitkeep']:
+                with open(os.path.join(tempdir, filename), 'w') as fp:
+                    fp.write('')
+            landscape = LandscapeOutput()
+            landscape.hostedLogosDir = tempdir
+            with patch('os.scandir', wraps=os.scandir) as scandir:
+                self.assertEqual(landscape.hostedLogos(), {'dog.svg'})
+                self.assertEqual(landscape.hostLogo('https://someurl.com/boom.svg','cat'),'cat.svg')
+                landscape.removeHostedLogo('dog.svg')
+                landscape.removeHostedLogo('mouse.svg')
+                self.assertEqual(landscape.hostedLogos(), {'cat.svg'})
+                self.assertEqual(scandir.call_count, 1)
+            self.assertFalse(os.path.exists(os.path.join(tempdir, 'dog.svg')))
+
+    def testCollectLogos(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            for filename in ['dog.svg', 'cat.svg', 'mouse.svg', 'project.svg']:
+                with open(os.path.join(tempdir, filename), 'w') as fp:
+                    fp.write('')
+            landscape = LandscapeOutput()
+            landscape.hostedLogosDir = tempdir
+            landscape.newLandscape()
+            landscape.landscapeMembers[0]['items'].append({'item': None, 'name': 'Dog', 'logo': 'dog.svg'})
+            landscape.landscape['landscape'].append({'category': None, 'name': 'Projects', 'subcategories': [{'subcategory': None, 'name': 'Projects', 'items': [{'item': None, 'name': 'Project', 'logo': 'project.svg'}]}]})
+
+            self.assertEqual(landscape.collectLogos(dryRun = True), ['cat.svg', 'mouse.svg'])
+            self.assertEqual(sorted(os.listdir(tempdir)), ['cat.svg', 'dog.svg', 'mouse.svg', 'project.svg'])
+            self.assertEqual(landscape.collectLogos(), ['cat.svg', 'mouse.svg'])
+            self.assertEqual(sorted(os.listdir(tempdir)), ['dog.svg', 'project.svg'])
+            self.assertEqual(landscape.collectLogos(), [])
+
+    @responses.activate
+    def testHostLogoCachesOutcome(self):
+        responses.add(method=responses.GET, url='https://someurl.com/dog.svg', body=b'this is image data')
+        responses.add(method=responses.GET, url='https://someurl.com/cat.svg', body=b'this is image data <text /> dfdfdf')
+        responses.add(method=responses.GET, url='https://someurl.com/mouse.svg', status=404)
+        landscape = LandscapeOutput()
+        landscape.logoCache = Cache()
+        with tempfile.TemporaryDirectory() as tempdir:
+            landscape.hostedLogosDir = tempdir
+            landscape.hostLogos([('https://someurl.com/dog.svg','dog'),('https://someurl.com/cat.svg','cat'),('https://someurl.com/mouse.svg','mouse')])
+        self.assertEqual(landscape.logoCache.get('https://someurl.com/dog.svg'),(True,'hosted'))
+        self.assertEqual(landscape.logoCache.get('https://someurl.com/cat.svg'),(True,'rejected'))
+        self.assertEqual(landscape.logoCache.get('https://someurl.com/mouse.svg'),(True,'failed'))
+
+        # a failed download keeps the logo already hosted, but is still recorded as failed
+        responses.replace(responses.GET, 'https://someurl.com/dog.svg', status=500)
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir,'dog.svg'),'w') as fp:
+                fp.write('')
+            landscape.hostedLogosDir = tempdir
+            self.assertEqual(landscape.hostLogo('https://someurl.com/dog.svg','dog'),'dog.svg')
+        self.assertEqual(landscape.logoCache.get('https://someurl.com/dog.svg'),(True,'failed'))
+
+    def testPlanWithServe(self):
+        with patch('sys.argv',['landscapemembers.py','--plan','-','--serve','localhost:0']), patch('sys.stderr',new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit):
+                landscapemembers.main()
+        self.assertIn("--plan can't be used with --serve",stderr.getvalue())
+
+    def testPlanLogo(self):
+        landscape = LandscapeOutput()
+        landscape.dryRun = True
+        landscape.logoCache = Cache()
+        landscape.logoCache.set('https://someurl.com/cat.svg','rejected')
+        landscape.logoCache.set('https://someurl.com/mouse.svg','failed',negative=True)
+        landscape.logoCache.set('https://someurl.com/eel.svg','failed',negative=True)
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir,'eel.svg'),'w') as fp:
+                fp.write('')
+            landscape.hostedLogosDir = tempdir
+            self.assertEqual(
+                landscape.hostLogos([('https://someurl.com/dog.svg','Dog Inc.'),('https://someurl.com/cat.svg','cat'),('https://someurl.com/mouse.svg','mouse'),('https://someurl.com/eel.svg','eel'),('fox.svg','fox')]),
+                ['dog_inc.svg','','https://someurl.com/mouse.svg','eel.svg','fox.svg']
+                )
+            self.assertEqual(os.listdir(tempdir),['eel.svg'])
+
+    def testDryRun(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            landscape = LandscapeOutput()
+            landscape.dryRun = True
+            landscape.landscapefile = os.path.join(tempdir,'landscape.yml')
+            landscape.missingcsvfile = os.path.join(tempdir,'missing.csv')
+            landscape.hostedLogosDir = tempdir
+            landscape.newLandscape()
+            with open(os.path.join(tempdir,'dog.svg'),'w') as fp:
+                fp.write('')
+            landscape.writeMissing('dog','dog.svg',None,None)
+            landscape.removeHostedLogo('dog.svg')
+            landscape.updateLandscape()
+            self.assertEqual(landscape.collectLogos(),['dog.svg'])
+            self.assertEqual(os.listdir(tempdir),['dog.svg'])
+            self.assertEqual(landscape.membersErrors,1)
+            self.assertEqual(landscape.changes()['missing'],[{'name':'dog','logo':'dog.svg','homepage_url':None,'crunchbase':None}])
+
+
+class TestAsyncHTTP(unittest.TestCase):
+
+    @responses.activate
+    def testGet(self):
+        responses.add(
+            method=responses.GET,
+            url='https://someurl.com/boom.svg',
+            body=b'this is image data'
+            )
+        client = AsyncHTTP()
+        self.assertEqual(asynchttp.run(client.get('https://someurl.com/boom.svg')).content,b'this is image data')
+        # semaphores are per event loop, so a second loop can use the same client
+        self.assertEqual(asynchttp.run(client.get('https://someurl.com/boom.svg')).content,b'this is image data')
+
+    def testMaxConcurrency(self):
+        client = AsyncHTTP(maxConcurrency=2)
+        inflight = []
+        peak = []
+        lock = threading.Lock()
+        def get(url, **kwargs):
+            with lock:
+                inflight.append(url)
+                peak.append(len(inflight))
+            time.sleep(0.01)
+            with lock:
+                inflight.remove(url)
+            return Mock(content=b'', status_code=200)
+        client.session.get = get
+
+        async def getAll():
+            return await asyncio.gather(*(client.get('https://someurl.com/{}'.format(i)) for i in range(6)))
+        self.assertEqual(len(asynchttp.run(getAll())),6)
+        self.assertEqual(max(peak),2)
+
+    def testGetClientShared(self):
+        self.assertIs(asynchttp.getClient(),asynchttp.getClient())
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def testOpensAfterFailures(self):
+        breaker = CircuitBreaker(failureThreshold=2, resetTimeout=60)
+        self.assertFalse(breaker.failure())
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.failure())
+        self.assertEqual(breaker.state,'open')
+        self.assertFalse(breaker.allow())
+
+    def testSuccessResets(self):
+        breaker = CircuitBreaker(failureThreshold=2)
+        breaker.failure()
+        breaker.success()
+        self.assertFalse(breaker.failure())
+        self.assertEqual(breaker.state,'closed')
+
+    def testHalfOpen(self):
+        breaker = CircuitBreaker(failureThreshold=1, resetTimeout=0)
+        breaker.failure()
+        self.assertEqual(breaker.state,'half-open')
+        self.assertTrue(breaker.allow())
+        # only a single trial request is let through
+        self.assertFalse(breaker.allow())
+        breaker.success()
+        self.assertEqual(breaker.state,'closed')
+        self.assertTrue(breaker.allow())
+
+class TestHostScheduler(unittest.TestCase):
+
+    @responses.activate
+    def testCircuitOpens(self):
+        responses.add(
+            method=responses.GET,
+            url='https://down.com/boom.svg',
+            status=503
+            )
+        responses.add(
+            method=responses.GET,
+            url='https://up.com/boom.svg',
+            body=b'this is image data'
+            )
+        client = AsyncHTTP(scheduler=HostScheduler(failureThreshold=2, resetTimeout=60))
+        client.session.mount('https://', requests.adapters.HTTPAdapter())
+        self.assertEqual(asynchttp.run(client.get('https://down.com/boom.svg')).status_code,503)
+        self.assertEqual(asynchttp.run(client.get('https://down.com/boom.svg')).status_code,503)
+        with self.assertRaises(CircuitOpenError):
+            asynchttp.run(client.get('https://down.com/boom.svg'))
+        self.assertEqual(len(responses.calls),2)
+        self.assertEqual(asynchttp.run(client.get('https://up.com/boom.svg')).status_code,200)
+
+    @responses.activate
+    def testHostStats(self):
+        responses.add(
+            method=responses.GET,
+            url='https://stats.com/boom.svg',
+            body=requests.exceptions.ConnectionError('down')
+            )
+        client = AsyncHTTP(scheduler=HostScheduler())
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            asynchttp.run(client.get('https://stats.com/boom.svg'))
+        self.assertEqual(metrics.hosts['stats.com']['failures'],1)
+        self.assertEqual(metrics.report()['hosts']['stats.com']['requests'],1)
+        self.assertEqual(client.scheduler.breaker('https://stats.com/').failures,1)
+
+    def testHostLogoCircuitOpen(self):
+        landscape = LandscapeOutput()
+        client = asynchttp.getClient()
+        breaker = client.scheduler.breaker('https://deadhost.com/boom.svg')
+        for i in range(breaker.failureThreshold):
+            breaker.failure()
+        with tempfile.TemporaryDirectory() as tempdir:
+            landscape.hostedLogosDir = tempdir
+            self.assertEqual(landscape.hostLogo('https://deadhost.com/boom.svg','dog'),'https://deadhost.com/boom.svg')
+        breaker.success()
 
+class TestHTTPFixtures(unittest.TestCase):
+
+    @responses.activate(registry=OrderedRegistry)
+    def testRecordReplay(self):
+        responses.add(
+            method=responses.GET,
+            url='https://someurl.com/boom.svg',
+            body=b'first'
+            )
+        responses.add(
+            method=responses.GET,
+            url='https://someurl.com/boom.svg',
+            body=b'second'
+            )
+        responses.add(
+            method=responses.GET,
+            url='https://api.crunchbase.com/v3.1/organizations?name=foo&user_key=secret',
+            json={'data': 'foo'}
+            )
+        with tempfile.TemporaryDirectory() as tempdir:
+            archive = os.path.join(tempdir,'fixtures.json.gz')
+            with HTTPFixtures(archive = archive, mode = 'record'):
+                requests.get('https://someurl.com/boom.svg')
+                requests.get('https://someurl.com/boom.svg')
+                requests.get('https://api.crunchbase.com/v3.1/organizations', params={'name':'foo','user_key':'secret'})
+
+            with gzip.open(archive,'rt') as fp:
+                self.assertNotIn('secret',fp.read())
+
+            responses.reset()
+            with HTTPFixtures(archive = archive, mode = 'replay'):
+                self.assertEqual(requests.get('https://someurl.com/boom.svg').content,b'first')
+                self.assertEqual(requests.get('https://someurl.com/boom.svg').content,b'second')
+                self.assertEqual(requests.get('https://someurl.com/boom.svg').content,b'second')
+                self.assertEqual(requests.get('https://api.crunchbase.com/v3.1/organizations', params={'name':'foo','user_key':'other'}).json(),{'data': 'foo'})
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    requests.get('https://someurl.com/notrecorded.svg')
+
+    def testReplayHostLogo(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            archive = os.path.join(tempdir,'fixtures.json.gz')
+            fixtures = HTTPFixtures(archive = archive)
+            fixtures.exchanges = {'GET https://someurl.com/boom.svg': [{'status': 200, 'reason': 'OK', 'headers': {'Content-Encoding': 'gzip'}, 'url': 'https://someurl.com/boom.svg', 'content': base64.b64encode(b'this is image data').decode('ascii')}]}
+            fixtures.save()
+
+            with HTTPFixtures(archive = archive, mode = 'replay', latency = 0.001):
+                landscape = LandscapeOutput()
+                landscape.hostedLogosDir = tempdir
+                self.assertEqual(landscape.hostLogo('https://someurl.com/boom.svg','dog'),'dog.svg')
+                with open(os.path.join(tempdir,'dog.svg'),'rb') as fp:
+                    self.assertEqual(fp.read(),b'this is image data')
+
+    def testInvalidMode(self):
+        with self.assertRaises(ValueError):
+            HTTPFixtures(mode = 'foo')
+
+class TestBuildLandscapes(unittest.TestCase):
+
+    def testSharedSources(self):
+        loaded = []
+        async def lfxLoadDataAsync(self):
+            loaded.append(self.project)
+            member = Member()
+            member.orgname = self.project
+            member.website = 'https://{}.com'.format(self.project)
+            member.logo = '{}.svg'.format(self.project)
+            member.membership = 'Premier Membership'
+            self.members.append(member)
+        async def lsLoadDataAsync(self):
+            loaded.append('landscapes')
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            configfiles = []
+            for project in ['dog','cat']:
+                os.makedirs(os.path.join(tempdir,project))
+                configfiles.append(os.path.join(tempdir,project,'config.yml'))
+                with open(configfiles[-1],'w') as fp:
+                    fp.write("project: {}\nlandscapeMemberClasses:\n  - name: Premier Membership\n    category: Premier\n".format(project))
+
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync):
+                landscapemembers.buildLandscapes(configfiles)
+
+            self.assertEqual(loaded,['landscapes','dog','cat'])
+            for project in ['dog','cat']:
+                landscape = LandscapeOutput()
+                landscape.landscapeMemberCategory = 'Members'
+                landscape.landscapefile = os.path.join(tempdir,project,'landscape.yml')
+                landscape.loadLandscape()
+                self.assertEqual([item['name'] for item in landscape.landscapeMembers[0]['items']],[project])
+
+    def testSingleConfigRelativePaths(self):
+        async def lfxLoadDataAsync(self):
+            member = Member()
+            member.orgname = 'dog'
+            member.website = 'https://dog.com'
+            member.logo = 'dog.svg'
+            member.membership = 'Premier Membership'
+            self.members.append(member)
+        async def lsLoadDataAsync(self):
+            pass
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            os.makedirs(os.path.join(tempdir,'dog'))
+            configfile = os.path.join(tempdir,'dog','config.yml')
+            with open(configfile,'w') as fp:
+                fp.write("project: dog\nlandscapeMemberClasses:\n  - name: Premier Membership\n    category: Premier\n")
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync), \
+                    patch.object(LandscapeMembers,'cachefile',None), patch('sys.argv',['landscapemembers.py','-q','-c',configfile]):
+                landscapemembers.main()
+            # written next to the config file, the same as when building several landscapes,
+            # and no cache files are left in the landscape repo unless configured
+            self.assertTrue(os.path.isfile(os.path.join(tempdir,'dog','landscape.yml')))
+            self.assertNotIn('logocache.json',os.listdir(os.path.join(tempdir,'dog')))
+            self.assertNotIn('landscapecache.json',os.listdir(os.path.join(tempdir,'dog')))
+
+            with open(configfile,'a') as fp:
+                fp.write("logoCacheFile: logocache.json\n")
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync), \
+                    patch.object(LandscapeMembers,'cachefile',None), patch('sys.argv',['landscapemembers.py','-q','-c',configfile]):
+                landscapemembers.main()
+            self.assertTrue(os.path.isfile(os.path.join(tempdir,'dog','logocache.json')))
+
+    def testProgressLabels(self):
+        async def lfxLoadDataAsync(self):
+            for name in ['dog','cat']:
+                member = Member()
+                member.orgname = name
+                member.website = 'https://{}.com'.format(name)
+                member.logo = 'https://{}.com/logo.svg'.format(name)
+                member.membership = 'Premier Membership' if name == 'dog' else 'Other'
+                self.members.append(member)
+        async def lsLoadDataAsync(self):
+            pass
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir,'config.yml'),'w') as fp:
+                fp.write("project: dog\nlandscapeMemberClasses:\n  - name: Premier Membership\n    category: Premier\nhostedLogosDir: .\n")
+            config = landscapemembers.loadConfig(os.path.join(tempdir,'config.yml'))
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync), \
+                    self.assertLogs('landscape_tools.progress') as logs:
+                landscapemembers.buildLandscape(config, plan=True)
+            # matching counts every LFX member, adding only those going in the landscape
+            self.assertEqual([record.getMessage().split(' (')[0] for record in logs.records],['Processed 2/2 members','Processed 1/1 items'])
+
+    def testPlan(self):
+        lfx = []
+        async def lfxLoadDataAsync(self):
+            for name, website, logo in lfx:
+                member = Member()
+                member.orgname = name
+                member.membership = 'Premier Membership'
+                if website:
+                    member.website = website
+                member.logo = logo
+                self.members.append(member)
+        async def lsLoadDataAsync(self):
+            pass
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir,'config.yml'),'w') as fp:
+                fp.write("project: dog\nlandscapeMemberClasses:\n  - name: Premier Membership\n    category: Premier\nhostedLogosDir: .\n")
+            config = landscapemembers.loadConfig(os.path.join(tempdir,'config.yml'))
+
+            lfx.extend([('dog','https://dog.com','dog.svg'),('cat','https://cat.com','cat.svg')])
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync):
+                landscapemembers.buildLandscape(config)
+            with open(config.landscapefile) as fp:
+                written = fp.read()
+
+            lfx[:] = [('dog','https://dog.org','dog.svg'),('mouse','https://mouse.com','https://mouse.com/logo.svg'),('eel',None,'eel.svg')]
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync), patch('requests.Session.get',side_effect=AssertionError("logos shouldn't be downloaded")):
+                lflandscape = landscapemembers.buildLandscape(config, plan=True)
+
+            with open(config.landscapefile) as fp:
+                self.assertEqual(fp.read(),written)
+            self.assertFalse(os.path.exists(config.missingcsvfile))
+            changes = lflandscape.changes()
+            self.assertEqual([(item['name'],item['category'],item['item']['logo']) for item in changes['added']],[('mouse','Premier','mouse.svg')])
+            self.assertEqual(changes['updated'],[{'name':'dog','category':'Premier','changes':{'homepage_url':{'from':'https://dog.com/','to':'https://dog.org/'}}}])
+            self.assertEqual(changes['removed'],[{'name':'cat','category':'Premier'}])
+            self.assertEqual([missing['name'] for missing in changes['missing']],['eel'])
+
+            planfile = os.path.join(tempdir,'plan.json')
+            landscapemembers.writePlan(planfile, [(config, lflandscape)])
+            with open(planfile) as fp:
+                self.assertEqual(json.load(fp),{config.landscapefile: changes})
+
+            # with the plan on stdout, logging and progress go to stderr
+            stdout, stderr = io.StringIO(), io.StringIO()
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync), \
+                    patch('requests.Session.get',side_effect=AssertionError("logos shouldn't be downloaded")), \
+                    patch('sys.argv',['landscapemembers.py','-c',os.path.join(tempdir,'config.yml'),'--plan','-','--progress-interval','0']), \
+                    patch('sys.stdout',stdout), patch('sys.stderr',stderr):
+                landscapemembers.main()
+                logging.getLogger().handlers[0].flush()
+            self.assertEqual(json.loads(stdout.getvalue()),{config.landscapefile: changes})
+            self.assertNotEqual(stderr.getvalue(),'')
+
+    def testResume(self):
+        async def lfxLoadDataAsync(self):
+            for name in ['dog','cat']:
+                member = Member()
+                member.orgname = name
+                member.website = 'https://{}.com'.format(name)
+                member.logo = 'https://{}.com/logo.svg'.format(name)
+                member.membership = 'Premier Membership'
+                self.members.append(member)
+        async def lsLoadDataAsync(self):
+            pass
+        async def failLoadDataAsync(self):
+            raise Exception("data sources shouldn't be reloaded when resuming")
+        hosted = []
+        def hostLogos(self, logos):
+            if hosted:
+                raise requests.exceptions.ConnectionError('down')
+            hosted.extend(logos)
+            return ['{}.svg'.format(orgname) for logo, orgname in logos]
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir,'config.yml'),'w') as fp:
+                fp.write("project: dog\nlandscapeMemberClasses:\n  - name: Premier Membership\n    category: Premier\nhostedLogosDir: .\n")
+            config = landscapemembers.loadConfig(os.path.join(tempdir,'config.yml'))
+            checkpoint = Checkpoint(os.path.join(tempdir,'state'))
+            checkpoint.logoBatch = 1
+
+            with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync), patch.object(LandscapeOutput,'hostLogos',hostLogos):
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    landscapemembers.buildLandscape(config, checkpoint=checkpoint)
+            self.assertEqual(checkpoint.load('progress')['logos'],['dog.svg'])
+
+            hosted.clear()
+            with patch.object(LFXMembers,'loadDataAsync',failLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',failLoadDataAsync), patch.object(LandscapeOutput,'hostLogos',hostLogos):
+                landscapemembers.buildLandscape(config, checkpoint=checkpoint, resume=True)
+            self.assertEqual(hosted,[('https://cat.com/logo.svg','cat')])
+            self.assertFalse(os.path.exists(checkpoint.directory))
+
+            landscape = LandscapeOutput()
+            landscape.landscapeMemberCategory = 'Members'
+            landscape.landscapefile = config.landscapefile
+            landscape.loadLandscape()
+            self.assertEqual([(item['name'],item['logo']) for item in landscape.landscapeMembers[0]['items']],[('dog','dog.svg'),('cat','cat.svg')])
+
+    def testLoadCrunchbaseOnlyWhenAsked(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            bulkdatafile = os.path.join(tempdir,'organizations.csv')
+            benchmarks.generateCrunchbaseCSV(bulkdatafile, 10)
+            with patch.object(CrunchbaseMembers,'bulkdatafile',bulkdatafile):
+                self.assertEqual(len(landscapemembers.loadCrunchbase().members),0)
+                self.assertEqual(len(landscapemembers.loadCrunchbase(bulkdata='').members),10)
+            self.assertEqual(len(landscapemembers.loadCrunchbase(bulkdata=bulkdatafile).members),10)
+
+            # a missing bulk export is warned about, whether given or looked for by default
+            with self.assertLogs('landscapemembers','WARNING'):
+                self.assertEqual(len(landscapemembers.loadCrunchbase(bulkdata=os.path.join(tempdir,'missing.csv')).members),0)
+            with patch.object(CrunchbaseMembers,'bulkdatafile',os.path.join(tempdir,'missing.csv')), patch.object(CrunchbaseMembers,'bulkdatafallbacks',[]):
+                with self.assertLogs('landscapemembers','WARNING'):
+                    self.assertEqual(len(landscapemembers.loadCrunchbase(bulkdata='').members),0)
+            with patch('sys.argv',['landscapemembers.py','--crunchbase-bulk-data',os.path.join(tempdir,'missing.csv')]), patch('sys.stderr',io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    landscapemembers.main()
+
+    def testShardedMatchesSerial(self):
+        async def lfxLoadDataAsync(self):
+            for i in range(25):
+                member = Member()
+                member.orgname = 'Company {}'.format(i)
+                member.website = 'https://company{}.com'.format(i)
+                member.membership = ['Premier Membership','General Membership','Other'][i % 3]
+                self.members.append(member)
+        async def lsLoadDataAsync(self):
+            for i in range(0, 25, 2):
+                member = Member()
+                member.orgname = 'Company {}'.format(i)
+                member.website = 'https://company{}.com'.format(i)
+                member.twitter = 'https://twitter.com/company{}'.format(i)
+                self.members.append(member)
+        cbmembers = CrunchbaseMembers()
+        for i in range(0, 25, 5):
+            cbmembers.members.append(cbmembers._toMember('Company {}'.format(i),'https://company{}.com'.format(i),'https://www.crunchbase.com/organization/company{}'.format(i)))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir,'config.yml'),'w') as fp:
+                fp.write("project: dog\n")
+            config = landscapemembers.loadConfig(os.path.join(tempdir,'config.yml'))
+            results = []
+            matched = []
+            for shards in [None, 3]:
+                lflandscape = LandscapeOutput()
+                lflandscape.landscapeMemberClasses = config.landscapeMemberClasses
+                lflandscape.newLandscape()
+                before = metrics.timers.get('match.crunchbase', {}).get('count', 0)
+                with patch.object(LFXMembers,'loadDataAsync',lfxLoadDataAsync), patch.object(LandscapeMembers,'loadDataAsync',lsLoadDataAsync):
+                    pending = landscapemembers.matchMembers(config, lflandscape, cbmembers=cbmembers, shards=shards)
+                self.assertTrue(all(memberClass in lflandscape.landscapeMembers for member, memberClass in pending))
+                results.append([(member.orgname, member.twitter, member.crunchbase, memberClass['name']) for member, memberClass in pending])
+                matched.append(metrics.timers['match.crunchbase']['count'] - before)
+
+            self.assertEqual(len(results[0]),17)
+            self.assertEqual(results[0],results[1])
+            # metrics recorded in the workers are merged into the report
+            self.assertEqual(matched[0],17)
+            self.assertEqual(matched[0],matched[1])
+
+    def testShardedIndexesBuiltBeforeFork(self):
+        lsmembers = LandscapeMembers(loadData = False)
+        lsmembers.members.append(Member.fromNormalized('Dog Inc','https://dog.com/',None))
+        cbmembers = CrunchbaseMembers()
+        cbmembers.members.append(cbmembers._toMember('Dog Inc','https://dog.com/','https://www.crunchbase.com/organization/dog'))
+        landscapemembers.matchSharded(2, [], (Mock(), [], lsmembers, cbmembers), Progress(0))
+        self.assertEqual(lsmembers._indexed,1)
+        self.assertEqual(cbmembers._indexed,1)
+        self.assertEqual(cbmembers._permalinks[1],{'dog':[0]})
+
+    def testMatchByPermalink(self):
+        config = Mock(landscapeMemberClasses=[{"name": "Premier Membership", "category": "Premier"}], fuzzyMatchThreshold=None)
+        lsmembers = LandscapeMembers(loadData = False)
+        cbmembers = CrunchbaseMembers()
+        cbmembers.members.append(cbmembers._toMember('Dog Inc','https://www.dog.com/','https://www.crunchbase.com/organization/dog'))
+        cbmembers.members.append(cbmembers._toMember('Cat Inc','https://cat.com/','https://www.crunchbase.com/organization/cat'))
+        cbmembers.find = Mock(side_effect=Exception("name lookup shouldn't be used when the crunchbase URL is known"))
+
+        member = Member()
+        member.orgname = 'Dog'
+        member.membership = 'Premier Membership'
+        member.crunchbase = 'https://www.crunchbase.com/organization/dog'
+        self.assertEqual(landscapemembers.matchMember(config, ['Premier'], member, lsmembers, cbmembers),'Premier')
+        self.assertEqual(member.website,'https://www.dog.com/')
+
+        member = Member()
+        member.orgname = 'Cat'
+        member.website = 'https://cats.org'
+        member.membership = 'Premier Membership'
+        member.crunchbase = 'https://www.crunchbase.com/organization/cat'
+        counted = metrics.counters.get('match.crunchbase.mismatch', 0)
+        landscapemembers.matchMember(config, ['Premier'], member, lsmembers, cbmembers)
+        self.assertEqual(member.website,'https://cats.org/')
+        self.assertEqual(metrics.counters['match.crunchbase.mismatch'],counted + 1)
+
+    def testMatchWithoutCrunchbaseURL(self):
+        config = Mock(landscapeMemberClasses=[{"name": "Premier Membership", "category": "Premier"}], fuzzyMatchThreshold=None)
+        lsmembers = LandscapeMembers(loadData = False)
+        cbmembers = CrunchbaseMembers()
+        # a row in the bulk export with a blank or invalid cb_url
+        cbmembers.members.append(Member.fromNormalized('Dog','https://dog.com/',None))
+
+        member = Member()
+        member.orgname = 'Dog'
+        member.website = 'https://dog.com'
+        member.membership = 'Premier Membership'
+        self.assertEqual(landscapemembers.matchMember(config, ['Premier'], member, lsmembers, cbmembers),'Premier')
+        self.assertIsNone(member.crunchbase)
+
+class TestCheckpoint(unittest.TestCase):
+
+    def testSaveLoad(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            checkpoint = Checkpoint(tempdir, 'dog')
+            self.assertIsNone(checkpoint.load('progress'))
+            member = Member()
+            member.orgname = 'dog'
+            member.website = 'https://dog.com'
+            checkpoint.save('progress', {'pending': [(member, 'Premier')], 'logos': ['dog.svg']})
+
+            state = checkpoint.load('progress')
+            self.assertEqual(state['pending'][0][0].website,'https://dog.com/')
+            self.assertEqual(state['logos'],['dog.svg'])
+            self.assertEqual(os.listdir(checkpoint.directory),['progress.pickle'])
+
+            checkpoint.clear()
+            self.assertIsNone(checkpoint.load('progress'))
+            self.assertFalse(os.path.exists(checkpoint.directory))
+
+    def testPartialWrite(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            checkpoint = Checkpoint(tempdir)
+            checkpoint.save('progress', {'logos': ['dog.svg']})
+            with patch('pickle.dump', side_effect=KeyboardInterrupt):
+                with self.assertRaises(KeyboardInterrupt):
+                    checkpoint.save('progress', {'logos': ['cat.svg']})
+            self.assertEqual(checkpoint.load('progress'),{'logos': ['dog.svg']})
+
+            with open(checkpoint.path('progress'),'wb') as fp:
+                fp.write(b'\x80\x05trunc')
+            with self.assertLogs('landscape_tools.checkpoint', level='WARNING'):
+                self.assertIsNone(checkpoint.load('progress'))
+            checkpoint.clear()
+            self.assertFalse(os.path.exists(checkpoint.directory))
+
+    def testVersion(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            checkpoint = Checkpoint(tempdir)
+            checkpoint.save('progress', {'logos': []})
+            checkpoint.version = 2
+            with self.assertLogs('landscape_tools.checkpoint', level='WARNING'):
+                self.assertIsNone(checkpoint.load('progress'))
+
+class TestLandscapeService(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = []
+        self.closed = []
+        def load():
+            lsmembers = LandscapeMembers(loadData=False)
+            cbmembers = CrunchbaseMembers(loadData=False)
+            cbmembers.close = lambda: self.closed.append(cbmembers)
+            self.loads.append((lsmembers, cbmembers))
+            return lsmembers, cbmembers
+        def build(configfile, lsmembers, cbmembers):
+            return {'config': configfile, 'lsmembers': id(lsmembers)}
+        self.service = LandscapeService(load=load, build=build, refreshInterval=0)
+
+    def testBuildUsesLoadedSources(self):
+        self.service.start()
+        result = self.service.buildLandscape('config.yml')
+        self.assertEqual(result['config'],'config.yml')
+        self.assertEqual(result['lsmembers'],id(self.loads[0][0]))
+        self.assertIn('seconds',result)
+        self.assertEqual(len(self.loads),1)
+        self.assertEqual(self.service.status()['builds'],1)
+
+    def testRefreshSwapsSources(self):
+        self.service.start()
+        self.service.refresh()
+        self.assertEqual(len(self.loads),2)
+        self.assertEqual(self.closed,[self.loads[0][1]])
+        self.assertEqual(self.service.buildLandscape('config.yml')['lsmembers'],id(self.loads[1][0]))
+        self.service.stop()
+        self.assertEqual(self.closed,[self.loads[0][1],self.loads[1][1]])
+
+    def testRefreshLoop(self):
+        self.service.refreshInterval = 0.01
+        self.service.start()
+        time.sleep(0.2)
+        self.service.stop()
+        self.assertGreater(len(self.loads),1)
+
+    def serveInThread(self, address):
+        server = createServer(self.service.start(), address)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def testHTTPAPI(self):
+        server = self.serveInThread('localhost:0')
+        with tempfile.NamedTemporaryFile(suffix='.yml') as configfile:
+            connection = http.client.HTTPConnection('localhost', server.server_address[1])
+            connection.request('POST', '/build', body=json.dumps({'config': configfile.name}))
+            response = connection.getresponse()
+            self.assertEqual(response.status,200)
+            self.assertEqual(json.loads(response.read())['config'],configfile.name)
+
+            connection.request('POST', '/build', body=json.dumps({'config': configfile.name+'.missing'}))
+            response = connection.getresponse()
+            self.assertEqual(response.status,404)
+            response.read()
+
+            connection.request('GET', '/status')
+            response = connection.getresponse()
+            self.assertEqual(json.loads(response.read())['builds'],1)
+
+            # Config exits on a bad config file, which mustn't take down the handler
+            self.service.build = lambda configfile, lsmembers, cbmembers: sys.exit("'project' not defined in config file")
+            connection.request('POST', '/build', body=json.dumps({'config': configfile.name}))
+            response = connection.getresponse()
+            self.assertEqual(response.status,400)
+            self.assertIn("'project' not defined",json.loads(response.read())['error'])
+            connection.close()
+
+    def testRemoteAddressRefused(self):
+        with self.assertRaises(ValueError):
+            createServer(self.service, '0.0.0.0:0')
+        server = createServer(self.service, '0.0.0.0:0', allowRemote = True)
+        server.server_close()
+        server = createServer(self.service, '127.0.0.1:0')
+        server.server_close()
+
+    def testUnixSocketAPI(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            self.serveInThread(os.path.join(tempdir,'service.sock'))
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(os.path.join(tempdir,'service.sock'))
+            client.sendall(b'GET /status HTTP/1.0\r\n\r\n')
+            data = b''
+            while True:
+                chunk = client.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+            client.close()
+            self.assertTrue(data.startswith(b'HTTP/1.0 200'))
+            self.assertEqual(json.loads(data.split(b'\r\n\r\n',1)[1])['builds'],0)
+            self.assertEqual(stat.S_IMODE(os.stat(os.path.join(tempdir,'service.sock')).st_mode) & 0o077,0)
+
+    def testUnixSocketPathReplacedOnlyIfSocket(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir,'service.sock')
+            with open(path,'w') as fp:
+                fp.write('keep me')
+            with self.assertRaises(ValueError):
+                createServer(self.service, path)
+            with open(path) as fp:
+                self.assertEqual(fp.read(),'keep me')
+
+            # a stale socket from an earlier run is replaced
+            os.unlink(path)
+            createServer(self.service, path).server_close()
+            self.assertTrue(os.path.exists(path))
+            createServer(self.service, path).server_close()
+
+class TestBenchmarks(unittest.TestCase):
+
+    def testGenerateCrunchbaseCSVDeterministic(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            benchmarks.generateCrunchbaseCSV(os.path.join(tempdir,'a.csv'), 10)
+            benchmarks.generateCrunchbaseCSV(os.path.join(tempdir,'b.csv'), 10)
+            with open(os.path.join(tempdir,'a.csv')) as a, open(os.path.join(tempdir,'b.csv')) as b:
+                self.assertEqual(a.read(),b.read())
+
+            members = CrunchbaseMembers(bulkdatafile = os.path.join(tempdir,'a.csv'), loadData = True)
+            self.assertEqual(len(members.members),10)
+            self.assertTrue(members.members[0].crunchbase.startswith('https://www.crunchbase.com/organization/'))
+
+    def testGenerateLFXMembers(self):
+        self.assertEqual(benchmarks.generateLFXMembers(5),benchmarks.generateLFXMembers(5))
+        self.assertEqual(len(json.loads(benchmarks.generateLFXMembers(5))),5)
+
+    def testCrunchbaseCSVPerScale(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            small = benchmarks.Benchmarks(directory=tempdir)
+            small.sizes = dict(small.sizes, crunchbaserows=10)
+            large = benchmarks.Benchmarks(directory=tempdir)
+            large.sizes = dict(large.sizes, crunchbaserows=20)
+            self.assertNotEqual(small.crunchbaseCSV(),large.crunchbaseCSV())
+            with open(large.crunchbaseCSV()) as fp:
+                self.assertEqual(len(fp.readlines()),21)
+
+    def testRunAndCompare(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            bench = benchmarks.Benchmarks(directory=tempdir, repeat=1)
+            with patch('sys.stdout', new_callable=io.StringIO):
+                results = bench.run(only=['normalizeCompany','LandscapeOutput_loadLandscape'])
+            self.assertEqual(sorted(results.keys()),['LandscapeOutput_loadLandscape','normalizeCompany'])
+            report = bench.report()
+            self.assertEqual(benchmarks.compare(report, report),{'LandscapeOutput_loadLandscape':1.0,'normalizeCompany':1.0})
+
+    def testStartupImports(self):
+        seconds, imported = benchmarks.importTime('landscapemembers')
+        self.assertGreater(seconds,0)
+        self.assertEqual(imported,[])
 
 if __name__ == '__main__':
     unittest.main()